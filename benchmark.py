@@ -0,0 +1,290 @@
+"""
+End-to-end latency benchmark for the copy-trade path.
+
+Starts a local fake Solana JSON-RPC + WebSocket node, points a real
+CryptoTradingAgency at it and sends logs notifications of Raydium swaps by
+the target wallets at increasing rates; the node serves each swap over
+getTransaction, so the wallet monitor fetches and decodes it as in
+production. For every notification it measures the time
+from the node sending it to TradeExecutorTool.execute_trade being invoked,
+then reports p50/p99/p999 latency per rate and the highest rate the
+pipeline sustained without queueing. Runs fully offline.
+
+Usage:
+    python benchmark.py --wallets 50 --rates 100,500,1000,2000 --duration 5
+"""
+import argparse
+import asyncio
+import contextlib
+import contextvars
+import io
+import itertools
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+import base58
+import numpy as np
+import websockets
+from aiohttp import web
+from solders.keypair import Keypair
+
+from replay import SOL_MINT, swap_transaction
+
+# Token bought by every benchmarked swap, priced through the agency's price feed
+BENCHMARK_TOKEN = str(Keypair.from_seed(bytes(32)).pubkey())
+
+# Slot of the notification currently being handled by an event bus worker
+current_slot: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("current_slot", default=None)
+
+
+class FakeSolanaNode:
+    """
+    Minimal local stand-in for a Solana RPC node: a WebSocket endpoint that
+    confirms subscriptions and sends logs notifications, and an HTTP
+    JSON-RPC endpoint (single and batch requests) that serves the notified
+    transactions and canned responses for everything else.
+    """
+    
+    def __init__(self):
+        self.subscription_ids = itertools.count(1)
+        # wallet -> (socket, subscription id)
+        self.logs_subscriptions: Dict[str, tuple] = {}
+        # signature -> getTransaction result
+        self.transactions: Dict[str, Dict] = {}
+        self.ws_server = None
+        self.http_runner: Optional[web.AppRunner] = None
+        self.ws_url = ""
+        self.rpc_url = ""
+    
+    async def start(self):
+        self.ws_server = await websockets.serve(self._handle_socket, "127.0.0.1", 0, max_queue=None)
+        self.ws_url = f"ws://127.0.0.1:{self.ws_server.sockets[0].getsockname()[1]}"
+        
+        app = web.Application()
+        app.router.add_post("/", self._handle_rpc)
+        self.http_runner = web.AppRunner(app)
+        await self.http_runner.setup()
+        site = web.TCPSite(self.http_runner, "127.0.0.1", 0)
+        await site.start()
+        self.rpc_url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/"
+    
+    async def stop(self):
+        self.ws_server.close()
+        await self.ws_server.wait_closed()
+        await self.http_runner.cleanup()
+    
+    async def _handle_socket(self, ws):
+        async for raw in ws:
+            request = json.loads(raw)
+            subscription_id = next(self.subscription_ids)
+            await ws.send(json.dumps({"jsonrpc": "2.0", "id": request["id"], "result": subscription_id}))
+            if request["method"] == "logsSubscribe":
+                self.logs_subscriptions[request["params"][0]["mentions"][0]] = (ws, subscription_id)
+    
+    def _rpc_result(self, request: Dict):
+        method = request.get("method")
+        if method == "getLatestBlockhash":
+            return {
+                "context": {"slot": 1},
+                "value": {"blockhash": "EkSnNWid2cvwEVnVx9aBqawnmiCNiDgp3gUdkDPTKN1N", "lastValidBlockHeight": 1000}
+            }
+        if method == "getTransaction":
+            return self.transactions.get(request["params"][0])
+        if method == "sendTransaction":
+            return "1" * 64
+        if method == "getSignaturesForAddress":
+            return []
+        return None
+    
+    async def _handle_rpc(self, request):
+        body = await request.json()
+        if isinstance(body, list):
+            return web.json_response([
+                {"jsonrpc": "2.0", "id": req.get("id"), "result": self._rpc_result(req)} for req in body
+            ])
+        return web.json_response({"jsonrpc": "2.0", "id": body.get("id"), "result": self._rpc_result(body)})
+    
+    async def send_logs_notification(self, wallet: str, slot: int, signature: str, transaction: Dict):
+        """Make a transaction fetchable and notify the wallet's logs subscription of it."""
+        self.transactions[signature] = {**transaction, "slot": slot, "blockTime": int(time.time())}
+        ws, subscription_id = self.logs_subscriptions[wallet]
+        await ws.send(json.dumps({
+            "jsonrpc": "2.0",
+            "method": "logsNotification",
+            "params": {
+                "subscription": subscription_id,
+                "result": {
+                    "context": {"slot": slot},
+                    "value": {"signature": signature, "err": None, "logs": []}
+                }
+            }
+        }))
+
+
+def percentiles_ms(latencies: List[float]) -> Dict[str, float]:
+    if not latencies:
+        return {"p50": float("nan"), "p99": float("nan"), "p999": float("nan")}
+    p50, p99, p999 = np.percentile(np.asarray(latencies) * 1000, [50, 99, 99.9])
+    return {"p50": float(p50), "p99": float(p99), "p999": float(p999)}
+
+
+class LatencyProbe:
+    """Records send time per slot and the time execute_trade is invoked for it."""
+    
+    def __init__(self):
+        self.sent_at: Dict[int, float] = {}
+        self.latencies: List[float] = []
+        self.invoked = 0
+    
+    def attach(self, agency):
+        # Tag each wallet event with its slot for the duration of the handler call
+        for subscription in agency.event_bus.subscriptions.get(agency.wallet_monitor.event_topic, []):
+            handler = subscription.handler
+            
+            async def traced_handler(event, handler=handler):
+                token = current_slot.set(event.get("slot"))
+                try:
+                    return await handler(event)
+                finally:
+                    current_slot.reset(token)
+            
+            subscription.handler = traced_handler
+        
+        execute_trade = agency.trade_executor.execute_trade
+        
+        async def probed_execute_trade(*args, **kwargs):
+            invoked_at = time.perf_counter()
+            slot = current_slot.get()
+            if slot in self.sent_at:
+                self.latencies.append(invoked_at - self.sent_at.pop(slot))
+                self.invoked += 1
+            return await execute_trade(*args, **kwargs)
+        
+        object.__setattr__(agency.trade_executor, "execute_trade", probed_execute_trade)
+
+
+async def replay(node: FakeSolanaNode, probe: LatencyProbe, wallets: List[str],
+                 rate: float, duration: float, first_slot: int) -> int:
+    """Send notifications at a fixed rate and return the number sent."""
+    total = int(rate * duration)
+    started = time.perf_counter()
+    for i in range(total):
+        target = started + i / rate
+        delay = target - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        slot = first_slot + i
+        wallet = wallets[i % len(wallets)]
+        # A wallet buying the benchmark token with 1 SOL, built before the send time is taken
+        signature = base58.b58encode(slot.to_bytes(64, "big")).decode()
+        transaction = swap_transaction(wallet, BENCHMARK_TOKEN, 1.0, 150.0, 6)
+        probe.sent_at[slot] = time.perf_counter()
+        await node.send_logs_notification(wallet, slot, signature, transaction)
+    return total
+
+
+async def run_benchmark(args) -> Dict:
+    node = FakeSolanaNode()
+    await node.start()
+    
+    wallets = [str(Keypair().pubkey()) for _ in range(args.wallets)]
+    os.environ.update({
+        "SOLANA_WS_URL": node.ws_url,
+        "SOLANA_RPC_URL": node.rpc_url,
+        "TARGET_WALLETS": json.dumps(wallets),
+        "MONITORED_PROGRAMS": "[]",
+        "MIN_TRANSACTION_SIZE": "0.001",
+        "MAX_DAILY_TRADES": str(10 ** 9),
+        "MAX_DAILY_DRAWDOWN_PCT": str(10 ** 9),
+        "TRADING_WALLET_KEYPAIR": base58.b58encode(bytes(Keypair())).decode(),
+        "METRICS_PORT": "0",
+    })
+    
+    # Keep the agency's per-event logging off the terminal while measuring
+    sink = io.StringIO()
+    with contextlib.redirect_stdout(sink):
+        from main import CryptoTradingAgency
+        agency = CryptoTradingAgency()
+    probe = LatencyProbe()
+    probe.attach(agency)
+    
+    with contextlib.redirect_stdout(sink):
+        agency_task = asyncio.create_task(agency.start())
+        while len(node.logs_subscriptions) < len(wallets):
+            await asyncio.sleep(0.01)
+        # Copied swaps are sized at the latest price of the bought token
+        await agency.handle_price_ticks({SOL_MINT: 150.0, BENCHMARK_TOKEN: 1.0})
+    
+    results = []
+    slot = 1
+    for rate in args.rates:
+        probe.latencies = []
+        probe.invoked = 0
+        with contextlib.redirect_stdout(sink):
+            started = time.perf_counter()
+            sent = await replay(node, probe, wallets, rate, args.duration, slot)
+            # Allow the pipeline to drain what is still queued
+            deadline = time.perf_counter() + args.drain_timeout
+            while probe.invoked < sent and time.perf_counter() < deadline:
+                await asyncio.sleep(0.01)
+            elapsed = time.perf_counter() - started
+        sink.seek(0)
+        sink.truncate()
+        slot += sent
+        
+        stats = percentiles_ms(probe.latencies)
+        high_water = max(
+            (m["high_water"] for m in agency.event_bus.get_metrics() if m["topic"] == agency.wallet_monitor.event_topic),
+            default=0
+        )
+        results.append({
+            "rate": rate,
+            "sent": sent,
+            "completed": probe.invoked,
+            "throughput": probe.invoked / elapsed,
+            "queue_high_water": high_water,
+            "sustained": probe.invoked == sent and stats["p99"] <= args.max_p99_ms,
+            **stats
+        })
+        print(f"rate={rate:>8.0f}/s sent={sent:>7} completed={probe.invoked:>7} "
+              f"p50={stats['p50']:8.3f}ms p99={stats['p99']:8.3f}ms p999={stats['p999']:8.3f}ms "
+              f"queue_high_water={high_water}")
+    
+    agency_task.cancel()
+    await asyncio.gather(agency_task, return_exceptions=True)
+    await agency.event_bus.stop()
+    # Close before the node stops so the connection does not try to reconnect
+    await agency.solana_connection.close()
+    await node.stop()
+    
+    sustained = [r["rate"] for r in results if r["sustained"]]
+    summary = {
+        "wallets": args.wallets,
+        "max_sustained_rate": max(sustained) if sustained else 0,
+        "runs": results
+    }
+    print(f"max sustained throughput: {summary['max_sustained_rate']:.0f} notifications/s "
+          f"(p99 <= {args.max_p99_ms}ms, no losses)")
+    return summary
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="End-to-end copy-trade latency benchmark")
+    parser.add_argument("--wallets", type=int, default=20, help="Number of target wallets")
+    parser.add_argument("--rates", type=lambda v: [float(r) for r in v.split(",")],
+                        default=[100.0, 500.0, 1000.0, 2000.0], help="Comma-separated notification rates per second")
+    parser.add_argument("--duration", type=float, default=3.0, help="Seconds to replay at each rate")
+    parser.add_argument("--drain-timeout", type=float, default=5.0, help="Seconds to wait for queued events after each run")
+    parser.add_argument("--max-p99-ms", type=float, default=50.0, help="p99 latency bound for a rate to count as sustained")
+    parser.add_argument("--json", dest="json_output", help="Write the summary as JSON to this path")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    summary = asyncio.run(run_benchmark(args))
+    if args.json_output:
+        with open(args.json_output, "w") as f:
+            json.dump(summary, f, indent=2)
@@ -0,0 +1,392 @@
+"""
+Accelerated historical replay of the whole agency pipeline.
+
+Reads a recording of notification, transaction, price, pool and social
+streams and drives it through a real CryptoTradingAgency: the same
+handlers, event bus, risk checks, stop-loss manager and trade executor as
+in production, with three substitutions. Time comes from a virtual clock
+that follows the recording, so a day of history replays as fast as the
+CPU allows; the transactions that wallet notifications name are served
+from the recording instead of getTransaction; and TradeExecutorTool
+fills trades with its simulated backend at the recorded prices instead
+of sending them. Reports events/s and the speedup over real time.
+
+A recording is JSON Lines (optionally gzipped), ordered by "t", the
+unix time the record was captured:
+    
+    {"t": ..., "stream": "logs", "wallet": ..., "raw": "<logsNotification frame>",
+     "transaction": {<getTransaction result of the notified signature>}}
+    {"t": ..., "stream": "transaction", "wallet": ..., "signature": ..., "slot": ...,
+     "block_time": ..., "transaction": {<getTransaction result>}}
+    {"t": ..., "stream": "price", "prices": {"<token>": price, ...}}
+    {"t": ..., "stream": "pool", "event": {"pool", "dex", "token", "price", "volume", ...}}
+    {"t": ..., "stream": "post", "post": {"text", "source", "timestamp"}}
+
+Usage:
+    python replay.py --generate recording.jsonl.gz --duration 3600
+    python replay.py recording.jsonl.gz
+"""
+import argparse
+import asyncio
+import contextlib
+import gzip
+import json
+import os
+import random
+import struct
+import time
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import base58
+import msgspec
+from solders.keypair import Keypair
+
+SOL_MINT = "So11111111111111111111111111111111111111112"
+RAYDIUM_AMM_PROGRAM_ID = "675kPX9MHTjS2zt1qfr1NYHuzeLXfQM9H24wFSUt1Mp8"
+SYSTEM_PROGRAM_ID = "11111111111111111111111111111111"
+SYSTEM_TRANSFER = struct.Struct("<IQ")
+
+
+class VirtualClock:
+    """Replay time: follows the recording instead of the wall clock and never goes back."""
+    
+    def __init__(self, start: float = 0.0):
+        self.now = start
+    
+    def __call__(self) -> float:
+        return self.now
+    
+    def advance(self, now: float):
+        if now > self.now:
+            self.now = now
+
+
+def read_recording(path: str) -> Iterator[Dict]:
+    """Records of a JSON Lines recording, gzipped if the name ends in .gz."""
+    decoder = msgspec.json.Decoder()
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                yield decoder.decode(line)
+
+
+class ReplayEngine:
+    """
+    Feeds recorded records to the agency's entry points in time order.
+    Handlers run on the event bus behind the feed; before the clock moves
+    more than max_skew seconds past the last drain, the engine waits for
+    every queued event to be handled, so no handler sees a time more than
+    max_skew ahead of its event. Pool events and posts are batched as the
+    live tools batch them.
+    """
+    
+    def __init__(self, agency, clock: VirtualClock, max_skew: float = 1.0,
+                 pool_batch_size: int = 256, post_batch_size: int = 64):
+        self.agency = agency
+        self.clock = clock
+        self.max_skew = max_skew
+        self.pool_batch_size = pool_batch_size
+        self.post_batch_size = post_batch_size
+        self.codec = agency.solana_connection.codec if agency.solana_connection else None
+        self.pool_events: List[Dict] = []
+        self.posts: List[Dict] = []
+        self.post_tasks = set()
+        self.drained_at: Optional[float] = None
+        self.counts = Counter()
+        self.closes = 0
+    
+    async def _flush_pool_events(self):
+        if self.pool_events and self.agency.token_scanner:
+            await self.agency.token_scanner.ingest(self.pool_events)
+        self.pool_events = []
+    
+    def _flush_posts(self):
+        # Scoring runs in the worker processes; keep feeding while it does
+        if self.posts and self.agency.sentiment_analyzer:
+            task = asyncio.create_task(self.agency.sentiment_analyzer.analyze_posts(self.posts))
+            self.post_tasks.add(task)
+            task.add_done_callback(self.post_tasks.discard)
+        self.posts = []
+    
+    async def drain(self):
+        """Hand over the batched records and wait until every handler is done with them."""
+        await self._flush_pool_events()
+        self._flush_posts()
+        if self.post_tasks:
+            await asyncio.gather(*self.post_tasks)
+        await self.agency.event_bus.join()
+        self.drained_at = self.clock()
+    
+    async def _dispatch(self, record: Dict):
+        stream = record["stream"]
+        agency = self.agency
+        if stream == "logs":
+            if agency.wallet_monitor:
+                notification = self.codec.decode(record["raw"])
+                if notification is not None:
+                    monitor = agency.wallet_monitor
+                    # Map the recorded subscription back to its wallet and answer the fetch from the recording
+                    monitor.wallet_subscriptions[(0, notification.params.subscription)] = record["wallet"]
+                    monitor.transaction_fetcher.remember(notification.params.result.value.signature, record["transaction"])
+                    await monitor.handle_notification(notification)
+        elif stream == "transaction":
+            # A wallet transaction as replayed by backfill after a reconnect
+            if agency.wallet_monitor:
+                await agency.wallet_monitor.publish_transaction(record)
+        elif stream == "price":
+            self.closes += len(await agency.handle_price_ticks(record["prices"], now=record["t"]))
+        elif stream == "pool":
+            self.pool_events.append(record["event"])
+            if len(self.pool_events) >= self.pool_batch_size:
+                await self._flush_pool_events()
+        elif stream == "post":
+            self.posts.append(record["post"])
+            if len(self.posts) >= self.post_batch_size:
+                self._flush_posts()
+        else:
+            self.counts["unknown"] += 1
+            return
+        self.counts[stream] += 1
+    
+    async def run(self, records: Iterable[Dict]) -> Dict:
+        """Replay the records and return per-stream counts and timings."""
+        started = time.perf_counter()
+        first = None
+        for record in records:
+            t = record["t"]
+            if first is None:
+                first = t
+                self.clock.advance(t)
+                self.drained_at = t
+            if t - self.drained_at > self.max_skew:
+                await self.drain()
+            self.clock.advance(t)
+            await self._dispatch(record)
+        await self.drain()
+        elapsed = time.perf_counter() - started
+        
+        events = sum(self.counts.values())
+        virtual_seconds = self.clock() - first if first is not None else 0.0
+        executor = self.agency.trade_executor
+        risk = self.agency.risk_calculator
+        return {
+            "events": events,
+            "streams": dict(self.counts),
+            "wall_seconds": elapsed,
+            "events_per_second": events / elapsed if elapsed else 0.0,
+            "virtual_seconds": virtual_seconds,
+            "speedup": virtual_seconds / elapsed if elapsed else 0.0,
+            "trades": len(executor.simulator.fills) if executor and executor.simulator else 0,
+            "closes": self.closes,
+            "open_positions": len(self.agency.stop_loss_manager.positions) if self.agency.stop_loss_manager else 0,
+            "realized_pnl": risk.realized_pnl if risk else 0.0
+        }
+
+
+def swap_transaction(wallet: str, token: str, sol_in: float, tokens_out: float, decimals: int) -> Dict:
+    """A Raydium SOL -> token swap as getTransaction (json encoding) returns it."""
+    keys = [wallet, f"{wallet[:32]}Wsol", f"{wallet[:32]}{token[:4]}", f"Amm{token[:40]}", RAYDIUM_AMM_PROGRAM_ID]
+    lamports_in = int(sol_in * 1e9)
+    raw_out = int(tokens_out * 10 ** decimals)
+    data = base58.b58encode(bytes([9]) + lamports_in.to_bytes(8, "little") + (1).to_bytes(8, "little")).decode()
+    return {
+        "transaction": {"message": {
+            "accountKeys": keys,
+            # Source, destination and owner are the last three accounts
+            "instructions": [{"programIdIndex": 4, "accounts": [3, 3, 3, 1, 2, 0], "data": data}]
+        }},
+        "meta": {
+            "err": None,
+            "postBalances": [int(25e9), 2039280, 2039280, 0, 1],
+            "preTokenBalances": [
+                {"accountIndex": 1, "mint": SOL_MINT, "owner": wallet,
+                 "uiTokenAmount": {"amount": str(lamports_in), "decimals": 9}},
+                {"accountIndex": 2, "mint": token, "owner": wallet,
+                 "uiTokenAmount": {"amount": "0", "decimals": decimals}}
+            ],
+            "postTokenBalances": [
+                {"accountIndex": 2, "mint": token, "owner": wallet,
+                 "uiTokenAmount": {"amount": str(raw_out), "decimals": decimals}},
+                {"accountIndex": 1, "mint": SOL_MINT, "owner": wallet,
+                 "uiTokenAmount": {"amount": "0", "decimals": 9}}
+            ]
+        }
+    }
+
+
+def transfer_transaction(wallet: str, destination: str, lamports: int, balance: int) -> Dict:
+    """A system transfer out of a wallet as getTransaction (json encoding) returns it."""
+    data = base58.b58encode(SYSTEM_TRANSFER.pack(2, lamports)).decode()
+    return {
+        "transaction": {"message": {
+            "accountKeys": [wallet, destination, SYSTEM_PROGRAM_ID],
+            "instructions": [{"programIdIndex": 2, "accounts": [0, 1], "data": data}]
+        }},
+        "meta": {"err": None, "postBalances": [balance, lamports, 1], "preTokenBalances": [], "postTokenBalances": []}
+    }
+
+
+def generate_recording(path: str, duration: float, wallets: int = 50, tokens: int = 20,
+                       transfer_rate: float = 200, swap_rate: float = 5, pool_rate: float = 100,
+                       post_rate: float = 10, start: float = 1700000000.0, seed: int = 7) -> int:
+    """
+    Write a synthetic recording: random-walk prices once a second, and
+    wallet transfers and swaps (as logs notifications with their
+    transactions), pool updates and posts at the given average rates.
+    Returns the number of records written.
+    """
+    rng = random.Random(seed)
+    wallet_keys = [str(Keypair.from_seed(rng.randbytes(32)).pubkey()) for _ in range(wallets)]
+    mints = [str(Keypair.from_seed(rng.randbytes(32)).pubkey()) for _ in range(tokens)]
+    prices = {SOL_MINT: 150.0, **{mint: rng.uniform(0.001, 10.0) for mint in mints}}
+    tickers = ["SOL", "BTC", "ETH"]
+    phrases = ["is pumping hard, great entry", "looks terrible, dumping everything",
+               "steady today", "to the moon, amazing volume", "awful rug risk, avoid", "holding"]
+    
+    records = 0
+    slot = 250_000_000
+    signatures = 0
+    rate = transfer_rate + swap_rate + pool_rate + post_rate
+    weights = [transfer_rate, swap_rate, pool_rate, post_rate]
+    opener = gzip.open if path.endswith(".gz") else open
+    encoder = msgspec.json.Encoder()
+    with opener(path, "wb") as f:
+        def write(record: Dict):
+            nonlocal records
+            f.write(encoder.encode(record) + b"\n")
+            records += 1
+        
+        t = start
+        next_tick = start
+        while t < start + duration:
+            t += rng.expovariate(rate)
+            while next_tick <= t:
+                for mint in prices:
+                    prices[mint] *= 1 + rng.gauss(0, 0.004)
+                write({"t": next_tick, "stream": "price", "prices": dict(prices)})
+                next_tick += 1.0
+                slot += 2
+            
+            stream = rng.choices(("transfer", "swap", "pool", "post"), weights)[0]
+            wallet = rng.choice(wallet_keys)
+            if stream in ("transfer", "swap"):
+                signatures += 1
+                signature = base58.b58encode(signatures.to_bytes(64, "big")).decode()
+                if stream == "transfer":
+                    transaction = transfer_transaction(wallet, rng.choice(wallet_keys), rng.randrange(10 ** 7, 10 ** 10),
+                                                       rng.randrange(10 ** 7, 10 ** 11))
+                else:
+                    mint = rng.choice(mints)
+                    sol_in = rng.uniform(0.5, 5.0)
+                    transaction = swap_transaction(wallet, mint, sol_in, sol_in * prices[SOL_MINT] / prices[mint], 6)
+                raw = json.dumps({
+                    "jsonrpc": "2.0",
+                    "method": "logsNotification",
+                    "params": {
+                        "subscription": wallet_keys.index(wallet) + 1,
+                        "result": {"context": {"slot": slot}, "value": {"signature": signature, "err": None, "logs": []}}
+                    }
+                })
+                write({
+                    "t": t,
+                    "stream": "logs",
+                    "wallet": wallet,
+                    "raw": raw,
+                    "transaction": {**transaction, "slot": slot, "blockTime": int(t)}
+                })
+            elif stream == "pool":
+                mint = rng.choice(mints)
+                write({"t": t, "stream": "pool", "event": {
+                    "pool": f"Pool{mint[:8]}",
+                    "dex": rng.choice(("raydium", "orca")),
+                    "token": mint,
+                    "price": prices[mint],
+                    "volume": rng.uniform(100, 50000),
+                    "liquidity": rng.uniform(5000, 500000),
+                    "timestamp": t
+                }})
+            else:
+                text = f"${rng.choice(tickers)} {rng.choice(phrases)} #{rng.randrange(1000)}"
+                write({"t": t, "stream": "post", "post": {"text": text, "source": "twitter", "timestamp": t}})
+    return records
+
+
+async def run_replay(args) -> Dict:
+    # Never touch the chain or the live position journal from a replay
+    os.environ["SIMULATED_EXECUTION"] = "true"
+    os.environ["POSITION_JOURNAL_DIR"] = ""
+    if not os.getenv("TRADING_WALLET_KEYPAIR"):
+        os.environ["TRADING_WALLET_KEYPAIR"] = base58.b58encode(bytes(Keypair())).decode()
+    
+    records = read_recording(args.recording)
+    first = next(records, None)
+    if first is None:
+        raise SystemExit(f"{args.recording} has no records")
+    
+    clock = VirtualClock(first["t"])
+    # Keep the agency's per-event logging off the terminal unless asked for
+    sink = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    with sink:
+        from main import CryptoTradingAgency
+        from tools.RpcClientRegistry import rpc_clients
+        agency = CryptoTradingAgency(enabled_agents=args.agents, clock=clock)
+        await agency.event_bus.start()
+        if agency.sentiment_analyzer:
+            # Posts arrive already batched; waiting to coalesce more only stalls the replay
+            agency.sentiment_analyzer.scorer.flush_interval = 0
+            agency.sentiment_analyzer.scorer.start()
+        
+        engine = ReplayEngine(agency, clock, max_skew=args.max_skew)
+        try:
+            report = await engine.run(_chain(first, records))
+        finally:
+            await agency.event_bus.stop()
+            if agency.sentiment_analyzer:
+                agency.sentiment_analyzer.scorer.close()
+            await rpc_clients.close()
+    
+    print(f"replayed {report['events']} events ({', '.join(f'{s}={n}' for s, n in report['streams'].items())})")
+    print(f"{report['virtual_seconds']:.0f}s of recording in {report['wall_seconds']:.2f}s: "
+          f"{report['events_per_second']:.0f} events/s, {report['speedup']:.0f}x real time")
+    print(f"trades={report['trades']} closes={report['closes']} open_positions={report['open_positions']} "
+          f"realized_pnl={report['realized_pnl']:.4f}")
+    return report
+
+
+def _chain(first: Dict, rest: Iterator[Dict]) -> Iterator[Dict]:
+    yield first
+    yield from rest
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Accelerated historical replay of the agency pipeline")
+    parser.add_argument("recording", nargs="?", help="JSON Lines recording to replay (.gz for gzipped)")
+    parser.add_argument("--agents", type=lambda v: v.split(","),
+                        help="Comma-separated agents to run (default: ENABLED_AGENTS or all)")
+    parser.add_argument("--max-skew", type=float, default=1.0,
+                        help="Virtual seconds the feed may run ahead of the handlers before it waits for them")
+    parser.add_argument("--verbose", action="store_true", help="Show the agency's per-event output")
+    parser.add_argument("--json", dest="json_output", help="Write the report as JSON to this path")
+    parser.add_argument("--generate", metavar="PATH",
+                        help="Write a synthetic recording to PATH first; it is replayed when no recording is given")
+    parser.add_argument("--duration", type=float, default=600.0, help="Seconds of synthetic recording")
+    parser.add_argument("--wallets", type=int, default=50, help="Wallets in the synthetic recording")
+    parser.add_argument("--seed", type=int, default=7, help="Seed of the synthetic recording")
+    args = parser.parse_args()
+    if not args.recording and not args.generate:
+        parser.error("give a recording to replay or --generate PATH")
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.generate:
+        count = generate_recording(args.generate, args.duration, wallets=args.wallets, seed=args.seed)
+        print(f"wrote {count} records to {args.generate}")
+        args.recording = args.recording or args.generate
+    report = asyncio.run(run_replay(args))
+    if args.json_output:
+        with open(args.json_output, "w") as f:
+            json.dump(report, f, indent=2)
@@ -5,12 +5,14 @@ def run_tests_in_directory(directory):
     """
     Recursively find and run all Python files in the specified directory.
     """
+    # Make the repository root importable so tools can share modules under tools/
+    env = dict(os.environ, PYTHONPATH=os.path.abspath('.'))
     for root, _, files in os.walk(directory):
         for file in files:
             if file.endswith('.py'):
                 file_path = os.path.join(root, file)
                 print(f"Running {file_path}")
-                subprocess.run(['python', file_path], check=True)
+                subprocess.run(['python', file_path], check=True, env=env)
 
 if __name__ == "__main__":
     tools_directory = 'tools'
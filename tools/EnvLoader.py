@@ -0,0 +1,20 @@
+from functools import lru_cache
+
+from dotenv import load_dotenv
+
+
+@lru_cache(maxsize=None)
+def load_env() -> bool:
+    """
+    Load the nearest .env into the process environment once. Every tool
+    module calls this at import time; only the first call parses the file.
+    """
+    return load_dotenv()
+
+
+if __name__ == "__main__":
+    # Test that repeated loads are served from the cache
+    for _ in range(3):
+        load_env()
+    assert load_env.cache_info().misses == 1
+    print("Env loader test passed!")
@@ -0,0 +1,241 @@
+import asyncio
+import inspect
+import json
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+OVERFLOW_BLOCK = "block"
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+OVERFLOW_COALESCE = "coalesce"
+OVERFLOW_POLICIES = (OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_COALESCE)
+
+
+class Subscription:
+    """
+    A consumer of one topic with its own bounded queue and worker pool.
+    """
+    
+    def __init__(self,
+                 topic: str,
+                 handler: Callable[[Any], Any],
+                 workers: int = 1,
+                 maxsize: int = 1000,
+                 overflow: str = OVERFLOW_BLOCK,
+                 coalesce_key: Optional[Callable[[Any], Hashable]] = None,
+                 name: Optional[str] = None):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unsupported overflow policy: {overflow}")
+        if overflow == OVERFLOW_COALESCE and coalesce_key is None:
+            raise ValueError("Coalesce overflow policy requires a coalesce_key")
+        
+        self.topic = topic
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.maxsize = max(1, maxsize)
+        self.overflow = overflow
+        self.coalesce_key = coalesce_key
+        self.name = name or getattr(handler, "__name__", repr(handler))
+        
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=self.maxsize)
+        # For coalescing subscriptions the queue holds keys and this holds the latest event per key
+        self.pending: Dict[Hashable, Any] = {}
+        self.tasks: List[asyncio.Task] = []
+        
+        self.published = 0
+        self.processed = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.high_water = 0
+    
+    async def put(self, event: Any):
+        """Enqueue an event according to the subscription's overflow policy."""
+        self.published += 1
+        
+        if self.overflow == OVERFLOW_COALESCE:
+            key = self.coalesce_key(event)
+            if key in self.pending:
+                self.pending[key] = event
+                self.coalesced += 1
+                return
+            if self.queue.full():
+                self._drop_oldest()
+            self.pending[key] = event
+            self.queue.put_nowait(key)
+        elif self.overflow == OVERFLOW_DROP_OLDEST:
+            if self.queue.full():
+                self._drop_oldest()
+            self.queue.put_nowait(event)
+        else:
+            await self.queue.put(event)
+        
+        self.high_water = max(self.high_water, self.queue.qsize())
+    
+    def _drop_oldest(self):
+        """Discard the oldest queued event to make room for a new one."""
+        try:
+            item = self.queue.get_nowait()
+            self.queue.task_done()
+        except asyncio.QueueEmpty:
+            return
+        if self.overflow == OVERFLOW_COALESCE:
+            self.pending.pop(item, None)
+        self.dropped += 1
+    
+    async def _worker(self):
+        """Pull events off the queue and hand them to the handler."""
+        while True:
+            item = await self.queue.get()
+            try:
+                event = self.pending.pop(item) if self.overflow == OVERFLOW_COALESCE else item
+                result = self.handler(event)
+                if inspect.isawaitable(result):
+                    await result
+                self.processed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                print(f"Error in event handler {self.name} for topic {self.topic}: {e}")
+            finally:
+                self.queue.task_done()
+    
+    def start(self):
+        """Start the worker pool if it is not already running."""
+        if not self.tasks:
+            self.tasks = [
+                asyncio.create_task(self._worker(), name=f"{self.topic}:{self.name}:{i}")
+                for i in range(self.workers)
+            ]
+    
+    async def stop(self):
+        """Cancel the worker pool."""
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+    
+    def metrics(self) -> Dict:
+        """Return queue-depth and delivery counters for this subscription."""
+        return {
+            "topic": self.topic,
+            "consumer": self.name,
+            "overflow": self.overflow,
+            "workers": self.workers,
+            "depth": self.queue.qsize(),
+            "maxsize": self.maxsize,
+            "high_water": self.high_water,
+            "published": self.published,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "errors": self.errors
+        }
+
+
+class EventBus:
+    """
+    Central asyncio event bus.
+    Publishers push events onto a topic and every subscriber of that topic
+    receives them through its own bounded queue and worker pool, so slow
+    consumers never stall the publishing loop beyond their overflow policy.
+    """
+    
+    def __init__(self, default_maxsize: int = 1000):
+        self.default_maxsize = default_maxsize
+        self.subscriptions: Dict[str, List[Subscription]] = {}
+        self.running = False
+    
+    def subscribe(self,
+                  topic: str,
+                  handler: Callable[[Any], Any],
+                  workers: int = 1,
+                  maxsize: Optional[int] = None,
+                  overflow: str = OVERFLOW_BLOCK,
+                  coalesce_key: Optional[Callable[[Any], Hashable]] = None,
+                  name: Optional[str] = None) -> Subscription:
+        """Register a sync or async handler for a topic."""
+        subscription = Subscription(
+            topic=topic,
+            handler=handler,
+            workers=workers,
+            maxsize=maxsize or self.default_maxsize,
+            overflow=overflow,
+            coalesce_key=coalesce_key,
+            name=name
+        )
+        self.subscriptions.setdefault(topic, []).append(subscription)
+        if self.running:
+            subscription.start()
+        return subscription
+    
+    async def publish(self, topic: str, event: Any):
+        """Publish an event to every subscriber of a topic."""
+        for subscription in self.subscriptions.get(topic, ()):
+            await subscription.put(event)
+    
+    async def start(self):
+        """Start the worker pools of all subscriptions. Safe to call repeatedly."""
+        self.running = True
+        for subscriptions in self.subscriptions.values():
+            for subscription in subscriptions:
+                subscription.start()
+    
+    async def stop(self):
+        """Stop all worker pools."""
+        self.running = False
+        for subscriptions in self.subscriptions.values():
+            for subscription in subscriptions:
+                await subscription.stop()
+    
+    async def join(self):
+        """Wait until every queued event has been processed."""
+        for subscriptions in self.subscriptions.values():
+            for subscription in subscriptions:
+                await subscription.queue.join()
+    
+    def get_metrics(self) -> List[Dict]:
+        """Return metrics for every subscription."""
+        return [
+            subscription.metrics()
+            for subscriptions in self.subscriptions.values()
+            for subscription in subscriptions
+        ]
+
+
+if __name__ == "__main__":
+    # Test the event bus
+    async def test_bus():
+        bus = EventBus(default_maxsize=4)
+        received = []
+        
+        async def slow_handler(event):
+            await asyncio.sleep(0.01)
+            received.append(event)
+        
+        bus.subscribe("trades", slow_handler, workers=2)
+        bus.subscribe("ticks", received.append, maxsize=2, overflow=OVERFLOW_DROP_OLDEST, name="ticks")
+        bus.subscribe("prices", received.append, overflow=OVERFLOW_COALESCE,
+                      coalesce_key=lambda event: event["token"], name="prices")
+        
+        # Events published before start are queued, not lost
+        for i in range(5):
+            await bus.publish("ticks", {"tick": i})
+        for price in (1.0, 2.0, 3.0):
+            await bus.publish("prices", {"token": "SOL", "price": price})
+        
+        await bus.start()
+        for i in range(10):
+            await bus.publish("trades", {"trade": i})
+        await bus.join()
+        
+        metrics = {m["topic"]: m for m in bus.get_metrics()}
+        print(json.dumps(metrics, indent=2))
+        assert metrics["trades"]["processed"] == 10
+        assert metrics["ticks"]["dropped"] == 3
+        assert metrics["prices"]["coalesced"] == 2
+        assert {"token": "SOL", "price": 3.0} in received
+        
+        await bus.stop()
+        print("Event bus test passed!")
+    
+    asyncio.run(test_bus())
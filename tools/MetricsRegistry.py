@@ -0,0 +1,154 @@
+import asyncio
+import json
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+# Latency bucket upper bounds in seconds, 100us to 5s
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0
+)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram; observe() is a bisect and two adds."""
+    
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+    
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """
+    Process-wide registry of per-stage latency histograms and counters,
+    rendered in the Prometheus text exposition format.
+    """
+    
+    def __init__(self, namespace: str = "crypto_agency"):
+        self.namespace = namespace
+        self.histograms: Dict[str, Histogram] = {}
+        # (name, stage) -> value
+        self.counters: Dict[Tuple[str, str], float] = {}
+        self.collectors: List[Callable[[], List[str]]] = []
+    
+    def observe(self, stage: str, seconds: float):
+        """Record the latency of one pass through a stage."""
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms[stage] = Histogram()
+        histogram.observe(seconds)
+    
+    def increment(self, name: str, stage: str, amount: float = 1):
+        """Increment a per-stage counter such as errors or drops."""
+        key = (name, stage)
+        self.counters[key] = self.counters.get(key, 0) + amount
+    
+    def add_collector(self, collector: Callable[[], List[str]]):
+        """Register a callable returning extra exposition lines at scrape time."""
+        self.collectors.append(collector)
+    
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text format."""
+        metric = f"{self.namespace}_stage_latency_seconds"
+        lines = [f"# TYPE {metric} histogram"]
+        for stage, histogram in sorted(self.histograms.items()):
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+            lines.append(f'{metric}_sum{{stage="{stage}"}} {histogram.sum}')
+            lines.append(f'{metric}_count{{stage="{stage}"}} {histogram.count}')
+        
+        declared = set()
+        for (name, stage), value in sorted(self.counters.items()):
+            counter = f"{self.namespace}_{name}_total"
+            if counter not in declared:
+                lines.append(f"# TYPE {counter} counter")
+                declared.add(counter)
+            lines.append(f'{counter}{{stage="{stage}"}} {value}')
+        
+        for collector in self.collectors:
+            try:
+                lines.extend(collector())
+            except Exception as e:
+                print(f"Error collecting metrics: {e}")
+        
+        return "\n".join(lines) + "\n"
+    
+    def add_event_bus(self, event_bus):
+        """Expose queue depth and delivery counters of an EventBus."""
+        def collect() -> List[str]:
+            prefix = f"{self.namespace}_event_bus"
+            lines = [
+                f"# TYPE {prefix}_queue_depth gauge",
+                f"# TYPE {prefix}_queue_high_water gauge",
+            ]
+            for counter in ("published", "processed", "dropped", "coalesced", "errors"):
+                lines.append(f"# TYPE {prefix}_{counter}_total counter")
+            for m in event_bus.get_metrics():
+                labels = f'topic="{m["topic"]}",consumer="{m["consumer"]}"'
+                lines.append(f"{prefix}_queue_depth{{{labels}}} {m['depth']}")
+                lines.append(f"{prefix}_queue_high_water{{{labels}}} {m['high_water']}")
+                for counter in ("published", "processed", "dropped", "coalesced", "errors"):
+                    lines.append(f"{prefix}_{counter}_total{{{labels}}} {m[counter]}")
+            return lines
+        
+        self.add_collector(collect)
+    
+    async def start_server(self, port: int, host: str = "127.0.0.1") -> Optional[web.AppRunner]:
+        """Serve /metrics over HTTP. Returns the runner, or None if it could not start."""
+        async def handle_metrics(request):
+            return web.Response(text=self.render(), content_type="text/plain", charset="utf-8")
+        
+        try:
+            app = web.Application()
+            app.router.add_get("/metrics", handle_metrics)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            await web.TCPSite(runner, host, port).start()
+            print(f"Metrics endpoint listening on http://{host}:{port}/metrics")
+            return runner
+        except Exception as e:
+            print(f"Error starting metrics endpoint: {e}")
+            return None
+
+
+# Shared registry used by all tools
+metrics = MetricsRegistry()
+
+
+if __name__ == "__main__":
+    # Test the registry and endpoint
+    import aiohttp
+    
+    async def test_metrics():
+        registry = MetricsRegistry()
+        for seconds in (0.0002, 0.003, 0.003, 7.0):
+            registry.observe("decode", seconds)
+        registry.increment("errors", "send_transaction")
+        
+        runner = await registry.start_server(port=0)
+        port = runner.addresses[0][1]
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f"http://127.0.0.1:{port}/metrics") as response:
+                body = await response.text()
+        await runner.cleanup()
+        
+        print(body)
+        assert 'crypto_agency_stage_latency_seconds_bucket{stage="decode",le="0.005"} 3' in body
+        assert 'crypto_agency_stage_latency_seconds_count{stage="decode"} 4' in body
+        assert 'crypto_agency_errors_total{stage="send_transaction"} 1' in body
+        print(json.dumps({"stages": list(registry.histograms)}))
+        print("Metrics registry test passed!")
+    
+    asyncio.run(test_metrics())
@@ -0,0 +1,310 @@
+import atexit
+import mmap
+import os
+import struct
+import threading
+import zlib
+from typing import Any, Callable, Iterator, List, Optional
+
+import msgspec
+
+SNAPSHOT_MAGIC = b"PJS1"
+# magic, sequence of the last record included in the snapshot
+SNAPSHOT_HEADER = struct.Struct("<4sQ")
+# payload length, crc32 of payload
+RECORD_HEADER = struct.Struct("<II")
+
+
+class PositionJournal:
+    """
+    Write-ahead log plus snapshots for in-memory position state.
+    append() only queues the record; a background thread encodes and
+    writes queued records and fsyncs once per interval (group commit), so
+    the caller never waits on encoding or the disk. Every snapshot_every
+    records the owner hands over a plain copy of its state, which the same
+    thread encodes and writes, after which a new log segment is started
+    and older segments are deleted. Recovery
+    maps the latest snapshot and replays only the records logged after it.
+    """
+    
+    def __init__(self,
+                 directory: str,
+                 name: str,
+                 fsync_interval: float = 0.05,
+                 snapshot_every: int = 10000):
+        self.directory = directory
+        self.name = name
+        self.fsync_interval = fsync_interval
+        self.snapshot_every = snapshot_every
+        self.snapshot_path = os.path.join(directory, f"{name}.snapshot")
+        self.encoder = msgspec.msgpack.Encoder()
+        self.decoder = msgspec.msgpack.Decoder()
+        # Sequence number of the last record appended or recovered
+        self.sequence = 0
+        self.records_since_snapshot = 0
+        self.capture_state: Optional[Callable[[], Any]] = None
+        self.encode_state: Optional[Callable[[Any], bytes]] = None
+        # Queued ("write", sequence, record), ("snapshot", sequence, bytes) and ("flushed", Event) operations
+        self.operations: List[tuple] = []
+        self.condition = threading.Condition()
+        self.wal_file = None
+        self.thread: Optional[threading.Thread] = None
+        self.closed = False
+        os.makedirs(directory, exist_ok=True)
+    
+    def _segment_path(self, first_sequence: int) -> str:
+        return os.path.join(self.directory, f"{self.name}.{first_sequence:020d}.wal")
+    
+    def _segments(self) -> List[str]:
+        prefix = f"{self.name}."
+        return sorted(
+            os.path.join(self.directory, filename)
+            for filename in os.listdir(self.directory)
+            if filename.startswith(prefix) and filename.endswith(".wal")
+        )
+    
+    def load_snapshot(self, loader: Callable[[memoryview], None]) -> bool:
+        """
+        Map the latest snapshot and pass its payload to loader, which must copy
+        what it keeps. Returns False if there is no snapshot.
+        """
+        if not os.path.exists(self.snapshot_path) or os.path.getsize(self.snapshot_path) < SNAPSHOT_HEADER.size:
+            return False
+        
+        with open(self.snapshot_path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                magic, sequence = SNAPSHOT_HEADER.unpack_from(mapped)
+                if magic != SNAPSHOT_MAGIC:
+                    raise ValueError(f"Invalid snapshot file: {self.snapshot_path}")
+                payload = memoryview(mapped)[SNAPSHOT_HEADER.size:]
+                try:
+                    loader(payload)
+                finally:
+                    payload.release()
+        
+        self.sequence = sequence
+        return True
+    
+    def replay(self) -> Iterator[Any]:
+        """
+        Yield the records logged after the loaded snapshot, in order. A torn
+        record is cut off the end of its segment, so records appended after
+        a restart are not stranded behind it.
+        """
+        for path in self._segments():
+            with open(path, "rb") as f:
+                data = f.read()
+            offset = 0
+            while offset + RECORD_HEADER.size <= len(data):
+                length, checksum = RECORD_HEADER.unpack_from(data, offset)
+                start = offset + RECORD_HEADER.size
+                payload = data[start:start + length]
+                # A short or corrupt record is a torn write at the tail of the log
+                if len(payload) < length or zlib.crc32(payload) != checksum:
+                    print(f"Ignoring torn record at the end of {path}")
+                    self._truncate(path, offset)
+                    break
+                offset = start + length
+                sequence, record = self.decoder.decode(payload)
+                if sequence > self.sequence:
+                    self.sequence = sequence
+                    yield record
+    
+    @staticmethod
+    def _truncate(path: str, size: int):
+        with open(path, "r+b") as f:
+            f.truncate(size)
+            f.flush()
+            os.fsync(f.fileno())
+    
+    def start(self, capture_state: Callable[[], Any], encode_state: Optional[Callable[[Any], bytes]] = None):
+        """
+        Start journaling. capture_state runs on the caller's thread and must
+        only copy the owner's state; encode_state turns that copy into the
+        snapshot payload on the writer thread. Without encode_state the
+        captured value is the payload.
+        """
+        self.capture_state = capture_state
+        self.encode_state = encode_state
+        self.wal_file = open(self._segment_path(self.sequence + 1), "ab")
+        self.thread = threading.Thread(target=self._writer, name=f"{self.name}-journal", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+    
+    def append(self, record: Any):
+        """Queue a mutation for the log. Durable within fsync_interval."""
+        if self.closed:
+            raise ValueError(f"{self.name} journal is closed")
+        self.sequence += 1
+        with self.condition:
+            self.operations.append(("write", self.sequence, record))
+        
+        self.records_since_snapshot += 1
+        if self.records_since_snapshot >= self.snapshot_every:
+            self.snapshot()
+    
+    def snapshot(self):
+        """Copy the owner's state now and have the writer encode and persist it."""
+        state = self.capture_state()
+        self.records_since_snapshot = 0
+        with self.condition:
+            self.operations.append(("snapshot", self.sequence, state))
+            self.condition.notify()
+    
+    def _writer(self):
+        while True:
+            with self.condition:
+                if not self.operations and not self.closed:
+                    self.condition.wait(self.fsync_interval)
+                operations, self.operations = self.operations, []
+                closing = self.closed
+            
+            try:
+                self._apply(operations)
+            except Exception as e:
+                print(f"Error writing {self.name} journal: {e}")
+            
+            if closing:
+                self.wal_file.close()
+                return
+    
+    def _apply(self, operations: List[tuple]):
+        """Write queued records and snapshots in order, then fsync."""
+        dirty = False
+        batch = bytearray()
+        for operation in operations:
+            if operation[0] == "write":
+                payload = self.encoder.encode(operation[1:])
+                batch += RECORD_HEADER.pack(len(payload), zlib.crc32(payload))
+                batch += payload
+                dirty = True
+                continue
+            
+            if batch:
+                self.wal_file.write(batch)
+                batch.clear()
+            
+            if operation[0] == "flushed":
+                if dirty:
+                    self._sync()
+                    dirty = False
+                operation[1].set()
+                continue
+            
+            _, sequence, state = operation
+            self._sync()
+            self._write_snapshot(sequence, self.encode_state(state) if self.encode_state else state)
+            # Records after the snapshot go to a fresh segment; older ones are no longer needed
+            self.wal_file.close()
+            current = self._segment_path(sequence + 1)
+            self.wal_file = open(current, "ab")
+            for path in self._segments():
+                if path < current:
+                    os.remove(path)
+            dirty = False
+        
+        if batch:
+            self.wal_file.write(batch)
+        if dirty:
+            self._sync()
+    
+    def _sync(self):
+        self.wal_file.flush()
+        os.fsync(self.wal_file.fileno())
+    
+    def _write_snapshot(self, sequence: int, state: bytes):
+        temporary = f"{self.snapshot_path}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, sequence))
+            f.write(state)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.snapshot_path)
+        
+        directory = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+    
+    def flush(self):
+        """Block until everything appended so far is on disk."""
+        if self.thread is None or self.closed:
+            return
+        done = threading.Event()
+        # The writer processes operations in order; the marker is reached once all earlier records are synced
+        with self.condition:
+            self.operations.append(("flushed", done))
+            self.condition.notify()
+        done.wait()
+    
+    def close(self):
+        """Write out everything queued and stop the writer."""
+        if self.thread is None or self.closed:
+            return
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        self.thread.join()
+
+
+if __name__ == "__main__":
+    # Test logging, snapshotting and recovery of a simple counter map
+    import json
+    import tempfile
+    
+    with tempfile.TemporaryDirectory() as directory:
+        def open_state():
+            state = {}
+            journal = PositionJournal(directory, "test", fsync_interval=0.01, snapshot_every=100)
+            journal.load_snapshot(lambda payload: state.update(msgspec.msgpack.decode(payload)))
+            replayed = 0
+            for key, value in journal.replay():
+                state[key] = value
+                replayed += 1
+            journal.start(lambda: dict(state), msgspec.msgpack.encode)
+            return state, journal, replayed
+        
+        state, journal, replayed = open_state()
+        assert replayed == 0
+        for i in range(250):
+            state[f"k{i % 10}"] = i
+            journal.append((f"k{i % 10}", i))
+        journal.close()
+        
+        recovered, journal, replayed = open_state()
+        print(json.dumps({"replayed": replayed, "segments": len(journal._segments())}))
+        assert recovered == state
+        # Two snapshots were taken, so only the 50 records after the last one are replayed
+        assert replayed == 50
+        
+        # A torn final record is ignored
+        recovered["k0"] = -1
+        journal.append(("k0", -1))
+        journal.close()
+        with open(journal._segments()[-1], "ab") as f:
+            f.write(RECORD_HEADER.pack(100, 0) + b"partial")
+        recovered_again, journal, _ = open_state()
+        journal.close()
+        assert recovered_again == recovered
+        
+        # A torn first record in the segment the next start appends to: records
+        # written after the restart must survive the next crash
+        with open(journal._segment_path(journal.sequence + 1), "ab") as f:
+            f.write(RECORD_HEADER.pack(100, 0) + b"partial")
+        recovered, journal, replayed_before = open_state()
+        for i in range(5):
+            recovered[f"new{i}"] = i
+            journal.append((f"new{i}", i))
+        journal.close()
+        recovered_again, journal, replayed = open_state()
+        journal.close()
+        assert replayed == replayed_before + 5 and recovered_again == recovered
+        
+        # Records appended after close would never be written
+        try:
+            journal.append(("k0", 0))
+            raise AssertionError("append after close must raise")
+        except ValueError:
+            pass
+        print("Position journal test passed!")
@@ -0,0 +1,203 @@
+import asyncio
+import json
+import os
+from typing import Callable, Dict, Optional, Tuple
+
+import aiohttp
+import httpx
+from tools.EnvLoader import load_env
+from solana.rpc.async_api import AsyncClient
+from web3 import AsyncWeb3
+
+load_env()
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class RpcClientRegistry:
+    """
+    Process-wide registry of RPC clients, one per endpoint. Every tool that
+    talks to the same endpoint shares one keep-alive connection pool, so
+    TLS handshakes are paid once and the number of sockets per provider is
+    capped. Solana JSON-RPC goes through one httpx pool per endpoint, using
+    HTTP/2 when the h2 package is installed; web3 providers share aiohttp
+    sessions, which is the only session type they accept.
+    """
+    
+    def __init__(self,
+                 max_connections: Optional[int] = None,
+                 max_keepalive_connections: Optional[int] = None,
+                 keepalive_expiry: Optional[float] = None,
+                 http2: Optional[bool] = None,
+                 timeout: float = 10.0):
+        self.max_connections = max_connections or int(os.getenv('RPC_MAX_CONNECTIONS', '100'))
+        self.max_keepalive_connections = max_keepalive_connections or int(os.getenv('RPC_MAX_KEEPALIVE_CONNECTIONS', '20'))
+        self.keepalive_expiry = keepalive_expiry or float(os.getenv('RPC_KEEPALIVE_EXPIRY', '30'))
+        if http2 is None:
+            http2 = os.getenv('RPC_HTTP2', 'true').lower() == 'true'
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.timeout = timeout
+        self.solana_clients: Dict[str, AsyncClient] = {}
+        # endpoint -> (pool, loop it was opened on); pooled sockets belong to one event loop
+        self.rpc_pools: Dict[str, Tuple[httpx.AsyncClient, asyncio.AbstractEventLoop]] = {}
+        self.http_sessions: Dict[str, Tuple[aiohttp.ClientSession, asyncio.AbstractEventLoop]] = {}
+        self.web3_clients: Dict[str, AsyncWeb3] = {}
+    
+    @staticmethod
+    def _pool_for_loop(pools: Dict, url: str, is_closed: Callable, create: Callable):
+        """The endpoint's pool on the running loop, opening one if there is none or it is closed."""
+        loop = asyncio.get_running_loop()
+        entry = pools.get(url)
+        if entry is None or entry[1] is not loop or is_closed(entry[0]):
+            entry = (create(), loop)
+            pools[url] = entry
+        return entry[0]
+    
+    def get_rpc_client(self, url: Optional[str] = None) -> httpx.AsyncClient:
+        """
+        Return the shared, capped HTTP pool for a Solana JSON-RPC endpoint.
+        Every Solana request of the agency goes through it. Must be called
+        from a running loop.
+        """
+        url = url or os.getenv('SOLANA_RPC_URL', 'https://api.mainnet-beta.solana.com')
+        return self._pool_for_loop(
+            self.rpc_pools,
+            url,
+            lambda client: client.is_closed,
+            lambda: httpx.AsyncClient(
+                timeout=self.timeout,
+                http2=self.http2,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                    keepalive_expiry=self.keepalive_expiry
+                )
+            )
+        )
+    
+    async def rpc(self, url: str, method: str, params: list):
+        """Send one JSON-RPC request through the endpoint's pool and return its result."""
+        response = await self.get_rpc_client(url).post(
+            url, json={"jsonrpc": "2.0", "id": 1, "method": method, "params": params}
+        )
+        response.raise_for_status()
+        data = response.json()
+        if "error" in data:
+            raise RuntimeError(f"{method} failed: {data['error']}")
+        return data.get("result")
+    
+    def get_solana_client(self, rpc_url: Optional[str] = None) -> AsyncClient:
+        """
+        Return the shared solana-py client for an endpoint. It keeps its own
+        connections, so the agency's requests use get_rpc_client instead;
+        this client is for occasional solana-py helpers.
+        """
+        rpc_url = rpc_url or os.getenv('SOLANA_RPC_URL', 'https://api.mainnet-beta.solana.com')
+        client = self.solana_clients.get(rpc_url)
+        if client is None:
+            client = AsyncClient(rpc_url, timeout=self.timeout)
+            self.solana_clients[rpc_url] = client
+        return client
+    
+    def get_http_session(self, url: str) -> aiohttp.ClientSession:
+        """Return the shared aiohttp session for an endpoint. Must be called from a running loop."""
+        return self._pool_for_loop(
+            self.http_sessions,
+            url,
+            lambda session: session.closed,
+            lambda: aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.max_connections,
+                    keepalive_timeout=self.keepalive_expiry
+                ),
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        )
+    
+    def get_web3(self, rpc_url: str) -> AsyncWeb3:
+        """Return the shared AsyncWeb3 client for an endpoint."""
+        web3 = self.web3_clients.get(rpc_url)
+        if web3 is None:
+            web3 = AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(rpc_url))
+            self.web3_clients[rpc_url] = web3
+        return web3
+    
+    async def pool_web3(self, web3: AsyncWeb3):
+        """
+        Give a web3 provider the shared keep-alive session for its endpoint
+        in place of its default one, which closes the connection after every request.
+        """
+        endpoint_uri = web3.provider.endpoint_uri
+        await web3.provider.cache_async_session(self.get_http_session(endpoint_uri))
+    
+    async def close(self):
+        """Close every pooled connection."""
+        loop = asyncio.get_running_loop()
+        for client in self.solana_clients.values():
+            await client.close()
+        # Pools opened on loops that have since ended went with their loop
+        for client, client_loop in self.rpc_pools.values():
+            if client_loop is loop and not client.is_closed:
+                await client.aclose()
+        for session, session_loop in self.http_sessions.values():
+            if session_loop is loop and not session.closed:
+                await session.close()
+        self.solana_clients = {}
+        self.rpc_pools = {}
+        self.http_sessions = {}
+        self.web3_clients = {}
+
+
+# Shared registry used by all tools
+rpc_clients = RpcClientRegistry()
+
+
+if __name__ == "__main__":
+    # Test that clients are shared per endpoint and reuse connections
+    from aiohttp import web
+    
+    async def test_registry():
+        peers = set()
+        
+        async def rpc(request):
+            peers.add(request.transport.get_extra_info("peername"))
+            body = await request.json()
+            return web.json_response({"jsonrpc": "2.0", "id": body["id"], "result": 42})
+        
+        app = web.Application()
+        app.router.add_post("/", rpc)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/"
+        
+        registry = RpcClientRegistry(max_connections=4)
+        assert registry.get_solana_client(url) is registry.get_solana_client(url)
+        assert registry.get_web3(url) is registry.get_web3(url)
+        
+        web3 = registry.get_web3(url)
+        await registry.pool_web3(web3)
+        for _ in range(5):
+            assert await web3.eth.block_number == 42
+        
+        print(json.dumps({"http2": registry.http2, "web3_connections": len(peers)}))
+        assert len(peers) == 1
+        
+        # Solana requests share one capped pool per endpoint
+        peers.clear()
+        assert registry.get_rpc_client(url) is registry.get_rpc_client(url)
+        results = await asyncio.gather(*(registry.rpc(url, "getSlot", []) for _ in range(20)))
+        assert results == [42] * 20
+        print(json.dumps({"solana_connections": len(peers)}))
+        assert 1 <= len(peers) <= 4
+        
+        await registry.close()
+        await runner.cleanup()
+        print("RPC client registry test passed!")
+    
+    asyncio.run(test_registry())
@@ -0,0 +1,256 @@
+import asyncio
+import bisect
+import hashlib
+import math
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from tools.EnvLoader import load_env
+from tools.MetricsRegistry import metrics
+from tools.SolanaConnectionManager import SolanaConnectionManager
+
+load_env()
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Consistent hash ring over shard indexes. Each shard owns many virtual
+    points, so keys spread evenly and adding a shard moves only about 1/N
+    of them.
+    """
+    
+    def __init__(self, shards: int, virtual_nodes: int = 128):
+        points = sorted(
+            (_hash(f"shard-{shard}-{replica}"), shard)
+            for shard in range(shards)
+            for replica in range(virtual_nodes)
+        )
+        self.hashes = [point for point, _ in points]
+        self.shards = [shard for _, shard in points]
+    
+    def preference(self, key: str):
+        """Shards in ring order starting at the key's position, each once."""
+        start = bisect.bisect(self.hashes, _hash(key))
+        seen = set()
+        for i in range(len(self.shards)):
+            shard = self.shards[(start + i) % len(self.shards)]
+            if shard not in seen:
+                seen.add(shard)
+                yield shard
+
+
+class _ShardConsumer:
+    """Consumer queue stand-in that tags a shard's messages and puts them on the merged queue."""
+    
+    def __init__(self, shard: int, merged: asyncio.Queue):
+        self.shard = shard
+        self.merged = merged
+    
+    def put_nowait(self, message: Any):
+        self.merged.put_nowait((self.shard, message))
+
+
+class ShardedSolanaConnection:
+    """
+    Spreads subscriptions over several Solana WebSocket connections. Keys
+    (e.g. wallet addresses) are placed by consistent hashing; a shard that
+    has reached its subscription limit passes keys on to the next shard on
+    the ring. Subscribing runs on all shards in parallel with a bounded
+    number of requests in flight per shard, and every shard's notifications
+    arrive on one merged queue as (shard, message) pairs. Each shard
+    reconnects on its own and reports it with (shard, Reconnected).
+    """
+    
+    def __init__(self,
+                 ws_url: Optional[str] = None,
+                 shards: int = 1,
+                 max_subscriptions_per_shard: Optional[int] = None,
+                 subscribe_concurrency: int = 50,
+                 managers: Optional[Sequence[SolanaConnectionManager]] = None):
+        self.ws_url = ws_url or os.getenv('SOLANA_WS_URL', 'wss://api.mainnet-beta.solana.com')
+        self.max_subscriptions_per_shard = max_subscriptions_per_shard or int(
+            os.getenv('WS_MAX_SUBSCRIPTIONS_PER_CONNECTION', '1000')
+        )
+        if managers:
+            self.managers = list(managers)
+        else:
+            self.managers = [SolanaConnectionManager(ws_url=self.ws_url) for _ in range(max(1, shards))]
+        self.ring = HashRing(len(self.managers))
+        self.subscribe_limits = [asyncio.Semaphore(subscribe_concurrency) for _ in self.managers]
+        self.subscription_counts = [0] * len(self.managers)
+        # key -> shard the key was placed on
+        self.placements: Dict[str, int] = {}
+        # merged queue -> its tagging consumer on each shard
+        self.shard_consumers: Dict[asyncio.Queue, List[_ShardConsumer]] = {}
+    
+    @classmethod
+    def for_keys(cls,
+                 key_count: int,
+                 shards: int = 0,
+                 shared: Optional[SolanaConnectionManager] = None,
+                 max_subscriptions_per_shard: Optional[int] = None,
+                 **options) -> "ShardedSolanaConnection":
+        """
+        Size the pool for key_count subscriptions: at least `shards`
+        connections and enough to stay under the per-shard limit. A single
+        shard reuses the shared connection when one is given.
+        """
+        limit = max_subscriptions_per_shard or int(os.getenv('WS_MAX_SUBSCRIPTIONS_PER_CONNECTION', '1000'))
+        count = max(shards, math.ceil(key_count / limit), 1)
+        if count == 1 and shared is not None:
+            options["managers"] = [shared]
+        return cls(shards=count, max_subscriptions_per_shard=limit, **options)
+    
+    @property
+    def shards(self) -> int:
+        return len(self.managers)
+    
+    async def start(self) -> bool:
+        """Connect every shard in parallel. Returns False if any shard failed to connect."""
+        results = await asyncio.gather(*(manager.start() for manager in self.managers))
+        return all(results)
+    
+    def register_consumer(self, maxsize: int = 0) -> asyncio.Queue:
+        """
+        Create the merged queue that receives (shard, message) pairs from
+        every shard; each shard puts (shard, None) when its connection closes.
+        """
+        merged = asyncio.Queue(maxsize=maxsize)
+        self.shard_consumers[merged] = [_ShardConsumer(shard, merged) for shard in range(self.shards)]
+        for manager, consumer in zip(self.managers, self.shard_consumers[merged]):
+            manager.consumers.append(consumer)
+        return merged
+    
+    def keys_on(self, shard: int) -> List[str]:
+        """Keys placed on a shard, e.g. to resubscribe them after it reconnected."""
+        return [key for key, placed in self.placements.items() if placed == shard]
+    
+    def _place(self, key: str) -> Optional[int]:
+        """Pick the key's shard: its ring owner, or the next shard with room."""
+        shard = self.placements.get(key)
+        if shard is not None:
+            return shard
+        for shard in self.ring.preference(key):
+            if self.subscription_counts[shard] < self.max_subscriptions_per_shard:
+                self.subscription_counts[shard] += 1
+                self.placements[key] = shard
+                return shard
+        return None
+    
+    async def _subscribe_one(self, consumer: asyncio.Queue, shard: int, key: str,
+                             method: str, params: List[Any]) -> Optional[int]:
+        async with self.subscribe_limits[shard]:
+            try:
+                return await self.managers[shard].subscribe(self.shard_consumers[consumer][shard], method, params)
+            except Exception as e:
+                print(f"Error subscribing {key} on shard {shard}: {e}")
+                metrics.increment("errors", "ws_subscribe")
+                return None
+    
+    async def subscribe_many(self, consumer: asyncio.Queue, method: str,
+                             requests: Sequence[Tuple[str, List[Any]]]) -> Dict[str, Tuple[int, int]]:
+        """
+        Subscribe every (key, params) request on its shard. Returns key ->
+        (shard, subscription id) for the subscriptions that succeeded.
+        """
+        placed = []
+        for key, params in requests:
+            shard = self._place(key)
+            if shard is None:
+                print(f"Error subscribing {key}: every shard is at its subscription limit")
+                metrics.increment("drops", "ws_subscribe")
+                continue
+            placed.append((key, shard, params))
+        
+        subscription_ids = await asyncio.gather(*(
+            self._subscribe_one(consumer, shard, key, method, params)
+            for key, shard, params in placed
+        ))
+        
+        subscriptions = {}
+        for (key, shard, _), subscription_id in zip(placed, subscription_ids):
+            if subscription_id is None:
+                self.subscription_counts[shard] -= 1
+                self.placements.pop(key, None)
+                continue
+            subscriptions[key] = (shard, subscription_id)
+        return subscriptions
+    
+    async def close(self):
+        """Close every shard."""
+        await asyncio.gather(*(manager.close() for manager in self.managers))
+
+
+if __name__ == "__main__":
+    # Test placement, limits and merged delivery across local WebSocket servers
+    import itertools
+    import json
+    import time
+    import websockets
+    
+    async def test_pool():
+        async def fake_node(ws):
+            # Subscription ids restart per connection, like many providers
+            subscription_ids = itertools.count(1)
+            async for raw in ws:
+                request = json.loads(raw)
+                subscription_id = next(subscription_ids)
+                await ws.send(json.dumps({"jsonrpc": "2.0", "id": request["id"], "result": subscription_id}))
+                await ws.send(json.dumps({
+                    "jsonrpc": "2.0",
+                    "method": "accountNotification",
+                    "params": {
+                        "subscription": subscription_id,
+                        "result": {"context": {"slot": 1}, "value": {"owner": request["params"][0]}}
+                    }
+                }))
+        
+        async with websockets.serve(fake_node, "127.0.0.1", 0) as server:
+            url = f"ws://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+            wallets = [f"Wallet{i}" for i in range(5000)]
+            pool = ShardedSolanaConnection.for_keys(len(wallets), ws_url=url, max_subscriptions_per_shard=1200)
+            assert pool.shards == 5
+            assert await pool.start()
+            
+            merged = pool.register_consumer()
+            started = time.perf_counter()
+            subscriptions = await pool.subscribe_many(
+                merged, "accountSubscribe", [(wallet, [wallet, {}]) for wallet in wallets]
+            )
+            elapsed = time.perf_counter() - started
+            assert len(subscriptions) == len(wallets)
+            assert max(pool.subscription_counts) <= 1200
+            
+            # Every notification arrives once on the merged queue and maps back to its wallet
+            owners = {(shard, subscription_id): wallet for wallet, (shard, subscription_id) in subscriptions.items()}
+            delivered = set()
+            while len(delivered) < len(wallets):
+                shard, message = await asyncio.wait_for(merged.get(), 5)
+                wallet = owners[(shard, message.params.subscription)]
+                assert message.params.result.value.owner == wallet
+                delivered.add(wallet)
+            
+            # Consistent hashing: a sixth shard takes over about a sixth of the wallets
+            moved = sum(
+                next(HashRing(5).preference(wallet)) != next(HashRing(6).preference(wallet))
+                for wallet in wallets
+            )
+            print(json.dumps({
+                "wallets": len(wallets),
+                "shards": pool.shards,
+                "per_shard": pool.subscription_counts,
+                "subscribe_seconds": round(elapsed, 3),
+                "moved_when_adding_shard": moved
+            }))
+            assert moved < len(wallets) / 4
+            
+            await pool.close()
+            closed = [await merged.get() for _ in range(pool.shards)]
+            assert sorted(shard for shard, message in closed if message is None) == list(range(pool.shards))
+            print("Sharded connection test passed!")
+    
+    asyncio.run(test_pool())
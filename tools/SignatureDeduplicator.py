@@ -0,0 +1,167 @@
+import hashlib
+import math
+import os
+import struct
+import time
+from typing import Dict, List, Optional, Tuple
+
+from tools.EnvLoader import load_env
+from tools.MetricsRegistry import metrics
+
+load_env()
+
+# Bits per bloom block: one 64-byte cache line
+BLOCK_BYTES = 64
+BLOCK_BITS = BLOCK_BYTES * 8
+# Bits set per signature; with one block per signature a moderate count is best
+HASH_COUNT = 12
+# The digest as the block selector followed by one 16-bit bit position per hash
+DIGEST_LAYOUT = struct.Struct(f"<Q{HASH_COUNT}H")
+SINGLE_BITS = [1 << bit for bit in range(BLOCK_BITS)]
+
+
+class SignatureDeduplicator:
+    """
+    Remembers transaction signatures so an event that arrives from several
+    sources (live notifications, a second subscription, backfill after a
+    reconnect) is handled once. Signatures of the last window_seconds are
+    kept in an exact set, where nearly all duplicates land, so they are
+    never confused. Older signatures, up to horizon_seconds, are kept in a
+    rotating blocked bloom filter. The filter is split into generations of
+    fixed size, and the oldest generation is cleared when the current one
+    has covered its share of the horizon or is full. Memory is fixed by the
+    generation capacity and the false-positive rate, whatever the traffic.
+    A lookup is one dict probe plus one 64-byte block test per generation.
+    """
+    
+    def __init__(self,
+                 window_seconds: Optional[float] = None,
+                 horizon_seconds: Optional[float] = None,
+                 generations: int = 4,
+                 generation_capacity: Optional[int] = None,
+                 false_positive_rate: Optional[float] = None,
+                 clock=time.monotonic):
+        self.window_seconds = window_seconds or float(os.getenv('DEDUP_WINDOW_SECONDS', '600'))
+        self.horizon_seconds = horizon_seconds or float(os.getenv('DEDUP_HORIZON_SECONDS', '86400'))
+        self.generation_capacity = generation_capacity or int(os.getenv('DEDUP_GENERATION_CAPACITY', '1000000'))
+        false_positive_rate = false_positive_rate or float(os.getenv('DEDUP_FALSE_POSITIVE_RATE', '1e-6'))
+        self.clock = clock
+        
+        generations = max(1, generations)
+        # A lookup tests every generation, so each gets a share of the rate.
+        # Standard bloom sizing plus half again, which the blocked layout needs
+        # to reach the target rate.
+        bits = (-self.generation_capacity * math.log(false_positive_rate / generations)
+                / math.log(2) ** 2 * 1.5)
+        self.block_count = max(1, math.ceil(bits / BLOCK_BITS))
+        self.filters: List[bytearray] = [bytearray(self.block_count * BLOCK_BYTES) for _ in range(generations)]
+        self.current = 0
+        self.generation_started: Optional[float] = None
+        self.generation_size = 0
+        # (scope, signature) -> time first seen, oldest first
+        self.recent: Dict[Tuple[str, str], float] = {}
+    
+    def _probe(self, scope: str, signature: str) -> Tuple[int, int]:
+        """Byte offset of the signature's block and the mask of its bits in that block."""
+        block, *positions = DIGEST_LAYOUT.unpack(
+            hashlib.blake2b(f"{scope}:{signature}".encode(), digest_size=DIGEST_LAYOUT.size).digest()
+        )
+        mask = 0
+        for position in positions:
+            mask |= SINGLE_BITS[position & (BLOCK_BITS - 1)]
+        return block % self.block_count * BLOCK_BYTES, mask
+    
+    def _in_filters(self, offset: int, mask: int) -> bool:
+        for bloom in self.filters:
+            if int.from_bytes(bloom[offset:offset + BLOCK_BYTES], "little") & mask == mask:
+                return True
+        return False
+    
+    def _rotate(self, now: float):
+        """Start a new generation in place of the oldest one when the current one is done."""
+        if self.generation_started is None:
+            self.generation_started = now
+        span = self.horizon_seconds / len(self.filters)
+        if now - self.generation_started < span and self.generation_size < self.generation_capacity:
+            return
+        self.current = (self.current + 1) % len(self.filters)
+        self.filters[self.current] = bytearray(self.block_count * BLOCK_BYTES)
+        self.generation_started = now
+        self.generation_size = 0
+    
+    def _expire(self, now: float):
+        """Drop signatures older than the exact window; they stay in the bloom filter."""
+        horizon = now - self.window_seconds
+        recent = self.recent
+        while recent:
+            key = next(iter(recent))
+            if recent[key] > horizon:
+                break
+            del recent[key]
+    
+    def seen(self, signature: str, scope: str = "", now: Optional[float] = None) -> bool:
+        """
+        Record a signature and return True if it was already recorded in
+        the same scope. Tools publishing on different topics use their
+        topic as scope, so one tool's events never suppress another's.
+        """
+        now = self.clock() if now is None else now
+        self._expire(now)
+        self._rotate(now)
+        key = (scope, signature)
+        if key in self.recent:
+            metrics.increment("duplicates", scope or "dedup")
+            return True
+        
+        offset, mask = self._probe(scope, signature)
+        duplicate = self._in_filters(offset, mask)
+        self.recent[key] = now
+        if duplicate:
+            metrics.increment("duplicates", scope or "dedup")
+            return True
+        
+        bloom = self.filters[self.current]
+        block = int.from_bytes(bloom[offset:offset + BLOCK_BYTES], "little") | mask
+        bloom[offset:offset + BLOCK_BYTES] = block.to_bytes(BLOCK_BYTES, "little")
+        self.generation_size += 1
+        return False
+    
+    def memory_bytes(self) -> int:
+        """Size of the bloom generations; the exact window adds about 200 bytes per recent signature."""
+        return sum(len(bloom) for bloom in self.filters)
+
+
+if __name__ == "__main__":
+    # Test exact and bloom-backed duplicates, scopes and rotation on a virtual clock
+    import json
+    import os as _os
+    
+    dedup = SignatureDeduplicator(window_seconds=60, horizon_seconds=400, generations=4,
+                                  generation_capacity=200000, false_positive_rate=1e-6)
+    signatures = [_os.urandom(64).hex() for _ in range(400000)]
+    
+    assert not dedup.seen(signatures[0], "wallet_transactions", now=0)
+    assert dedup.seen(signatures[0], "wallet_transactions", now=1)
+    # Another topic sees the same signature independently
+    assert not dedup.seen(signatures[0], "solana_transactions", now=1)
+    
+    # Past the exact window the bloom filter still remembers it
+    assert dedup.seen(signatures[0], "wallet_transactions", now=120)
+    # Past the whole horizon it is forgotten
+    dedup.seen(signatures[1], now=250)
+    dedup.seen(signatures[2], now=350)
+    dedup.seen(signatures[3], now=450)
+    assert not dedup.seen(signatures[0], "wallet_transactions", now=560)
+    
+    # Hot-path cost and false positives at full generations
+    started = time.perf_counter()
+    false_positives = sum(dedup.seen(signature, now=600) for signature in signatures[10:])
+    elapsed = time.perf_counter() - started
+    print(json.dumps({
+        "checked": len(signatures) - 10,
+        "false_positives": false_positives,
+        "us_per_check": round(elapsed / (len(signatures) - 10) * 1e6, 2),
+        "bloom_mb": round(dedup.memory_bytes() / 1e6, 1)
+    }))
+    assert false_positives <= 2
+    print("Signature deduplicator test passed!")
@@ -0,0 +1,186 @@
+import json
+from typing import Any, Dict, List, Optional, Type, Union
+
+import msgspec
+
+
+class RpcError(msgspec.Struct):
+    code: int = 0
+    message: str = ""
+
+
+class RpcResponse(msgspec.Struct):
+    """Response to a request sent over the socket (e.g. a subscribe confirmation)."""
+    id: int
+    result: Any = None
+    error: Optional[RpcError] = None
+
+
+class NotificationContext(msgspec.Struct):
+    slot: int = 0
+
+
+class AccountValue(msgspec.Struct):
+    lamports: int = 0
+    owner: str = ""
+    data: Any = None
+    executable: bool = False
+    rentEpoch: int = 0
+    space: Optional[int] = None
+
+
+class AccountResult(msgspec.Struct):
+    context: NotificationContext
+    value: AccountValue
+
+
+class AccountNotificationParams(msgspec.Struct):
+    subscription: int
+    result: AccountResult
+
+
+class AccountNotification(msgspec.Struct):
+    method: str
+    params: AccountNotificationParams
+
+
+class LogsValue(msgspec.Struct):
+    signature: str
+    err: Any = None
+    logs: List[str] = []
+
+
+class LogsResult(msgspec.Struct):
+    context: NotificationContext
+    value: LogsValue
+
+
+class LogsNotificationParams(msgspec.Struct):
+    subscription: int
+    result: LogsResult
+
+
+class LogsNotification(msgspec.Struct):
+    method: str
+    params: LogsNotificationParams
+
+
+class SolanaCodec:
+    """
+    Decodes Solana WebSocket messages into typed structs.
+    Oversized messages and notifications whose method has no registered
+    struct are rejected with a substring check before any parsing. The
+    "msgspec" backend decodes straight into structs without building
+    intermediate dicts; the "json" backend goes through the stdlib parser.
+    """
+    
+    BACKENDS = ("msgspec", "json")
+    
+    def __init__(self, backend: str = "msgspec", max_message_size: int = 1 << 20):
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unsupported codec backend: {backend}")
+        self.backend = backend
+        self.max_message_size = max_message_size
+        self.notification_types: Dict[str, Type[msgspec.Struct]] = {}
+        self.decoders: Dict[str, msgspec.json.Decoder] = {}
+        # method -> (text marker, bytes marker) used to reject messages before parsing
+        self.markers: Dict[str, tuple] = {}
+        self.response_decoder = msgspec.json.Decoder(RpcResponse)
+        self.rejected = 0
+        
+        self.register_notification("accountNotification", AccountNotification)
+        self.register_notification("logsNotification", LogsNotification)
+    
+    def register_notification(self, method: str, struct_type: Type[msgspec.Struct]):
+        """Accept notifications of a method and decode them into struct_type."""
+        self.notification_types[method] = struct_type
+        self.decoders[method] = msgspec.json.Decoder(struct_type)
+        self.markers[method] = (f'"{method}"', f'"{method}"'.encode())
+    
+    def _decode(self, raw: Union[str, bytes], struct_type: Type[msgspec.Struct], decoder: msgspec.json.Decoder):
+        """Decode raw into struct_type with the configured backend."""
+        if self.backend == "json":
+            return msgspec.convert(json.loads(raw), struct_type)
+        return decoder.decode(raw)
+    
+    def decode(self, raw: Union[str, bytes]) -> Optional[msgspec.Struct]:
+        """Decode a raw message, or return None if it is rejected or malformed."""
+        if len(raw) > self.max_message_size:
+            self.rejected += 1
+            return None
+        
+        marker_index = 0 if isinstance(raw, str) else 1
+        try:
+            for method, markers in self.markers.items():
+                if markers[marker_index] in raw:
+                    return self._decode(raw, self.notification_types[method], self.decoders[method])
+            
+            # Anything else is only of interest if it answers one of our requests
+            if ('"method"', b'"method"')[marker_index] in raw:
+                self.rejected += 1
+                return None
+            return self._decode(raw, RpcResponse, self.response_decoder)
+        
+        except (msgspec.ValidationError, msgspec.DecodeError, ValueError) as e:
+            print(f"Error decoding WebSocket message: {e}")
+            self.rejected += 1
+            return None
+    
+    def encode(self, message: Dict) -> bytes:
+        """Encode an outgoing JSON-RPC message."""
+        if self.backend == "json":
+            return json.dumps(message).encode()
+        return msgspec.json.encode(message)
+
+
+if __name__ == "__main__":
+    # Test the codec with both backends
+    account_msg = json.dumps({
+        "jsonrpc": "2.0",
+        "method": "accountNotification",
+        "params": {
+            "subscription": 23784,
+            "result": {
+                "context": {"slot": 5199307},
+                "value": {
+                    "lamports": 33594,
+                    "owner": "11111111111111111111111111111111",
+                    "data": ["", "base64"],
+                    "executable": False,
+                    "rentEpoch": 635,
+                    "space": 80
+                }
+            }
+        }
+    })
+    logs_msg = json.dumps({
+        "jsonrpc": "2.0",
+        "method": "logsNotification",
+        "params": {
+            "subscription": 24040,
+            "result": {
+                "context": {"slot": 5208469},
+                "value": {"signature": "5h6xBEauJ3PK6SWC", "err": None, "logs": ["Program log: hi"]}
+            }
+        }
+    })
+    
+    for backend in SolanaCodec.BACKENDS:
+        codec = SolanaCodec(backend=backend, max_message_size=4096)
+        
+        account = codec.decode(account_msg)
+        assert isinstance(account, AccountNotification)
+        assert account.params.subscription == 23784
+        assert account.params.result.value.lamports == 33594
+        
+        logs = codec.decode(logs_msg.encode())
+        assert isinstance(logs, LogsNotification)
+        assert logs.params.result.value.signature == "5h6xBEauJ3PK6SWC"
+        
+        response = codec.decode('{"jsonrpc": "2.0", "result": 23784, "id": 1}')
+        assert isinstance(response, RpcResponse) and response.result == 23784
+        
+        assert codec.decode('{"jsonrpc": "2.0", "method": "slotNotification", "params": {}}') is None
+        assert codec.decode("x" * 5000) is None
+        assert codec.rejected == 2
+        print(f"{backend} codec test passed!")
@@ -0,0 +1,258 @@
+import asyncio
+import itertools
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import websockets
+
+from tools.EnvLoader import load_env
+from tools.MetricsRegistry import metrics
+from tools.SolanaCodec import SolanaCodec, RpcResponse
+
+load_env()
+
+
+class Reconnected:
+    """
+    Queued for every consumer after a dropped connection is re-established.
+    Subscriptions do not survive a reconnect, so consumers resubscribe and
+    backfill what happened between disconnected_at and reconnected_at.
+    """
+    
+    __slots__ = ("disconnected_at", "reconnected_at")
+    
+    def __init__(self, disconnected_at: float, reconnected_at: float):
+        # Wall-clock seconds, comparable with block times
+        self.disconnected_at = disconnected_at
+        self.reconnected_at = reconnected_at
+
+
+class SolanaConnectionManager:
+    """
+    Single multiplexed Solana WebSocket connection shared by all tools.
+    Every subscribe request gets a unique JSON-RPC id, confirmations are
+    matched back to the caller, and one reader task routes notifications to
+    the consumer queue registered for each subscription id. A dropped
+    connection is re-established with exponential backoff and consumers
+    are told to resubscribe with a Reconnected message.
+    """
+    
+    def __init__(self,
+                 ws_url: Optional[str] = None,
+                 confirm_timeout: float = 10.0,
+                 codec: Optional[SolanaCodec] = None,
+                 reconnect: Optional[bool] = None,
+                 reconnect_delay: float = 0.5,
+                 max_reconnect_delay: Optional[float] = None):
+        self.ws_url = ws_url or os.getenv('SOLANA_WS_URL', 'wss://api.mainnet-beta.solana.com')
+        self.codec = codec or SolanaCodec(backend=os.getenv('SOLANA_WS_CODEC', 'msgspec'))
+        self.confirm_timeout = confirm_timeout
+        if reconnect is None:
+            reconnect = os.getenv('WS_RECONNECT', 'true').lower() == 'true'
+        self.reconnect = reconnect
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay or float(os.getenv('WS_MAX_RECONNECT_DELAY', '30'))
+        # Set by close(); stops reconnecting
+        self.closing = asyncio.Event()
+        self.ws_client = None
+        self.reader_task: Optional[asyncio.Task] = None
+        self.request_ids = itertools.count(1)
+        # request id -> (future resolved with the response, consumer queue or None)
+        self.pending_requests: Dict[int, tuple] = {}
+        # subscription id -> consumer queue
+        self.subscriptions: Dict[int, asyncio.Queue] = {}
+        self.consumers: List[asyncio.Queue] = []
+        self.start_lock = asyncio.Lock()
+    
+    async def start(self) -> bool:
+        """Connect and start the reader task. Safe to call from every tool."""
+        async with self.start_lock:
+            if self.reader_task and not self.reader_task.done():
+                return True
+            self.closing.clear()
+            try:
+                self.ws_client = await websockets.connect(self.ws_url)
+            except Exception as e:
+                print(f"Error connecting to WebSocket: {e}")
+                return False
+            self.reader_task = asyncio.create_task(self._read_loop())
+            return True
+    
+    def register_consumer(self, maxsize: int = 0) -> asyncio.Queue:
+        """Create a queue that will receive the notifications of a consumer's subscriptions."""
+        queue = asyncio.Queue(maxsize=maxsize)
+        self.consumers.append(queue)
+        return queue
+    
+    async def _request(self, method: str, params: List[Any], consumer: Optional[asyncio.Queue] = None) -> Any:
+        """Send a JSON-RPC request over the socket and wait for its response."""
+        request_id = next(self.request_ids)
+        future = asyncio.get_running_loop().create_future()
+        self.pending_requests[request_id] = (future, consumer)
+        try:
+            await self.ws_client.send(self.codec.encode({
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "method": method,
+                "params": params
+            }).decode())
+            return await asyncio.wait_for(future, self.confirm_timeout)
+        finally:
+            self.pending_requests.pop(request_id, None)
+    
+    async def subscribe(self, consumer: asyncio.Queue, method: str, params: List[Any]) -> int:
+        """Subscribe on behalf of a consumer and return the subscription id."""
+        return await self._request(method, params, consumer)
+    
+    async def unsubscribe(self, method: str, subscription_id: int) -> bool:
+        """Cancel a subscription (e.g. method="accountUnsubscribe")."""
+        self.subscriptions.pop(subscription_id, None)
+        return await self._request(method, [subscription_id])
+    
+    def _dispatch(self, message: Any):
+        """Route a decoded message to a pending request or a subscription consumer."""
+        if isinstance(message, RpcResponse):
+            pending = self.pending_requests.get(message.id)
+            if not pending:
+                return
+            future, consumer = pending
+            if future.done():
+                return
+            if message.error is not None:
+                future.set_exception(RuntimeError(message.error.message or "RPC error"))
+                return
+            if consumer is not None:
+                # Register before resolving so no notification can race the mapping
+                self.subscriptions[message.result] = consumer
+            future.set_result(message.result)
+            return
+        
+        consumer = self.subscriptions.get(message.params.subscription)
+        if consumer is not None:
+            consumer.put_nowait(message)
+    
+    async def _read_messages(self):
+        """Read and dispatch messages until the socket closes."""
+        try:
+            async for msg in self.ws_client:
+                received_at = time.perf_counter()
+                try:
+                    # Rejected and malformed messages decode to None
+                    message = self.codec.decode(msg)
+                    metrics.observe("decode", time.perf_counter() - received_at)
+                    if message is None:
+                        metrics.increment("drops", "decode")
+                    else:
+                        self._dispatch(message)
+                    # Decode plus routing to the consumer; the frame has already been received
+                    metrics.observe("ws_dispatch", time.perf_counter() - received_at)
+                except Exception as e:
+                    print(f"Error dispatching WebSocket message: {e}")
+                    metrics.increment("errors", "ws_dispatch")
+        except Exception as e:
+            print(f"Error in WebSocket reader: {e}")
+        finally:
+            for future, _ in self.pending_requests.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("WebSocket connection closed"))
+            self.subscriptions = {}
+    
+    async def _reconnect(self) -> bool:
+        """Reconnect with exponential backoff. Returns False once close() is called."""
+        delay = self.reconnect_delay
+        while not self.closing.is_set():
+            try:
+                self.ws_client = await websockets.connect(self.ws_url)
+                return True
+            except Exception as e:
+                print(f"Error reconnecting to WebSocket, retrying in {delay:.1f}s: {e}")
+                metrics.increment("errors", "ws_reconnect")
+            try:
+                await asyncio.wait_for(self.closing.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            delay = min(delay * 2, self.max_reconnect_delay)
+        return False
+    
+    async def _read_loop(self):
+        """Single reader for the shared socket, reconnecting when it drops."""
+        try:
+            while True:
+                await self._read_messages()
+                if not self.reconnect or self.closing.is_set():
+                    break
+                disconnected_at = time.time()
+                print("WebSocket connection lost, reconnecting")
+                if not await self._reconnect():
+                    break
+                metrics.increment("reconnects", "ws")
+                reconnected = Reconnected(disconnected_at, time.time())
+                for consumer in self.consumers:
+                    consumer.put_nowait(reconnected)
+        finally:
+            # Signal end of stream to every consumer
+            for consumer in self.consumers:
+                consumer.put_nowait(None)
+    
+    async def close(self):
+        """Close the shared connection and stop the reader."""
+        self.closing.set()
+        if self.ws_client:
+            await self.ws_client.close()
+        if self.reader_task:
+            await asyncio.gather(self.reader_task, return_exceptions=True)
+
+
+if __name__ == "__main__":
+    # Test subscription-id routing against a local WebSocket server
+    import json
+    
+    async def test_manager():
+        async def fake_node(ws):
+            subscription_ids = itertools.count(100)
+            async for raw in ws:
+                request = json.loads(raw)
+                subscription_id = next(subscription_ids)
+                await ws.send(json.dumps({"jsonrpc": "2.0", "id": request["id"], "result": subscription_id}))
+                await ws.send(json.dumps({
+                    "jsonrpc": "2.0",
+                    "method": "accountNotification",
+                    "params": {
+                        "subscription": subscription_id,
+                        "result": {"context": {"slot": 1}, "value": {"owner": request["params"][0]}}
+                    }
+                }))
+        
+        async with websockets.serve(fake_node, "127.0.0.1", 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            manager = SolanaConnectionManager(ws_url=f"ws://127.0.0.1:{port}")
+            assert await manager.start()
+            
+            wallet_queue = manager.register_consumer()
+            monitor_queue = manager.register_consumer()
+            ids = await asyncio.gather(
+                manager.subscribe(wallet_queue, "accountSubscribe", ["WalletA", {}]),
+                manager.subscribe(monitor_queue, "accountSubscribe", ["WalletB", {}])
+            )
+            assert len(set(ids)) == 2
+            
+            wallet_msg = await asyncio.wait_for(wallet_queue.get(), 1)
+            monitor_msg = await asyncio.wait_for(monitor_queue.get(), 1)
+            assert wallet_msg.params.result.value.owner == "WalletA"
+            assert monitor_msg.params.result.value.owner == "WalletB"
+            
+            # A dropped connection comes back and consumers are told to resubscribe
+            await manager.ws_client.close()
+            assert isinstance(await asyncio.wait_for(wallet_queue.get(), 5), Reconnected)
+            assert isinstance(await asyncio.wait_for(monitor_queue.get(), 5), Reconnected)
+            assert manager.subscriptions == {}
+            await manager.subscribe(wallet_queue, "accountSubscribe", ["WalletA", {}])
+            wallet_msg = await asyncio.wait_for(wallet_queue.get(), 1)
+            assert wallet_msg.params.result.value.owner == "WalletA"
+            
+            await manager.close()
+            assert await wallet_queue.get() is None
+            print("Connection manager test passed!")
+    
+    asyncio.run(test_manager())
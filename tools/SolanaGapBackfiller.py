@@ -0,0 +1,254 @@
+import asyncio
+import json
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from tools.EnvLoader import load_env
+from tools.MetricsRegistry import metrics
+from tools.RpcClientRegistry import rpc_clients
+from tools.SolanaTransactionFetcher import SolanaTransactionFetcher
+
+load_env()
+
+
+class WalletGap:
+    """
+    Where a wallet's missed history starts: after its last seen signature
+    when known, otherwise after its last seen slot, otherwise after a
+    wall-clock time (block times are in seconds).
+    """
+    
+    __slots__ = ("until_signature", "after_slot", "after_time")
+    
+    def __init__(self,
+                 until_signature: Optional[str] = None,
+                 after_slot: Optional[int] = None,
+                 after_time: Optional[float] = None):
+        self.until_signature = until_signature
+        self.after_slot = after_slot
+        self.after_time = after_time
+    
+    def covers(self, entry: Dict) -> bool:
+        """Whether a getSignaturesForAddress entry falls inside the gap."""
+        if self.after_slot is not None and entry.get("slot", 0) <= self.after_slot:
+            return False
+        block_time = entry.get("blockTime")
+        if self.after_time is not None and block_time is not None and block_time < self.after_time:
+            return False
+        return True
+
+
+class SolanaGapBackfiller:
+    """
+    Recovers the transactions of many wallets after a WebSocket outage.
+    The signature history of every wallet is paged with batched
+    getSignaturesForAddress requests (one HTTP round-trip per batch of
+    wallets, not per wallet), the transactions are fetched through the
+    batching SolanaTransactionFetcher, and everything comes back in slot
+    order so it can be replayed before live traffic resumes.
+    """
+    
+    def __init__(self,
+                 rpc_url: Optional[str] = None,
+                 fetcher: Optional[SolanaTransactionFetcher] = None,
+                 wallets_per_request: int = 50,
+                 page_size: int = 1000,
+                 max_concurrent_requests: int = 4,
+                 max_signatures_per_wallet: Optional[int] = None):
+        self.rpc_url = rpc_url or os.getenv('SOLANA_RPC_URL', 'https://api.mainnet-beta.solana.com')
+        self.fetcher = fetcher or SolanaTransactionFetcher(rpc_url=self.rpc_url, max_concurrent_batches=8)
+        self.wallets_per_request = max(1, wallets_per_request)
+        self.page_size = min(max(1, page_size), 1000)
+        self.request_semaphore = asyncio.Semaphore(max_concurrent_requests)
+        self.max_signatures_per_wallet = max_signatures_per_wallet or int(
+            os.getenv('BACKFILL_MAX_SIGNATURES_PER_WALLET', '5000')
+        )
+    
+    async def _post(self, body: List[Dict]) -> List[Dict]:
+        """POST a JSON-RPC batch and return the decoded responses."""
+        async with self.request_semaphore:
+            response = await rpc_clients.get_rpc_client(self.rpc_url).post(self.rpc_url, json=body)
+            response.raise_for_status()
+            data = response.json()
+        return data if isinstance(data, list) else [data]
+    
+    async def _signature_pages(self, cursors: Dict[str, Tuple[WalletGap, Optional[str]]]) -> Dict[str, List[Dict]]:
+        """
+        Fetch one page of signatures, newest first, for every wallet in
+        cursors (wallet -> (gap, before signature)) with batched requests.
+        """
+        wallets = list(cursors)
+        chunks = [wallets[i:i + self.wallets_per_request] for i in range(0, len(wallets), self.wallets_per_request)]
+        
+        async def fetch_chunk(chunk: List[str]) -> Dict[str, List[Dict]]:
+            body = []
+            for i, wallet in enumerate(chunk):
+                gap, before = cursors[wallet]
+                options = {"limit": self.page_size, "commitment": "confirmed"}
+                if gap.until_signature:
+                    options["until"] = gap.until_signature
+                if before:
+                    options["before"] = before
+                body.append({
+                    "jsonrpc": "2.0",
+                    "id": i,
+                    "method": "getSignaturesForAddress",
+                    "params": [wallet, options]
+                })
+            pages = {}
+            try:
+                for response in await self._post(body):
+                    if "error" in response:
+                        print(f"Error fetching signatures: {response['error']}")
+                        metrics.increment("errors", "backfill_signatures")
+                        continue
+                    pages[chunk[response.get("id")]] = response.get("result") or []
+            except Exception as e:
+                print(f"Error fetching signature batch: {e}")
+                metrics.increment("errors", "backfill_signatures")
+            return pages
+        
+        pages = {}
+        for result in await asyncio.gather(*(fetch_chunk(chunk) for chunk in chunks)):
+            pages.update(result)
+        return pages
+    
+    async def missed_signatures(self, gaps: Dict[str, WalletGap]) -> Dict[str, List[Dict]]:
+        """Signature entries inside each wallet's gap, oldest first. Failed transactions are skipped."""
+        found: Dict[str, List[Dict]] = {wallet: [] for wallet in gaps}
+        cursors = {wallet: (gap, None) for wallet, gap in gaps.items()}
+        while cursors:
+            pages = await self._signature_pages(cursors)
+            next_cursors = {}
+            for wallet, page in pages.items():
+                gap, _ = cursors[wallet]
+                inside = [entry for entry in page if gap.covers(entry)]
+                found[wallet].extend(inside)
+                # Pages are newest first; stop at the first entry before the gap
+                if (len(page) == self.page_size and len(inside) == len(page)
+                        and len(found[wallet]) < self.max_signatures_per_wallet):
+                    next_cursors[wallet] = (gap, page[-1]["signature"])
+            cursors = next_cursors
+        
+        return {
+            wallet: [entry for entry in reversed(entries[:self.max_signatures_per_wallet]) if entry.get("err") is None]
+            for wallet, entries in found.items()
+        }
+    
+    async def backfill(self, gaps: Dict[str, WalletGap]) -> List[Dict]:
+        """
+        Return the transactions every wallet missed as dicts with wallet,
+        signature, slot, block_time and transaction, sorted by slot. A
+        transaction touching several wallets is returned once per wallet.
+        """
+        if not gaps:
+            return []
+        started = time.perf_counter()
+        missed = await self.missed_signatures(gaps)
+        
+        entries = []
+        for wallet, signatures in missed.items():
+            for order, entry in enumerate(signatures):
+                entries.append((entry.get("slot", 0), order, wallet, entry))
+        # Oldest first; within a slot keep each wallet's own history order
+        entries.sort(key=lambda item: (item[0], item[1]))
+        
+        # The fetcher batches the lookups and fetches shared signatures once
+        transactions = await asyncio.gather(*(
+            self.fetcher.fetch(entry["signature"]) for _, _, _, entry in entries
+        ))
+        
+        replay = []
+        for (slot, _, wallet, entry), transaction in zip(entries, transactions):
+            if transaction is None:
+                metrics.increment("drops", "backfill")
+                continue
+            replay.append({
+                "wallet": wallet,
+                "signature": entry["signature"],
+                "slot": slot,
+                "block_time": entry.get("blockTime"),
+                "transaction": transaction
+            })
+        metrics.observe("backfill", time.perf_counter() - started)
+        return replay
+
+
+if __name__ == "__main__":
+    # Test paging, gap bounds and slot ordering against a local JSON-RPC server
+    from aiohttp import web
+    
+    async def test_backfiller():
+        wallets = [f"Wallet{i}" for i in range(100)]
+        # 60 transactions per wallet over the outage, one slot apart, newest last
+        history = {
+            wallet: [
+                {"signature": f"{wallet}-{n}", "slot": 1000 + n * 3 + i % 3, "blockTime": 1700000000 + n,
+                 "err": {"InstructionError": []} if n == 7 else None}
+                for n in range(60)
+            ]
+            for i, wallet in enumerate(wallets)
+        }
+        requests = []
+        
+        async def rpc(request):
+            body = await request.json()
+            requests.append(body[0]["method"])
+            # Round-trip latency of a remote provider
+            await asyncio.sleep(0.02)
+            responses = []
+            for req in body:
+                if req["method"] == "getSignaturesForAddress":
+                    wallet, options = req["params"]
+                    newest_first = list(reversed(history[wallet]))
+                    signatures = [entry["signature"] for entry in newest_first]
+                    start = signatures.index(options["before"]) + 1 if "before" in options else 0
+                    end = signatures.index(options["until"]) if options.get("until") in signatures else len(signatures)
+                    result = newest_first[start:end][:options["limit"]]
+                else:
+                    result = {"signature": req["params"][0]}
+                responses.append({"jsonrpc": "2.0", "id": req["id"], "result": result})
+            return web.json_response(responses)
+        
+        app = web.Application()
+        app.router.add_post("/", rpc)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/"
+        
+        backfiller = SolanaGapBackfiller(rpc_url=url, page_size=25)
+        gaps = {wallet: WalletGap(after_slot=1000 + 9 + i % 3) for i, wallet in enumerate(wallets)}
+        # Known last signatures bound the gap exactly
+        gaps["Wallet0"] = WalletGap(until_signature="Wallet0-49")
+        gaps["Wallet1"] = WalletGap(after_time=1700000055)
+        
+        started = time.perf_counter()
+        replay = await backfiller.backfill(gaps)
+        elapsed = time.perf_counter() - started
+        
+        per_wallet = {}
+        for item in replay:
+            per_wallet.setdefault(item["wallet"], []).append(item["signature"])
+        assert per_wallet["Wallet0"] == [f"Wallet0-{n}" for n in range(50, 60)]
+        assert per_wallet["Wallet1"] == [f"Wallet1-{n}" for n in range(55, 60)]
+        # Slots after the last seen one (n > 3), without the failed transaction
+        assert per_wallet["Wallet2"] == [f"Wallet2-{n}" for n in range(4, 60) if n != 7]
+        assert [item["slot"] for item in replay] == sorted(item["slot"] for item in replay)
+        assert all(item["transaction"]["signature"] == item["signature"] for item in replay)
+        
+        print(json.dumps({
+            "wallets": len(wallets),
+            "transactions": len(replay),
+            "signature_requests": requests.count("getSignaturesForAddress"),
+            "transaction_requests": requests.count("getTransaction"),
+            "seconds": round(elapsed, 3)
+        }))
+        await backfiller.fetcher.close()
+        await rpc_clients.close()
+        await runner.cleanup()
+        print("Gap backfiller test passed!")
+    
+    asyncio.run(test_backfiller())
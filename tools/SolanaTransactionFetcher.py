@@ -0,0 +1,180 @@
+import asyncio
+import json
+import os
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+
+from tools.EnvLoader import load_env
+from tools.RpcClientRegistry import rpc_clients
+
+load_env()
+
+
+class SolanaTransactionFetcher:
+    """
+    Coalesces getTransaction lookups into JSON-RPC batch requests.
+    Pending signatures are flushed when a batch fills up or after a short
+    deadline, several batches may be in flight at once, and an LRU of
+    fetched transactions keeps duplicate signatures off the network.
+    """
+    
+    def __init__(self,
+                 rpc_url: Optional[str] = None,
+                 batch_size: int = 20,
+                 flush_interval: float = 0.01,
+                 max_concurrent_batches: int = 4,
+                 cache_size: int = 10000):
+        self.rpc_url = rpc_url or os.getenv('SOLANA_RPC_URL', 'https://api.mainnet-beta.solana.com')
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.cache_size = cache_size
+        self.batch_semaphore = asyncio.Semaphore(max_concurrent_batches)
+        self.cache: "OrderedDict[str, Dict]" = OrderedDict()
+        # signature -> future shared by every caller waiting on it
+        self.in_flight: Dict[str, asyncio.Future] = {}
+        self.pending: List[str] = []
+        self.flush_handle: Optional[asyncio.TimerHandle] = None
+        self.batch_tasks = set()
+    
+    async def fetch(self, signature: str) -> Optional[Dict]:
+        """Return the parsed transaction for a signature, batching the RPC call."""
+        cached = self.cache.get(signature)
+        if cached is not None:
+            self.cache.move_to_end(signature)
+            return cached
+        
+        future = self.in_flight.get(signature)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self.in_flight[signature] = future
+            self.pending.append(signature)
+            if len(self.pending) >= self.batch_size:
+                self._flush()
+            elif self.flush_handle is None:
+                self.flush_handle = asyncio.get_running_loop().call_later(self.flush_interval, self._flush)
+        
+        return await asyncio.shield(future)
+    
+    def _flush(self):
+        """Send all pending signatures as batches."""
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        
+        while self.pending:
+            batch = self.pending[:self.batch_size]
+            del self.pending[:self.batch_size]
+            task = asyncio.create_task(self._send_batch(batch))
+            self.batch_tasks.add(task)
+            task.add_done_callback(self.batch_tasks.discard)
+    
+    async def _post(self, body: List[Dict]) -> List[Dict]:
+        """POST a JSON-RPC batch and return the decoded responses."""
+        response = await rpc_clients.get_rpc_client(self.rpc_url).post(self.rpc_url, json=body)
+        response.raise_for_status()
+        data = response.json()
+        # Some providers answer a single-element batch with a bare object
+        return data if isinstance(data, list) else [data]
+    
+    async def _send_batch(self, batch: List[str]):
+        """Fetch one batch of signatures and resolve their futures."""
+        body = [
+            {
+                "jsonrpc": "2.0",
+                "id": i,
+                "method": "getTransaction",
+                "params": [
+                    signature,
+                    # Signatures come from confirmed sources; the default (finalized) lags them by ~13s
+                    {"encoding": "jsonParsed", "maxSupportedTransactionVersion": 0, "commitment": "confirmed"}
+                ]
+            }
+            for i, signature in enumerate(batch)
+        ]
+        
+        results: Dict[int, Optional[Dict]] = {}
+        try:
+            async with self.batch_semaphore:
+                for response in await self._post(body):
+                    if "error" in response:
+                        print(f"Error fetching transaction: {response['error']}")
+                        continue
+                    results[response.get("id")] = response.get("result")
+        except Exception as e:
+            print(f"Error fetching transaction batch: {e}")
+        
+        for i, signature in enumerate(batch):
+            result = results.get(i)
+            if result is not None:
+                self.remember(signature, result)
+            future = self.in_flight.pop(signature, None)
+            if future is not None and not future.done():
+                future.set_result(result)
+    
+    def remember(self, signature: str, transaction: Dict):
+        """Store a transaction in the LRU cache, e.g. one known from a recording."""
+        self.cache[signature] = transaction
+        self.cache.move_to_end(signature)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+    
+    async def close(self):
+        """Wait for in-flight batches. The pooled HTTP session is owned by the client registry."""
+        self._flush()
+        if self.batch_tasks:
+            await asyncio.gather(*self.batch_tasks, return_exceptions=True)
+
+
+if __name__ == "__main__":
+    # Test batching and deduplication against a local JSON-RPC server
+    from aiohttp import web
+    
+    async def test_fetcher():
+        batch_sizes = []
+        
+        async def rpc(request):
+            body = await request.json()
+            batch_sizes.append(len(body))
+            responses = []
+            for req in body:
+                signature, options = req["params"]
+                # Fresh transactions are confirmed but not yet finalized
+                finalized = not signature.startswith("fresh")
+                visible = finalized or options.get("commitment") in ("confirmed", "processed")
+                responses.append({
+                    "jsonrpc": "2.0",
+                    "id": req["id"],
+                    "result": {"signature": signature} if visible else None
+                })
+            return web.json_response(responses)
+        
+        app = web.Application()
+        app.router.add_post("/", rpc)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        
+        fetcher = SolanaTransactionFetcher(rpc_url=f"http://127.0.0.1:{port}/", batch_size=10)
+        signatures = [f"sig{i % 25}" for i in range(50)]
+        results = await asyncio.gather(*(fetcher.fetch(signature) for signature in signatures))
+        assert [r["signature"] for r in results] == signatures
+        assert sum(batch_sizes) == 25
+        
+        # Already-fetched signatures are served from the cache
+        await fetcher.fetch("sig3")
+        assert sum(batch_sizes) == 25
+        
+        # Transactions seen on confirmed subscriptions are found before they finalize
+        fresh = await asyncio.gather(*(fetcher.fetch(f"fresh{i}") for i in range(5)))
+        assert [r["signature"] for r in fresh] == [f"fresh{i}" for i in range(5)]
+        
+        print(json.dumps({"batches": batch_sizes}))
+        await fetcher.close()
+        await rpc_clients.close()
+        await runner.cleanup()
+        print("Transaction fetcher test passed!")
+    
+    asyncio.run(test_fetcher())
@@ -0,0 +1,106 @@
+from decimal import Decimal
+from typing import Dict, Iterable, List
+import json
+from web3 import Web3
+
+
+class EvmTransactionFilter:
+    """
+    Filter rules for one EVM chain, compiled once into hashed address and
+    selector sets and an integer wei threshold so that checking a
+    transaction costs the same for ten watched contracts as for thousands.
+    An empty rule set matches everything.
+    """
+    
+    def __init__(self,
+                 to_addresses: Iterable[str] = (),
+                 from_addresses: Iterable[str] = (),
+                 method_selectors: Iterable[str] = (),
+                 min_value_wei: int = 0):
+        self.to_addresses = frozenset(address.lower() for address in to_addresses)
+        self.from_addresses = frozenset(address.lower() for address in from_addresses)
+        self.method_selectors = frozenset(
+            bytes.fromhex(selector[2:] if selector.startswith("0x") else selector)
+            for selector in method_selectors
+        )
+        self.min_value_wei = int(min_value_wei)
+    
+    @classmethod
+    def from_config(cls,
+                    to_addresses: Iterable[str] = (),
+                    from_addresses: Iterable[str] = (),
+                    method_selectors: Iterable[str] = (),
+                    min_value: float = 0.0) -> "EvmTransactionFilter":
+        """Compile a filter from human-readable settings, with min_value in ether."""
+        return cls(
+            to_addresses=to_addresses,
+            from_addresses=from_addresses,
+            method_selectors=method_selectors,
+            min_value_wei=Web3.to_wei(Decimal(str(min_value)), 'ether')
+        )
+    
+    def matches(self, transaction: Dict) -> bool:
+        """Check a single transaction against the compiled rules."""
+        if transaction["value"] < self.min_value_wei:
+            return False
+        
+        # Contract creations have no recipient and are not excluded by the recipient rule
+        to_address = transaction.get("to")
+        if self.to_addresses and to_address and to_address.lower() not in self.to_addresses:
+            return False
+        
+        if self.from_addresses and transaction["from"].lower() not in self.from_addresses:
+            return False
+        
+        if self.method_selectors and bytes(transaction.get("input") or b"")[:4] not in self.method_selectors:
+            return False
+        
+        return True
+    
+    def filter_block(self, transactions: Iterable[Dict]) -> List[Dict]:
+        """Return the transactions of a block that match the compiled rules."""
+        min_value_wei = self.min_value_wei
+        candidates = [tx for tx in transactions if tx["value"] >= min_value_wei]
+        
+        if self.to_addresses:
+            to_addresses = self.to_addresses
+            candidates = [
+                tx for tx in candidates
+                if not tx.get("to") or tx["to"].lower() in to_addresses
+            ]
+        
+        if self.from_addresses:
+            from_addresses = self.from_addresses
+            candidates = [tx for tx in candidates if tx["from"].lower() in from_addresses]
+        
+        if self.method_selectors:
+            method_selectors = self.method_selectors
+            candidates = [
+                tx for tx in candidates
+                if bytes(tx.get("input") or b"")[:4] in method_selectors
+            ]
+        
+        return candidates
+
+
+if __name__ == "__main__":
+    # Test the filter
+    router = "0x7a250d5630B4cF539739dF2C5dAcb4c659F2488D"
+    transaction_filter = EvmTransactionFilter.from_config(
+        to_addresses=[router],
+        method_selectors=["0x38ed1739"],
+        min_value=0.5
+    )
+    
+    transactions = [
+        {"to": router, "from": "0xabc", "value": 10 ** 18, "input": bytes.fromhex("38ed1739") + b"\x00" * 32},
+        {"to": router, "from": "0xabc", "value": 10 ** 17, "input": bytes.fromhex("38ed1739")},
+        {"to": router.lower(), "from": "0xabc", "value": 10 ** 18, "input": bytes.fromhex("a9059cbb")},
+        {"to": "0x0000000000000000000000000000000000000001", "from": "0xabc", "value": 10 ** 18, "input": b""},
+    ]
+    
+    matched = transaction_filter.filter_block(transactions)
+    print(json.dumps([tx["value"] for tx in matched]))
+    assert matched == [transactions[0]]
+    assert [transaction_filter.matches(tx) for tx in transactions] == [True, False, False, False]
+    print("Transaction filter test passed!")
@@ -1,14 +1,20 @@
 from agency_swarm.tools import BaseTool
 from pydantic import Field, ConfigDict
 import os
-from dotenv import load_dotenv
-from typing import List, Dict, Optional, Callable
+from typing import AsyncIterator, List, Dict, Optional, Callable
+from collections import deque
 import asyncio
+import websockets
 import json
 from web3 import Web3, AsyncWeb3
 from datetime import datetime
 
-load_dotenv()
+from tools.EnvLoader import load_env
+from tools.EventBus import EventBus
+from tools.RpcClientRegistry import rpc_clients
+from tools.blockchain_monitor_agent.EvmTransactionFilter import EvmTransactionFilter
+
+load_env()
 
 class MultiChainMonitorTool(BaseTool):
     """
@@ -32,28 +38,92 @@ class MultiChainMonitorTool(BaseTool):
         description="Dictionary of contract addresses to monitor per chain"
     )
     
+    monitored_senders: Dict[str, List[str]] = Field(
+        default={},
+        description="Dictionary of sender addresses to monitor per chain"
+    )
+    
+    monitored_selectors: Dict[str, List[str]] = Field(
+        default={},
+        description="Dictionary of 4-byte method selectors (hex) to monitor per chain"
+    )
+    
+    transaction_filters: Dict[str, EvmTransactionFilter] = Field(
+        default_factory=dict,
+        description="Compiled transaction filter for each chain"
+    )
+    
     web3_clients: Dict[str, AsyncWeb3] = Field(
         default_factory=dict,
         description="Dictionary of Web3 clients for each chain"
     )
     
-    transaction_handlers: List[Callable[[Dict], None]] = Field(
-        default_factory=list,
-        description="List of callback functions to handle transactions"
+    use_new_heads: bool = Field(
+        default=True,
+        description="Subscribe to newHeads over {CHAIN}_WS_URL when configured instead of polling"
+    )
+    
+    ws_urls: Dict[str, str] = Field(
+        default_factory=dict,
+        description="Dictionary of WebSocket RPC URLs for chains that support newHeads"
+    )
+    
+    reconnect_delay: float = Field(
+        default=1.0,
+        description="Initial seconds to wait before resubscribing after the head stream ends or fails"
+    )
+    
+    max_reconnect_delay: float = Field(
+        default=30.0,
+        description="Upper bound of the doubling resubscribe delay"
+    )
+    
+    max_blocks_in_flight: int = Field(
+        default=10,
+        description="Maximum number of blocks fetched concurrently while catching up"
+    )
+    
+    event_bus: Optional[EventBus] = Field(
+        default=None,
+        description="Event bus that delivers transactions to handlers"
+    )
+    
+    event_topic: str = Field(
+        default="chain_transactions",
+        description="Event bus topic for published transactions"
     )
     
     def __init__(self, **data):
         super().__init__(**data)
         self.web3_clients = {}
-        self.transaction_handlers = []
+        self.ws_urls = {}
+        if not self.event_bus:
+            self.event_bus = EventBus()
         self._initialize_web3_clients()
+        self._compile_transaction_filters()
+    
+    def _compile_transaction_filters(self):
+        """Compile the per-chain monitoring rules once, up front."""
+        self.transaction_filters = {
+            chain: EvmTransactionFilter.from_config(
+                to_addresses=self.monitored_contracts.get(chain, []),
+                from_addresses=self.monitored_senders.get(chain, []),
+                method_selectors=self.monitored_selectors.get(chain, []),
+                min_value=self.min_transaction_value
+            )
+            for chain in self.supported_chains
+        }
     
     def _initialize_web3_clients(self):
         """Initialize Web3 clients for each supported chain."""
         for chain in self.supported_chains:
+            ws_url = os.getenv(f'{chain.upper()}_WS_URL')
+            if ws_url and self.use_new_heads:
+                self.ws_urls[chain] = ws_url
+            
             rpc_url = os.getenv(f'{chain.upper()}_RPC_URL')
             if rpc_url:
-                web3 = AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(rpc_url))
+                web3 = rpc_clients.get_web3(rpc_url)
                 
                 # Add POA middleware for BSC
                 if chain.lower() == 'bsc':
@@ -85,9 +155,69 @@ class MultiChainMonitorTool(BaseTool):
                 
                 self.web3_clients[chain] = web3
     
-    def add_transaction_handler(self, handler: Callable[[Dict], None]):
-        """Add a callback function to handle transaction data."""
-        self.transaction_handlers.append(handler)
+    def add_transaction_handler(self, handler: Callable[[Dict], None], **subscription_options):
+        """Add a callback function to handle transaction data via the event bus."""
+        self.event_bus.subscribe(self.event_topic, handler, **subscription_options)
+    
+    async def _fetch_blocks(self, web3: AsyncWeb3, first_block: int, last_block: int) -> AsyncIterator[Dict]:
+        """
+        Yield blocks first_block..last_block in order while fetching up to
+        max_blocks_in_flight of them concurrently.
+        """
+        in_flight = deque()
+        next_block = first_block
+        try:
+            while next_block <= last_block or in_flight:
+                # Keep the fetch window full ahead of the block being processed
+                while next_block <= last_block and len(in_flight) < self.max_blocks_in_flight:
+                    in_flight.append(asyncio.create_task(
+                        web3.eth.get_block(next_block, full_transactions=True)
+                    ))
+                    next_block += 1
+                yield await in_flight.popleft()
+        finally:
+            for task in in_flight:
+                task.cancel()
+            # Collect the cancelled fetches so their outcome is never reported as lost
+            await asyncio.gather(*in_flight, return_exceptions=True)
+    
+    async def _process_block(self, chain: str, block: Dict):
+        """Filter a block's transactions and publish the matching ones."""
+        try:
+            matched = self.transaction_filters[chain].filter_block(block.transactions)
+        except Exception as e:
+            print(f"Error checking transaction criteria: {e}")
+            return
+        
+        for tx in matched:
+            tx_data = await self._process_transaction(chain, tx)
+            if tx_data:
+                # Hand off to subscribers without waiting on them
+                await self.event_bus.publish(self.event_topic, tx_data)
+    
+    async def _poll_block_numbers(self, web3: AsyncWeb3) -> AsyncIterator[int]:
+        """Yield the chain head by polling eth_blockNumber every second."""
+        while True:
+            yield await web3.eth.block_number
+            await asyncio.sleep(1)  # Wait for new blocks
+    
+    async def _new_head_numbers(self, ws_url: str) -> AsyncIterator[int]:
+        """Yield the chain head as newHeads notifications are pushed over a WebSocket."""
+        async with websockets.connect(ws_url) as ws:
+            await ws.send(json.dumps({
+                "jsonrpc": "2.0",
+                "id": 1,
+                "method": "eth_subscribe",
+                "params": ["newHeads"]
+            }))
+            confirmation = json.loads(await ws.recv())
+            if "error" in confirmation:
+                raise RuntimeError(f"newHeads subscription failed: {confirmation['error']}")
+            
+            async for msg in ws:
+                header = json.loads(msg).get("params", {}).get("result", {})
+                if "number" in header:
+                    yield int(header["number"], 16)
     
     async def _monitor_chain(self, chain: str):
         """Monitor a specific blockchain for transactions."""
@@ -97,36 +227,43 @@ class MultiChainMonitorTool(BaseTool):
                 print(f"No Web3 client available for {chain}")
                 return
             
-            print(f"Starting to monitor {chain}...")
+            ws_url = self.ws_urls.get(chain)
+            print(f"Starting to monitor {chain} ({'newHeads subscription' if ws_url else 'polling'})...")
+            
+            # Reuse the shared keep-alive pool for this endpoint
+            await rpc_clients.pool_web3(web3)
             
             # Get the latest block number
             latest_block = await web3.eth.block_number
             
+            delay = self.reconnect_delay
             while True:
                 try:
-                    # Get new blocks
-                    current_block = await web3.eth.block_number
-                    if current_block > latest_block:
-                        for block_num in range(latest_block + 1, current_block + 1):
-                            block = await web3.eth.get_block(block_num, full_transactions=True)
-                            
-                            # Process transactions in the block
-                            for tx in block.transactions:
-                                # Check if transaction meets monitoring criteria
-                                if self._should_monitor_transaction(chain, tx):
-                                    tx_data = await self._process_transaction(chain, tx)
-                                    if tx_data:
-                                        # Notify handlers
-                                        for handler in self.transaction_handlers:
-                                            handler(tx_data)
-                        
-                        latest_block = current_block
-                    
-                    await asyncio.sleep(1)  # Wait for new blocks
+                    # Block heads are pushed when a WebSocket endpoint is configured, polled otherwise
+                    heads = self._new_head_numbers(ws_url) if ws_url else self._poll_block_numbers(web3)
+                    try:
+                        async for current_block in heads:
+                            delay = self.reconnect_delay
+                            if current_block > latest_block:
+                                # Fetch the gap concurrently but process strictly in block order,
+                                # advancing per block so a failure resumes where it stopped
+                                blocks = self._fetch_blocks(web3, latest_block + 1, current_block)
+                                try:
+                                    async for block in blocks:
+                                        await self._process_block(chain, block)
+                                        latest_block += 1
+                                finally:
+                                    await blocks.aclose()
+                    finally:
+                        await heads.aclose()
+                    # Providers close idle subscriptions; back off rather than reconnect in a tight loop
+                    print(f"Head stream on {chain} ended, resubscribing in {delay:.1f}s")
                     
                 except Exception as e:
                     print(f"Error processing block on {chain}: {e}")
-                    await asyncio.sleep(5)  # Wait before retrying
+                
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
                     
         except Exception as e:
             print(f"Error monitoring {chain}: {e}")
@@ -134,17 +271,7 @@ class MultiChainMonitorTool(BaseTool):
     def _should_monitor_transaction(self, chain: str, transaction: Dict) -> bool:
         """Determine if a transaction should be monitored based on criteria."""
         try:
-            # Check transaction value
-            value = float(Web3.from_wei(transaction.value, 'ether'))
-            
-            # Check if transaction involves monitored contracts
-            contract_addresses = self.monitored_contracts.get(chain, [])
-            if contract_addresses and transaction.to:
-                if transaction.to.lower() not in [addr.lower() for addr in contract_addresses]:
-                    return False
-            
-            return value >= self.min_transaction_value
-            
+            return self.transaction_filters[chain].matches(transaction)
         except Exception as e:
             print(f"Error checking transaction criteria: {e}")
             return False
@@ -168,6 +295,8 @@ class MultiChainMonitorTool(BaseTool):
     async def start_monitoring(self):
         """Start monitoring all supported blockchains."""
         try:
+            await self.event_bus.start()
+            
             # Create monitoring tasks for each chain
             tasks = [
                 asyncio.create_task(self._monitor_chain(chain))
@@ -196,6 +325,113 @@ class MultiChainMonitorTool(BaseTool):
         return "Multi-chain monitor initialized successfully"
 
 if __name__ == "__main__":
+    import random
+    import time
+    from types import SimpleNamespace
+    
+    async def test_catch_up():
+        # Catch-up yields blocks in order with a bounded number of fetches in flight
+        fetching = set()
+        peak = 0
+        
+        async def get_block(number, full_transactions=False):
+            nonlocal peak
+            fetching.add(number)
+            peak = max(peak, len(fetching))
+            try:
+                await asyncio.sleep(random.uniform(0, 0.01))
+            finally:
+                fetching.discard(number)
+            if number == failing:
+                raise RuntimeError("block not available")
+            return {"number": number}
+        
+        web3 = SimpleNamespace(eth=SimpleNamespace(get_block=get_block))
+        monitor = MultiChainMonitorTool(supported_chains=[], max_blocks_in_flight=4)
+        
+        failing = None
+        numbers = [block["number"] async for block in monitor._fetch_blocks(web3, 100, 149)]
+        assert numbers == list(range(100, 150))
+        assert peak <= 4
+        
+        # A failed fetch stops the catch-up and leaves no fetch running or unretrieved
+        failing = 120
+        numbers = []
+        blocks = monitor._fetch_blocks(web3, 100, 149)
+        try:
+            async for block in blocks:
+                numbers.append(block["number"])
+        except RuntimeError:
+            pass
+        finally:
+            await blocks.aclose()
+        assert numbers == list(range(100, 120))
+        assert not fetching
+        assert all(task.done() for task in asyncio.all_tasks() if task is not asyncio.current_task())
+        print(json.dumps({"blocks": 50, "max_in_flight": peak}))
+        print("Block catch-up test passed!")
+    
+    asyncio.run(test_catch_up())
+    
+    async def test_new_heads():
+        # A provider that pushes three heads on its first two subscriptions and none after,
+        # closing the socket cleanly every time
+        connected_at = []
+        
+        async def fake_node(ws):
+            connected_at.append(time.perf_counter())
+            request = json.loads(await ws.recv())
+            assert request["params"] == ["newHeads"]
+            await ws.send(json.dumps({"jsonrpc": "2.0", "id": request["id"], "result": "0x1"}))
+            if len(connected_at) > 2:
+                return
+            first = 100 + 3 * (len(connected_at) - 1)
+            for number in range(first + 1, first + 4):
+                await ws.send(json.dumps({
+                    "jsonrpc": "2.0",
+                    "method": "eth_subscription",
+                    "params": {"subscription": "0x1", "result": {"number": hex(number)}}
+                }))
+        
+        processed = []
+        
+        class FakeEth:
+            @property
+            async def block_number(self):
+                return 100
+            
+            async def get_block(self, number, full_transactions=False):
+                processed.append(number)
+                return SimpleNamespace(transactions=[])
+        
+        class FakeProvider:
+            endpoint_uri = "http://127.0.0.1:1/"
+            
+            async def cache_async_session(self, session):
+                return session
+        
+        async with websockets.serve(fake_node, "127.0.0.1", 0) as server:
+            monitor = MultiChainMonitorTool(supported_chains=["ethereum"], reconnect_delay=0.2, max_reconnect_delay=0.4)
+            monitor.web3_clients["ethereum"] = SimpleNamespace(eth=FakeEth(), provider=FakeProvider())
+            monitor.ws_urls["ethereum"] = f"ws://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+            task = asyncio.create_task(monitor._monitor_chain("ethereum"))
+            await asyncio.sleep(1.1)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        await rpc_clients.close()
+        
+        # Every head's block is processed once, in order, across resubscriptions
+        assert processed == list(range(101, 107))
+        # Resubscribing waits, and waits longer while the stream keeps ending without heads
+        gaps = [later - earlier for earlier, later in zip(connected_at, connected_at[1:])]
+        assert 4 <= len(connected_at) <= 5
+        assert min(gaps) >= 0.2 and max(gaps) >= 0.4
+        print(json.dumps({"subscriptions": len(connected_at), "blocks": len(processed),
+                          "resubscribe_gaps_s": [round(gap, 2) for gap in gaps]}))
+        print("newHeads test passed!")
+    
+    asyncio.run(test_new_heads())
+    
     # Test the tool
     tool = MultiChainMonitorTool(
         supported_chains=["ethereum", "bsc"],
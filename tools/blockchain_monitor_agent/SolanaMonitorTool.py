@@ -1,21 +1,30 @@
 from agency_swarm.tools import BaseTool
 from pydantic import Field, ConfigDict
 import os
-from dotenv import load_dotenv
 from solana.rpc.async_api import AsyncClient
 from solana.rpc.commitment import Confirmed
 from solders.pubkey import Pubkey
-from typing import List, Dict, Optional, Callable
+from typing import List, Dict, Optional, Callable, Set
 import asyncio
-import websockets
 import json
 
-load_dotenv()
+from tools.EnvLoader import load_env
+from tools.EventBus import EventBus
+from tools.RpcClientRegistry import rpc_clients
+from tools.SolanaConnectionManager import SolanaConnectionManager, Reconnected
+from tools.SolanaGapBackfiller import SolanaGapBackfiller, WalletGap
+from tools.SignatureDeduplicator import SignatureDeduplicator
+from tools.SolanaTransactionFetcher import SolanaTransactionFetcher
+from tools.SolanaCodec import LogsNotification
+
+load_env()
 
 class SolanaMonitorTool(BaseTool):
     """
     Tool for monitoring Solana blockchain transactions.
     Provides real-time transaction data to other agents.
+    After the connection drops, wallets are resubscribed and the
+    transactions missed meanwhile are replayed in slot order first.
     """
     
     model_config = ConfigDict(arbitrary_types_allowed=True)
@@ -35,93 +44,205 @@ class SolanaMonitorTool(BaseTool):
         description="WebSocket URL for Solana RPC"
     )
     
-    ws_client: Optional[websockets.WebSocketClientProtocol] = Field(
+    connection_manager: Optional[SolanaConnectionManager] = Field(
+        default=None,
+        description="Shared multiplexed Solana WebSocket connection"
+    )
+    
+    transaction_fetcher: Optional[SolanaTransactionFetcher] = Field(
+        default=None,
+        description="Batching, deduplicating getTransaction fetcher"
+    )
+    
+    fetch_batch_size: int = Field(
+        default=20,
+        description="Maximum signatures per getTransaction batch request"
+    )
+    
+    fetch_flush_interval: float = Field(
+        default=0.01,
+        description="Seconds to wait for a batch to fill before sending it"
+    )
+    
+    max_concurrent_fetches: int = Field(
+        default=4,
+        description="Maximum number of getTransaction batches in flight"
+    )
+    
+    fetch_tasks: Set[asyncio.Task] = Field(
+        default_factory=set,
+        description="Pending fetch-and-publish tasks"
+    )
+    
+    backfiller: Optional[SolanaGapBackfiller] = Field(
+        default=None,
+        description="Recovers transactions missed while the connection was down"
+    )
+    
+    wallet_subscriptions: Dict[int, str] = Field(
+        default_factory=dict,
+        description="Mapping of logs subscription id to wallet address"
+    )
+    
+    last_signatures: Dict[str, str] = Field(
+        default_factory=dict,
+        description="Latest signature seen per wallet; backfill resumes after it"
+    )
+    
+    deduplicator: Optional[SignatureDeduplicator] = Field(
+        default=None,
+        description="Signature dedup shared across sources; a transaction is published once per topic"
+    )
+    
+    event_bus: Optional[EventBus] = Field(
         default=None,
-        description="WebSocket client"
+        description="Event bus that delivers transactions to handlers"
     )
     
-    transaction_handlers: List[Callable[[Dict], None]] = Field(
-        default_factory=list,
-        description="List of callback functions to handle transactions"
+    event_topic: str = Field(
+        default="solana_transactions",
+        description="Event bus topic for published transactions"
     )
     
     def __init__(self, **data):
         super().__init__(**data)
-        self.client = AsyncClient(os.getenv('SOLANA_RPC_URL', 'https://api.mainnet-beta.solana.com'))
+        if not self.client:
+            self.client = rpc_clients.get_solana_client()
         self.ws_url = os.getenv('SOLANA_WS_URL', 'wss://api.mainnet-beta.solana.com')
-        self.ws_client = None
-        self.transaction_handlers = []
-    
-    async def _connect(self):
-        """Establish WebSocket connection."""
-        try:
-            if not self.ws_client:
-                self.ws_client = await websockets.connect(self.ws_url)
-        except Exception as e:
-            print(f"Error connecting to WebSocket: {e}")
-            return False
-        return True
+        if not self.connection_manager:
+            self.connection_manager = SolanaConnectionManager(ws_url=self.ws_url)
+        if not self.transaction_fetcher:
+            self.transaction_fetcher = SolanaTransactionFetcher(
+                rpc_url=os.getenv('SOLANA_RPC_URL', 'https://api.mainnet-beta.solana.com'),
+                batch_size=self.fetch_batch_size,
+                flush_interval=self.fetch_flush_interval,
+                max_concurrent_batches=self.max_concurrent_fetches
+            )
+        self.fetch_tasks = set()
+        if not self.backfiller:
+            # Share the fetcher so replayed and live signatures hit one cache
+            self.backfiller = SolanaGapBackfiller(fetcher=self.transaction_fetcher)
+        self.wallet_subscriptions = {}
+        self.last_signatures = {}
+        if not self.deduplicator:
+            self.deduplicator = SignatureDeduplicator()
+        if not self.event_bus:
+            self.event_bus = EventBus()
     
-    async def _subscribe_account(self, pubkey: str):
-        """Subscribe to account notifications for a specific wallet."""
+    async def _subscribe_logs(self, notifications: asyncio.Queue, pubkey: str):
+        """Subscribe to log notifications of transactions mentioning a specific wallet."""
         try:
-            subscribe_message = {
-                "jsonrpc": "2.0",
-                "id": 1,
-                "method": "accountSubscribe",
-                "params": [
-                    pubkey,
-                    {"encoding": "jsonParsed", "commitment": "confirmed"}
+            return await self.connection_manager.subscribe(
+                notifications,
+                "logsSubscribe",
+                [
+                    {"mentions": [pubkey]},
+                    {"commitment": "confirmed"}
                 ]
-            }
-            await self.ws_client.send(json.dumps(subscribe_message))
+            )
         except Exception as e:
-            print(f"Error subscribing to account {pubkey}: {e}")
+            print(f"Error subscribing to logs for {pubkey}: {e}")
+            return None
     
     async def _fetch_transaction_data(self, signature: str) -> Optional[Dict]:
-        """Fetch detailed transaction data."""
+        """Fetch detailed transaction data through the batching fetcher."""
         try:
-            tx = await self.client.get_transaction(
-                signature,
-                encoding="jsonParsed"
-            )
-            return tx["result"]
+            return await self.transaction_fetcher.fetch(signature)
         except Exception as e:
             print(f"Error fetching transaction data: {e}")
             return None
     
-    def add_transaction_handler(self, handler: Callable[[Dict], None]):
-        """Add a callback function to handle transaction data."""
-        self.transaction_handlers.append(handler)
+    async def _fetch_and_publish(self, signature: str, wallet: Optional[str] = None):
+        """
+        Fetch a transaction and hand it to subscribers. The signature is
+        recorded as seen only once it is published, so a failed or empty
+        fetch leaves it to a later notification or the reconnect backfill.
+        Concurrent fetches of one signature share a single RPC call in the
+        fetcher.
+        """
+        tx_data = await self._fetch_transaction_data(signature)
+        if not tx_data or self.deduplicator.seen(signature, self.event_topic):
+            return
+        if wallet:
+            self.last_signatures[wallet] = signature
+        # Hand off to subscribers without waiting on them
+        await self.event_bus.publish(self.event_topic, tx_data)
+    
+    async def _subscribe_all(self, notifications: asyncio.Queue):
+        """Subscribe to the logs of every tracked wallet."""
+        subscription_ids = await asyncio.gather(*(
+            self._subscribe_logs(notifications, wallet)
+            for wallet in self.tracked_wallets
+        ))
+        self.wallet_subscriptions = {
+            subscription_id: wallet
+            for subscription_id, wallet in zip(subscription_ids, self.tracked_wallets)
+            if subscription_id is not None
+        }
+    
+    async def _recover(self, notifications: asyncio.Queue, reconnected: Reconnected):
+        """
+        Resubscribe after a reconnect, then replay what the wallets missed
+        in slot order before live notifications are processed.
+        """
+        # Subscribe first so nothing falls between the replay and live traffic
+        await self._subscribe_all(notifications)
+        
+        # Wallets never seen start a few seconds before the drop was noticed
+        gaps = {
+            wallet: WalletGap(until_signature=self.last_signatures[wallet]) if wallet in self.last_signatures
+            else WalletGap(after_time=reconnected.disconnected_at - 5)
+            for wallet in self.tracked_wallets
+        }
+        replay = await self.backfiller.backfill(gaps)
+        published = 0
+        for item in replay:
+            self.last_signatures[item["wallet"]] = item["signature"]
+            # A transaction mentioning several wallets is published once
+            if not self.deduplicator.seen(item["signature"], self.event_topic):
+                published += 1
+                await self.event_bus.publish(self.event_topic, item["transaction"])
+        print(f"Reconnected: resubscribed {len(self.wallet_subscriptions)} wallets, "
+              f"replayed {published} missed transactions")
+    
+    def add_transaction_handler(self, handler: Callable[[Dict], None], **subscription_options):
+        """Add a callback function to handle transaction data via the event bus."""
+        self.event_bus.subscribe(self.event_topic, handler, **subscription_options)
     
     async def start_monitoring(self):
         """Start monitoring the Solana blockchain."""
-        if not await self._connect():
+        if not await self.connection_manager.start():
             return False
         
         try:
-            # Subscribe to all tracked wallets
-            for wallet in self.tracked_wallets:
-                await self._subscribe_account(wallet)
+            await self.event_bus.start()
             
-            # Process incoming notifications
-            async for msg in self.ws_client:
-                msg_data = json.loads(msg)
-                if msg_data.get("method") == "accountNotification":
-                    signature = msg_data.get("params", {}).get("result", {}).get("signature")
-                    if signature:
-                        tx_data = await self._fetch_transaction_data(signature)
-                        if tx_data:
-                            # Notify all handlers
-                            for handler in self.transaction_handlers:
-                                handler(tx_data)
+            # Subscribe to all tracked wallets on the shared connection
+            notifications = self.connection_manager.register_consumer()
+            await self._subscribe_all(notifications)
+            
+            # Process incoming notifications until the connection closes
+            while True:
+                msg_data = await notifications.get()
+                if msg_data is None:
+                    break
+                if isinstance(msg_data, Reconnected):
+                    # Live notifications queue up behind the replay
+                    await self._recover(notifications, msg_data)
+                elif isinstance(msg_data, LogsNotification):
+                    signature = msg_data.params.result.value.signature
+                    wallet = self.wallet_subscriptions.get(msg_data.params.subscription)
+                    if not signature:
+                        continue
+                    # Fetch concurrently so one slow RPC round-trip never blocks the stream;
+                    # replayed signatures and other wallets' copies are dropped once fetched
+                    task = asyncio.create_task(self._fetch_and_publish(signature, wallet))
+                    self.fetch_tasks.add(task)
+                    task.add_done_callback(self.fetch_tasks.discard)
                                 
         except Exception as e:
             print(f"Error in monitoring loop: {e}")
             return False
-        finally:
-            if self.ws_client:
-                await self.ws_client.close()
         
         return True
     
@@ -133,6 +254,34 @@ class SolanaMonitorTool(BaseTool):
         return "Solana monitor initialized successfully"
 
 if __name__ == "__main__":
+    # Test that a signature whose fetch came back empty is published once it can be fetched
+    class FlakyFetcher(SolanaTransactionFetcher):
+        def __init__(self):
+            super().__init__(rpc_url="http://127.0.0.1:1")
+            self.visible = False
+        
+        async def fetch(self, signature: str) -> Optional[Dict]:
+            return {"signature": signature} if self.visible else None
+    
+    async def test_fetch_and_publish():
+        fetcher = FlakyFetcher()
+        tool = SolanaMonitorTool(tracked_wallets=["WalletA", "WalletB"], transaction_fetcher=fetcher)
+        published = []
+        tool.add_transaction_handler(published.append)
+        await tool.event_bus.start()
+        
+        await tool._fetch_and_publish("sig1", "WalletA")
+        fetcher.visible = True
+        await tool._fetch_and_publish("sig1", "WalletA")
+        # The same transaction through another wallet's subscription
+        await tool._fetch_and_publish("sig1", "WalletB")
+        await tool.event_bus.join()
+        assert published == [{"signature": "sig1"}]
+        assert tool.last_signatures == {"WalletA": "sig1"}
+        print("Fetch and publish test passed!")
+    
+    asyncio.run(test_fetch_and_publish())
+    
     # Test the tool
     tool = SolanaMonitorTool(
         tracked_wallets=["ExampleWalletAddress"]
@@ -0,0 +1,157 @@
+import asyncio
+import json
+import time
+from typing import List, Optional
+
+from tools.MetricsRegistry import metrics
+
+
+class Quote:
+    """A DEX's offer for swapping amount_in of input_token, in UI units of each token."""
+    
+    def __init__(self,
+                 dex: str,
+                 input_token: str,
+                 output_token: str,
+                 amount_in: float,
+                 amount_out: float,
+                 fee: float = 0.0,
+                 slippage_pct: float = 0.0):
+        self.dex = dex
+        self.input_token = input_token
+        self.output_token = output_token
+        self.amount_in = amount_in
+        # Quoted output, including price impact
+        self.amount_out = amount_out
+        # Fee charged in output token units
+        self.fee = fee
+        # Expected slippage between quote and execution
+        self.slippage_pct = slippage_pct
+    
+    @property
+    def net_output(self) -> float:
+        """Expected output after fees and slippage."""
+        return (self.amount_out - self.fee) * (1 - self.slippage_pct / 100)
+    
+    def to_dict(self) -> dict:
+        """Serialize the quote for trade results and logs."""
+        return {
+            "dex": self.dex,
+            "amount_in": self.amount_in,
+            "amount_out": self.amount_out,
+            "fee": self.fee,
+            "slippage_pct": self.slippage_pct,
+            "net_output": self.net_output
+        }
+
+
+class QuoteBackend:
+    """
+    Source of quotes for one DEX. Subclasses implement quote(); returning
+    None or raising means the DEX has no route for the pair.
+    """
+    
+    name: str = ""
+    
+    async def quote(self, input_token: str, output_token: str, amount: float) -> Optional[Quote]:
+        raise NotImplementedError
+
+
+class QuoteRouter:
+    """
+    Requests quotes from every backend concurrently and keeps the best net
+    output among those that answer within the time budget. Backends still
+    pending when the budget runs out are cancelled, so quoting never takes
+    longer than the budget however slow a single DEX is.
+    """
+    
+    def __init__(self, backends: Optional[List[QuoteBackend]] = None, time_budget: float = 0.15):
+        self.backends: List[QuoteBackend] = list(backends or [])
+        self.time_budget = time_budget
+    
+    def add_backend(self, backend: QuoteBackend):
+        """Register a DEX backend."""
+        self.backends.append(backend)
+    
+    @staticmethod
+    def _discard_result(task: asyncio.Task):
+        """Retrieve the outcome of a cancelled or late task so it is not reported as lost."""
+        if not task.cancelled():
+            task.exception()
+    
+    async def best_quote(self, input_token: str, output_token: str, amount: float) -> Optional[Quote]:
+        """Race all backends and return the quote with the highest net output."""
+        if not self.backends:
+            return None
+        
+        started = time.perf_counter()
+        tasks = {
+            asyncio.create_task(backend.quote(input_token, output_token, amount)): backend
+            for backend in self.backends
+        }
+        done, pending = await asyncio.wait(tasks, timeout=self.time_budget)
+        
+        for task in pending:
+            task.cancel()
+            task.add_done_callback(self._discard_result)
+        if pending:
+            metrics.increment("timeouts", "quote", len(pending))
+        
+        best = None
+        for task in done:
+            try:
+                quote = task.result()
+            except Exception as e:
+                print(f"Error getting quote from {tasks[task].name}: {e}")
+                metrics.increment("errors", "quote")
+                continue
+            if quote is not None and (best is None or quote.net_output > best.net_output):
+                best = quote
+        
+        metrics.observe("quote", time.perf_counter() - started)
+        return best
+
+
+if __name__ == "__main__":
+    # Test racing local fake DEX backends
+    class FakeDexBackend(QuoteBackend):
+        def __init__(self, name: str, rate: float, fee_pct: float, delay: float, fail: bool = False):
+            self.name = name
+            self.rate = rate
+            self.fee_pct = fee_pct
+            self.delay = delay
+            self.fail = fail
+            self.cancelled = False
+        
+        async def quote(self, input_token, output_token, amount):
+            try:
+                await asyncio.sleep(self.delay)
+            except asyncio.CancelledError:
+                self.cancelled = True
+                raise
+            if self.fail:
+                raise ConnectionError("no route")
+            amount_out = amount * self.rate
+            return Quote(self.name, input_token, output_token, amount, amount_out, fee=amount_out * self.fee_pct / 100)
+    
+    async def test_router():
+        cheap = FakeDexBackend("cheap_fees", rate=100.0, fee_pct=0.1, delay=0.01)
+        better_rate = FakeDexBackend("better_rate", rate=100.5, fee_pct=0.3, delay=0.02)
+        too_slow = FakeDexBackend("too_slow", rate=200.0, fee_pct=0.0, delay=1.0)
+        broken = FakeDexBackend("broken", rate=300.0, fee_pct=0.0, delay=0.0, fail=True)
+        router = QuoteRouter([cheap, better_rate, too_slow, broken], time_budget=0.1)
+        
+        started = time.perf_counter()
+        best = await router.best_quote("SOL", "USDC", 2.0)
+        elapsed = time.perf_counter() - started
+        await asyncio.sleep(0)
+        
+        print(json.dumps(best.to_dict(), indent=2))
+        # 100.5 * 0.997 = 100.1985 beats 100 * 0.999 = 99.9
+        assert best.dex == "better_rate"
+        assert elapsed < 0.2
+        assert too_slow.cancelled
+        assert await QuoteRouter().best_quote("SOL", "USDC", 1.0) is None
+        print("Quote router test passed!")
+    
+    asyncio.run(test_router())
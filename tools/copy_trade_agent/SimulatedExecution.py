@@ -0,0 +1,108 @@
+import itertools
+from typing import Dict, List, Optional
+
+from tools.copy_trade_agent.QuoteRouter import Quote, QuoteBackend
+
+
+class SimulatedExecution(QuoteBackend):
+    """
+    Stand-in for the chain when trades are replayed or paper traded.
+    Quotes and fills come from the latest known price of each token (in
+    one common quote currency) less a fixed fee and slippage, and every
+    fill is recorded instead of being sent. Quoting never waits, so the
+    quote router answers within any time budget.
+    """
+    
+    name = "simulated"
+    
+    def __init__(self, fee_pct: float = 0.25, slippage_pct: float = 0.1):
+        self.fee_pct = fee_pct
+        self.slippage_pct = slippage_pct
+        # token -> latest price
+        self.prices: Dict[str, float] = {}
+        self.fills: List[Dict] = []
+        self.signatures = itertools.count(1)
+    
+    def update_prices(self, prices: Dict[str, float]):
+        """Take the latest price of each given token."""
+        self.prices.update(prices)
+    
+    def _amount_out(self, input_token: str, output_token: str, amount: float) -> Optional[float]:
+        """Output before fees at the current prices, or None if either price is unknown."""
+        price_in = self.prices.get(input_token)
+        price_out = self.prices.get(output_token)
+        if not price_in or not price_out:
+            return None
+        return amount * price_in / price_out
+    
+    async def quote(self, input_token: str, output_token: str, amount: float) -> Optional[Quote]:
+        amount_out = self._amount_out(input_token, output_token, amount)
+        if amount_out is None:
+            return None
+        return Quote(
+            dex=self.name,
+            input_token=input_token,
+            output_token=output_token,
+            amount_in=amount,
+            amount_out=amount_out,
+            fee=amount_out * self.fee_pct / 100,
+            slippage_pct=self.slippage_pct
+        )
+    
+    def execute(self, input_token: str, output_token: str, amount: float,
+                min_output_amount: float, dex: str) -> Dict:
+        """Fill a trade at the current prices, shaped like a sent transaction's result."""
+        amount_out = self._amount_out(input_token, output_token, amount)
+        if amount_out is None:
+            return {
+                "success": False,
+                "error": f"No simulated price for {input_token}->{output_token}"
+            }
+        
+        amount_out *= (1 - self.fee_pct / 100) * (1 - self.slippage_pct / 100)
+        # Same protection as on chain: the swap fails rather than fill below the minimum
+        if amount_out < min_output_amount:
+            return {
+                "success": False,
+                "error": "Simulated fill below minimum output"
+            }
+        
+        fill = {
+            "success": True,
+            "signature": f"sim-{next(self.signatures)}",
+            "input_token": input_token,
+            "output_token": output_token,
+            "amount": amount,
+            "amount_out": amount_out,
+            "min_output_amount": min_output_amount,
+            "dex": dex
+        }
+        self.fills.append(fill)
+        return fill
+
+
+if __name__ == "__main__":
+    # Test quoting and fills against set prices
+    import asyncio
+    import json
+    
+    async def test_simulation():
+        simulation = SimulatedExecution(fee_pct=0.25, slippage_pct=0.1)
+        assert await simulation.quote("SOL", "BONK", 1.0) is None
+        
+        simulation.update_prices({"SOL": 150.0, "BONK": 0.00002})
+        quote = await simulation.quote("SOL", "BONK", 2.0)
+        assert abs(quote.amount_out - 15_000_000) < 1e-6
+        
+        fill = simulation.execute("SOL", "BONK", 2.0, quote.net_output * 0.99, "simulated")
+        assert fill["success"] and fill["signature"] == "sim-1"
+        assert abs(fill["amount_out"] - quote.net_output) < 1e-6
+        
+        # The price moved against the trade by more than the allowed slippage
+        simulation.update_prices({"BONK": 0.000021})
+        assert not simulation.execute("SOL", "BONK", 2.0, quote.net_output * 0.99, "simulated")["success"]
+        assert len(simulation.fills) == 1
+        print(json.dumps(fill, indent=2))
+        print("Simulated execution test passed!")
+    
+    asyncio.run(test_simulation())
@@ -0,0 +1,77 @@
+from typing import Callable, List
+import json
+from solders.hash import Hash
+from solders.instruction import AccountMeta, Instruction
+from solders.keypair import Keypair
+from solders.message import Message
+from solders.pubkey import Pubkey
+from solders.transaction import Transaction
+
+
+class SwapTemplate:
+    """
+    Pre-resolved swap instruction for one (input, output, dex) route.
+    Program, account list and token decimals are looked up once when the
+    template is built; a trade only encodes the amounts into instruction
+    data, compiles the message against a cached blockhash and signs it.
+    """
+    
+    def __init__(self,
+                 dex: str,
+                 program_id: Pubkey,
+                 accounts: List[AccountMeta],
+                 data_builder: Callable[[int, int], bytes],
+                 input_decimals: int,
+                 output_decimals: int):
+        self.dex = dex
+        self.program_id = program_id
+        self.accounts = accounts
+        # (amount_in, minimum_amount_out) in base units -> instruction data
+        self.data_builder = data_builder
+        self.input_decimals = input_decimals
+        self.output_decimals = output_decimals
+    
+    def instruction(self, amount: float, min_output_amount: float) -> Instruction:
+        """Encode UI amounts into the swap instruction."""
+        amount_in = int(round(amount * 10 ** self.input_decimals))
+        minimum_out = int(min_output_amount * 10 ** self.output_decimals)
+        return Instruction(self.program_id, self.data_builder(amount_in, minimum_out), self.accounts)
+    
+    def build_transaction(self,
+                          payer: Keypair,
+                          amount: float,
+                          min_output_amount: float,
+                          recent_blockhash: Hash) -> Transaction:
+        """Fill in amounts and blockhash and sign the swap transaction."""
+        message = Message.new_with_blockhash(
+            [self.instruction(amount, min_output_amount)],
+            payer.pubkey(),
+            recent_blockhash
+        )
+        return Transaction([payer], message, recent_blockhash)
+
+
+if __name__ == "__main__":
+    # Test filling and signing a template
+    import struct
+    
+    payer = Keypair()
+    program_id = Pubkey.new_unique()
+    template = SwapTemplate(
+        dex="test",
+        program_id=program_id,
+        accounts=[
+            AccountMeta(payer.pubkey(), is_signer=True, is_writable=True),
+            AccountMeta(Pubkey.new_unique(), is_signer=False, is_writable=True)
+        ],
+        data_builder=lambda amount_in, minimum_out: struct.pack("<BQQ", 9, amount_in, minimum_out),
+        input_decimals=9,
+        output_decimals=6
+    )
+    
+    transaction = template.build_transaction(payer, 0.25, 3.5, Hash.new_unique())
+    data = bytes(transaction.message.instructions[0].data)
+    assert struct.unpack("<BQQ", data) == (9, 250_000_000, 3_500_000)
+    transaction.verify()
+    print(json.dumps({"instruction_data": data.hex(), "signature": str(transaction.signatures[0])}))
+    print("Swap template test passed!")
@@ -1,21 +1,29 @@
 from agency_swarm.tools import BaseTool
 from pydantic import Field, ConfigDict
 import os
-from dotenv import load_dotenv
-from solana.rpc.async_api import AsyncClient
-from solana.rpc.types import TxOpts
 from solders.transaction import Transaction
 from solders.instruction import Instruction
+from solders.hash import Hash
 from solders.system_program import ID as SYS_PROGRAM_ID
 from solders.keypair import Keypair
 from solders.pubkey import Pubkey
 from spl.token.constants import TOKEN_PROGRAM_ID
 from spl.token.instructions import get_associated_token_address
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
+import asyncio
 import base58
+import base64
 import json
+import time
 
-load_dotenv()
+from tools.EnvLoader import load_env
+from tools.MetricsRegistry import metrics
+from tools.RpcClientRegistry import rpc_clients
+from tools.copy_trade_agent.QuoteRouter import QuoteBackend, QuoteRouter
+from tools.copy_trade_agent.SimulatedExecution import SimulatedExecution
+from tools.copy_trade_agent.SwapTemplate import SwapTemplate
+
+load_env()
 
 class TradeExecutorTool(BaseTool):
     """
@@ -40,9 +48,9 @@ class TradeExecutorTool(BaseTool):
         description="Default DEX to use for trades (raydium/orca/serum)"
     )
     
-    client: Optional[AsyncClient] = Field(
+    rpc_url: Optional[str] = Field(
         default=None,
-        description="Solana RPC client"
+        description="Solana JSON-RPC endpoint; requests go through its shared connection pool"
     )
     
     keypair: Optional[Keypair] = Field(
@@ -55,12 +63,86 @@ class TradeExecutorTool(BaseTool):
         description="Risk management interface"
     )
     
+    blockhash_refresh_interval: float = Field(
+        default=2.0,
+        description="Seconds between background refreshes of the cached blockhash"
+    )
+    
+    blockhash_max_age: float = Field(
+        default=30.0,
+        description="Age in seconds after which the cached blockhash is fetched inline instead"
+    )
+    
+    recent_blockhash: Optional[Hash] = Field(
+        default=None,
+        description="Most recently fetched blockhash"
+    )
+    
+    blockhash_fetched_at: float = Field(
+        default=0.0,
+        description="Monotonic time the cached blockhash was fetched"
+    )
+    
+    blockhash_task: Optional[asyncio.Task] = Field(
+        default=None,
+        description="Background blockhash refresh task"
+    )
+    
+    swap_templates: Dict[Tuple[str, str, str], SwapTemplate] = Field(
+        default_factory=dict,
+        description="Pre-resolved swap instructions keyed by (input, output, dex)"
+    )
+    
+    template_failures: Dict[Tuple[str, str, str], float] = Field(
+        default_factory=dict,
+        description="Monotonic time each route's swap template last failed to build"
+    )
+    
+    template_retry_interval: float = Field(
+        default=30.0,
+        description="Seconds a route whose template failed to build is skipped before it is retried"
+    )
+    
+    quote_time_budget: float = Field(
+        default=0.15,
+        description="Seconds to wait for DEX quotes before trading on the best one received"
+    )
+    
+    quote_router: Optional[QuoteRouter] = Field(
+        default=None,
+        description="Races quotes from all configured DEX backends"
+    )
+    
+    simulated: bool = Field(
+        default=False,
+        description="Fill trades at known prices instead of sending them, for replay and paper trading"
+    )
+    
+    simulator: Optional[SimulatedExecution] = Field(
+        default=None,
+        description="Quote and fill backend used in simulated mode"
+    )
+    
     def __init__(self, **data):
         super().__init__(**data)
-        if not self.client:
-            self.client = AsyncClient(os.getenv('SOLANA_RPC_URL', 'https://api.mainnet-beta.solana.com'))
+        if not self.rpc_url:
+            self.rpc_url = os.getenv('SOLANA_RPC_URL', 'https://api.mainnet-beta.solana.com')
         self.keypair = Keypair.from_bytes(base58.b58decode(self.wallet_keypair))
         self.risk_manager = None
+        self.recent_blockhash = None
+        self.blockhash_fetched_at = 0.0
+        self.blockhash_task = None
+        self.swap_templates = {}
+        self.template_failures = {}
+        if not self.quote_router:
+            self.quote_router = QuoteRouter(time_budget=self.quote_time_budget)
+        if self.simulated and not self.simulator:
+            self.simulator = SimulatedExecution()
+            self.add_quote_backend(self.simulator)
+    
+    def add_quote_backend(self, backend: QuoteBackend):
+        """Add a DEX to quote against. Its name selects the swap template the trade is built with."""
+        self.quote_router.add_backend(backend)
     
     def set_risk_manager(self, risk_manager):
         """Set the risk management interface."""
@@ -94,51 +176,115 @@ class TradeExecutorTool(BaseTool):
             print(f"Error getting token account: {e}")
             return None
     
+    async def _refresh_blockhash(self) -> Optional[Hash]:
+        """Fetch the latest blockhash into the cache."""
+        try:
+            result = await rpc_clients.rpc(self.rpc_url, "getLatestBlockhash", [])
+            self.recent_blockhash = Hash.from_string(result["value"]["blockhash"])
+            self.blockhash_fetched_at = time.monotonic()
+            return self.recent_blockhash
+        except Exception as e:
+            print(f"Error refreshing blockhash: {e}")
+            return None
+    
+    async def _blockhash_refresh_loop(self):
+        """Keep the cached blockhash fresh so trades never wait on it."""
+        while True:
+            await self._refresh_blockhash()
+            await asyncio.sleep(self.blockhash_refresh_interval)
+    
+    async def start_blockhash_refresh(self):
+        """Start refreshing the blockhash in the background."""
+        if self.simulated:
+            return
+        if self.blockhash_task is None or self.blockhash_task.done():
+            await self._refresh_blockhash()
+            self.blockhash_task = asyncio.create_task(self._blockhash_refresh_loop())
+    
+    async def stop_blockhash_refresh(self):
+        """Stop the background blockhash refresh."""
+        if self.blockhash_task is not None:
+            self.blockhash_task.cancel()
+            await asyncio.gather(self.blockhash_task, return_exceptions=True)
+            self.blockhash_task = None
+    
+    async def _get_recent_blockhash(self) -> Optional[Hash]:
+        """Return the cached blockhash, fetching inline only if it is missing or stale."""
+        if self.recent_blockhash is not None and time.monotonic() - self.blockhash_fetched_at < self.blockhash_max_age:
+            return self.recent_blockhash
+        return await self._refresh_blockhash()
+    
+    async def prepare_swap_templates(self, pairs: List[Tuple[str, str]], dex: Optional[str] = None):
+        """Pre-build swap templates for the given (input, output) token pairs."""
+        if self.simulated:
+            return
+        await asyncio.gather(*(
+            self._get_swap_template(input_token, output_token, dex or self.default_dex)
+            for input_token, output_token in pairs
+        ))
+    
+    async def _get_swap_template(self, input_token: str, output_token: str, dex: str) -> Optional[SwapTemplate]:
+        """Return the cached template for a route, building it on first use."""
+        key = (input_token, output_token, dex)
+        template = self.swap_templates.get(key)
+        if template is not None:
+            return template
+        # A route that just failed would fail again; do not rebuild it on every trade
+        failed_at = self.template_failures.get(key)
+        if failed_at is not None and time.monotonic() - failed_at < self.template_retry_interval:
+            return None
+        
+        try:
+            if dex == "raydium":
+                template = await self._build_raydium_template(input_token, output_token)
+            elif dex == "orca":
+                template = await self._build_orca_template(input_token, output_token)
+            else:
+                raise ValueError(f"Unsupported DEX: {dex}")
+        except Exception as e:
+            print(f"Error building {dex} swap template for {input_token}->{output_token}: {e}")
+            self.template_failures[key] = time.monotonic()
+            return None
+        
+        self.template_failures.pop(key, None)
+        self.swap_templates[key] = template
+        return template
+    
     async def _build_swap_transaction(self, 
                                     input_token: str,
                                     output_token: str,
                                     amount: float,
-                                    min_output_amount: float) -> Optional[Transaction]:
-        """Build a swap transaction based on the selected DEX."""
+                                    min_output_amount: float,
+                                    dex: Optional[str] = None) -> Optional[Transaction]:
+        """Build a signed swap transaction from the route template and cached blockhash."""
         try:
-            if self.default_dex == "raydium":
-                return await self._build_raydium_swap(
-                    input_token,
-                    output_token,
-                    amount,
-                    min_output_amount
-                )
-            elif self.default_dex == "orca":
-                return await self._build_orca_swap(
-                    input_token,
-                    output_token,
-                    amount,
-                    min_output_amount
-                )
-            else:
-                raise ValueError(f"Unsupported DEX: {self.default_dex}")
+            template = await self._get_swap_template(input_token, output_token, dex or self.default_dex)
+            if template is None:
+                return None
+            
+            recent_blockhash = await self._get_recent_blockhash()
+            if recent_blockhash is None:
+                return None
+            
+            return template.build_transaction(self.keypair, amount, min_output_amount, recent_blockhash)
         except Exception as e:
             print(f"Error building swap transaction: {e}")
             return None
     
-    async def _build_raydium_swap(self, 
-                                 input_token: str,
-                                 output_token: str,
-                                 amount: float,
-                                 min_output_amount: float) -> Transaction:
-        """Build a Raydium swap transaction."""
+    async def _build_raydium_template(self, 
+                                     input_token: str,
+                                     output_token: str) -> SwapTemplate:
+        """Resolve the Raydium pool accounts for a route."""
         # Implementation for Raydium swap
-        # This is a placeholder - implement actual Raydium swap logic
+        # This is a placeholder - implement actual Raydium pool lookup and instruction layout
         raise NotImplementedError("Raydium swap not implemented")
     
-    async def _build_orca_swap(self,
-                              input_token: str,
-                              output_token: str,
-                              amount: float,
-                              min_output_amount: float) -> Transaction:
-        """Build an Orca swap transaction."""
+    async def _build_orca_template(self,
+                                  input_token: str,
+                                  output_token: str) -> SwapTemplate:
+        """Resolve the Orca pool accounts for a route."""
         # Implementation for Orca swap
-        # This is a placeholder - implement actual Orca swap logic
+        # This is a placeholder - implement actual Orca pool lookup and instruction layout
         raise NotImplementedError("Orca swap not implemented")
     
     async def execute_trade(self,
@@ -164,38 +310,67 @@ class TradeExecutorTool(BaseTool):
                     "error": "Trade rejected by risk management"
                 }
             
-            # Calculate minimum output amount based on slippage
-            min_output_amount = amount * (1 - self.max_slippage / 100)
+            # Race the configured DEXs for the best net output
+            dex = self.default_dex
+            quote = await self.quote_router.best_quote(input_token, output_token, amount)
+            if quote is not None:
+                dex = quote.dex
+                min_output_amount = quote.net_output * (1 - self.max_slippage / 100)
+            elif self.quote_router.backends:
+                return {
+                    "success": False,
+                    "error": "No DEX quote within the time budget"
+                }
+            else:
+                # Calculate minimum output amount based on slippage
+                min_output_amount = amount * (1 - self.max_slippage / 100)
+            
+            if self.simulated:
+                result = self.simulator.execute(input_token, output_token, amount, min_output_amount, dex)
+                if result["success"]:
+                    result["quote"] = quote.to_dict() if quote else None
+                return result
             
             # Build and send transaction
+            started = time.perf_counter()
             transaction = await self._build_swap_transaction(
                 input_token,
                 output_token,
                 amount,
-                min_output_amount
+                min_output_amount,
+                dex
             )
+            metrics.observe("build_swap_transaction", time.perf_counter() - started)
             
             if not transaction:
+                metrics.increment("errors", "build_swap_transaction")
                 return {
                     "success": False,
                     "error": "Failed to build transaction"
                 }
             
-            # Sign and send transaction
-            opts = TxOpts(skip_preflight=True)
-            result = await self.client.send_transaction(
-                transaction,
-                self.keypair,
-                opts=opts
-            )
+            # Send the signed transaction
+            started = time.perf_counter()
+            try:
+                signature = await rpc_clients.rpc(self.rpc_url, "sendTransaction", [
+                    base64.b64encode(bytes(transaction)).decode(),
+                    {"encoding": "base64", "skipPreflight": True}
+                ])
+            except Exception:
+                metrics.increment("errors", "send_transaction")
+                raise
+            finally:
+                metrics.observe("send_transaction", time.perf_counter() - started)
             
             return {
                 "success": True,
-                "signature": result["result"],
+                "signature": signature,
                 "input_token": input_token,
                 "output_token": output_token,
                 "amount": amount,
-                "min_output_amount": min_output_amount
+                "min_output_amount": min_output_amount,
+                "dex": dex,
+                "quote": quote.to_dict() if quote else None
             }
             
         except Exception as e:
@@ -212,22 +387,79 @@ class TradeExecutorTool(BaseTool):
         return "Trade executor initialized successfully"
 
 if __name__ == "__main__":
-    # Test the tool
-    tool = TradeExecutorTool(
-        wallet_keypair="ExampleBase58PrivateKey",
-        max_slippage=1.0,
-        default_dex="raydium"
-    )
-    
-    # Example trade execution
-    import asyncio
+    # Test the blockhash refresh and the swap template cache against a local JSON-RPC server
+    from aiohttp import web
     
-    async def test_trade():
-        result = await tool.execute_trade(
-            input_token="SOL",
-            output_token="USDC",
-            amount=0.1
+    async def test_executor():
+        blockhash_requests = []
+        
+        async def rpc(request):
+            body = await request.json()
+            blockhash_requests.append(time.perf_counter())
+            return web.json_response({
+                "jsonrpc": "2.0",
+                "id": body["id"],
+                "result": {
+                    "context": {"slot": len(blockhash_requests)},
+                    "value": {"blockhash": str(Hash.new_unique()), "lastValidBlockHeight": 1000}
+                }
+            })
+        
+        app = web.Application()
+        app.router.add_post("/", rpc)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/"
+        
+        tool = TradeExecutorTool(
+            wallet_keypair=base58.b58encode(bytes(Keypair())).decode(),
+            max_slippage=1.0,
+            default_dex="raydium",
+            rpc_url=url,
+            blockhash_refresh_interval=0.05
         )
+        
+        # The blockhash is refreshed in the background and trades read the cached one
+        await tool.start_blockhash_refresh()
+        await asyncio.sleep(0.3)
+        refreshed = len(blockhash_requests)
+        assert refreshed >= 4
+        cached = await tool._get_recent_blockhash()
+        assert cached == tool.recent_blockhash and len(blockhash_requests) == refreshed
+        await tool.stop_blockhash_refresh()
+        await asyncio.sleep(0.1)
+        assert len(blockhash_requests) == refreshed
+        
+        # Templates are built once per route; failed routes are not rebuilt until the retry interval
+        builds = []
+        
+        async def build_raydium_template(input_token, output_token):
+            builds.append((input_token, output_token))
+            if output_token == "NOPOOL":
+                raise LookupError("no pool for route")
+            return SwapTemplate("raydium", Pubkey.default(), [], lambda amount, minimum: b"", 9, 6)
+        
+        object.__setattr__(tool, "_build_raydium_template", build_raydium_template)
+        await tool.prepare_swap_templates([("SOL", "USDC"), ("SOL", "NOPOOL")])
+        for _ in range(3):
+            assert await tool._get_swap_template("SOL", "USDC", "raydium") is not None
+            assert await tool._get_swap_template("SOL", "NOPOOL", "raydium") is None
+        assert builds == [("SOL", "USDC"), ("SOL", "NOPOOL")]
+        
+        tool.template_retry_interval = 0
+        assert await tool._get_swap_template("SOL", "NOPOOL", "raydium") is None
+        assert len(builds) == 3
+        
+        # Without a pool for the route the trade fails cleanly
+        result = await tool.execute_trade(input_token="SOL", output_token="NOPOOL", amount=0.1)
         print(json.dumps(result, indent=2))
+        assert not result["success"]
+        
+        await rpc_clients.close()
+        await runner.cleanup()
+        print(json.dumps({"blockhash_refreshes": refreshed, "template_builds": len(builds)}))
+        print("Trade executor test passed!")
     
-    asyncio.run(test_trade()) 
\ No newline at end of file
+    asyncio.run(test_executor())
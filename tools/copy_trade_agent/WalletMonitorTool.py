@@ -1,21 +1,41 @@
 from agency_swarm.tools import BaseTool
 from pydantic import Field, ConfigDict
 import os
-from dotenv import load_dotenv
 from solders.pubkey import Pubkey
 from solana.rpc.async_api import AsyncClient
 from solana.rpc.commitment import Confirmed
-from typing import List, Dict, Optional, Callable
+from typing import List, Dict, Optional, Callable, Set
 import asyncio
-import websockets
 import json
+import time
 
-load_dotenv()
+from tools.EnvLoader import load_env
+from tools.EventBus import EventBus
+from tools.MetricsRegistry import metrics
+from tools.RpcClientRegistry import rpc_clients
+from tools.SolanaConnectionManager import SolanaConnectionManager, Reconnected
+from tools.SolanaGapBackfiller import SolanaGapBackfiller, WalletGap
+from tools.SignatureDeduplicator import SignatureDeduplicator
+from tools.SolanaTransactionFetcher import SolanaTransactionFetcher
+from tools.copy_trade_agent.InstructionDecoderRegistry import InstructionDecoderRegistry, default_decoders
+from tools.ShardedSolanaConnection import ShardedSolanaConnection
+from tools.SolanaCodec import LogsNotification
+
+load_env()
 
 class WalletMonitorTool(BaseTool):
     """
     Tool for monitoring wallet transactions in real-time on Solana.
     Filters transactions based on size and token whitelist.
+    Wallet subscriptions are spread over as many WebSocket connections as
+    the per-connection subscription limit requires (see ShardedSolanaConnection).
+    Each wallet has a logs subscription, which names the signature of
+    every transaction mentioning it. The transaction is fetched through
+    the batching SolanaTransactionFetcher and decoded with the program
+    decoder registry, so swaps carry their input and output tokens and
+    amounts. After a connection drops, its wallets are resubscribed and
+    the transactions missed meanwhile are replayed in slot order first,
+    through the same decoding.
     """
     
     model_config = ConfigDict(arbitrary_types_allowed=True)
@@ -45,126 +65,307 @@ class WalletMonitorTool(BaseTool):
         description="WebSocket URL for Solana RPC"
     )
     
-    ws_client: Optional[websockets.WebSocketClientProtocol] = Field(
+    connection_manager: Optional[SolanaConnectionManager] = Field(
+        default=None,
+        description="Shared multiplexed Solana WebSocket connection"
+    )
+    
+    shards: int = Field(
+        default=0,
+        description="Number of WebSocket connections to spread wallets over (0 sizes by wallet count)"
+    )
+    
+    max_subscriptions_per_shard: Optional[int] = Field(
         default=None,
-        description="WebSocket client"
+        description="Subscription limit per connection (defaults to WS_MAX_SUBSCRIPTIONS_PER_CONNECTION)"
     )
     
-    transaction_handlers: List[Callable[[Dict], None]] = Field(
-        default_factory=list,
-        description="List of callback functions to handle transactions"
+    subscribe_concurrency: int = Field(
+        default=50,
+        description="Subscribe requests in flight per connection during ramp-up"
+    )
+    
+    shard_pool: Optional[ShardedSolanaConnection] = Field(
+        default=None,
+        description="Connections the wallet subscriptions are sharded over"
+    )
+    
+    wallet_subscriptions: Dict[tuple, str] = Field(
+        default_factory=dict,
+        description="Mapping of (shard, logs subscription id) to wallet address"
+    )
+    
+    transaction_fetcher: Optional[SolanaTransactionFetcher] = Field(
+        default=None,
+        description="Batching getTransaction fetcher shared by live notifications and backfill"
+    )
+    
+    fetch_batch_size: int = Field(
+        default=20,
+        description="Maximum signatures per getTransaction batch request"
+    )
+    
+    fetch_flush_interval: float = Field(
+        default=0.01,
+        description="Seconds to wait for a batch to fill before sending it"
+    )
+    
+    max_concurrent_fetches: int = Field(
+        default=4,
+        description="Maximum number of getTransaction batches in flight"
+    )
+    
+    fetch_tasks: Set[asyncio.Task] = Field(
+        default_factory=set,
+        description="Pending fetch-and-publish tasks"
+    )
+    
+    backfiller: Optional[SolanaGapBackfiller] = Field(
+        default=None,
+        description="Recovers transactions missed while a connection was down"
+    )
+    
+    deduplicator: Optional[SignatureDeduplicator] = Field(
+        default=None,
+        description="Signature dedup shared across sources; a transaction is published once per topic"
+    )
+    
+    decoders: Optional[InstructionDecoderRegistry] = Field(
+        default=None,
+        description="Program decoders keyed by program id, for classifying activity and reading swaps"
+    )
+    
+    last_slots: Dict[str, int] = Field(
+        default_factory=dict,
+        description="Slot of the latest fetched transaction per wallet"
+    )
+    
+    event_bus: Optional[EventBus] = Field(
+        default=None,
+        description="Event bus that delivers transactions to handlers"
+    )
+    
+    event_topic: str = Field(
+        default="wallet_transactions",
+        description="Event bus topic for published transactions"
     )
     
     def __init__(self, **data):
         super().__init__(**data)
         if not self.client:
-            self.client = AsyncClient(os.getenv('SOLANA_RPC_URL', 'https://api.mainnet-beta.solana.com'))
+            self.client = rpc_clients.get_solana_client()
         if not self.ws_url:
             self.ws_url = os.getenv('SOLANA_WS_URL', 'wss://api.mainnet-beta.solana.com')
-        self.ws_client = None
-        self.transaction_handlers = []
-        
-    async def _connect(self):
-        """Establish WebSocket connection."""
-        try:
-            if not self.ws_client:
-                self.ws_client = await websockets.connect(self.ws_url)
-        except Exception as e:
-            print(f"Error connecting to WebSocket: {e}")
+        if not self.connection_manager:
+            self.connection_manager = SolanaConnectionManager(ws_url=self.ws_url)
+        if not self.event_bus:
+            self.event_bus = EventBus()
+        if not self.shard_pool:
+            # A single shard keeps using the shared connection
+            self.shard_pool = ShardedSolanaConnection.for_keys(
+                len(self.target_wallets),
+                shards=self.shards,
+                shared=self.connection_manager,
+                max_subscriptions_per_shard=self.max_subscriptions_per_shard,
+                ws_url=self.ws_url,
+                subscribe_concurrency=self.subscribe_concurrency
+            )
+        if not self.transaction_fetcher:
+            self.transaction_fetcher = SolanaTransactionFetcher(
+                rpc_url=os.getenv('SOLANA_RPC_URL', 'https://api.mainnet-beta.solana.com'),
+                batch_size=self.fetch_batch_size,
+                flush_interval=self.fetch_flush_interval,
+                max_concurrent_batches=self.max_concurrent_fetches
+            )
+        if not self.backfiller:
+            # Share the fetcher so replayed and live signatures hit one cache
+            self.backfiller = SolanaGapBackfiller(fetcher=self.transaction_fetcher)
+        if not self.deduplicator:
+            self.deduplicator = SignatureDeduplicator()
+        if not self.decoders:
+            self.decoders = default_decoders()
+        self.wallet_subscriptions = {}
+        self.last_slots = {}
+        self.fetch_tasks = set()
+    
+    @staticmethod
+    def _logs_subscription(pubkey: str) -> List:
+        """logsSubscribe params for the transactions mentioning a wallet."""
+        return [{"mentions": [pubkey]}, {"commitment": "confirmed"}]
+    
+    def _passes_filters(self, amount: float, token_address: Optional[str]) -> bool:
+        """Apply the size threshold and the optional token whitelist."""
+        if amount < self.min_transaction_size:
             return False
+        if self.token_whitelist:
+            if not token_address or token_address not in self.token_whitelist:
+                return False
         return True
     
-    async def _subscribe_account(self, pubkey: str):
-        """Subscribe to account notifications for a specific wallet."""
-        try:
-            subscribe_message = {
-                "jsonrpc": "2.0",
-                "id": 1,
-                "method": "accountSubscribe",
-                "params": [
-                    pubkey,
-                    {"encoding": "jsonParsed", "commitment": "confirmed"}
-                ]
-            }
-            await self.ws_client.send(json.dumps(subscribe_message))
-        except Exception as e:
-            print(f"Error subscribing to account {pubkey}: {e}")
-    
-    async def _process_transaction(self, notification: Dict) -> Optional[Dict]:
-        """Process and filter incoming transaction notifications."""
+    def _process_fetched(self, item: Dict) -> Optional[Dict]:
+        """Filter a fetched transaction of a wallet and decode it into a transaction record."""
         try:
-            # Extract transaction data
-            tx_data = notification.get("result", {}).get("value", {})
-            
-            # Check transaction size
-            if float(tx_data.get("lamports", 0)) / 1e9 < self.min_transaction_size:
+            wallet = item["wallet"]
+            transaction = item["transaction"]
+            message = transaction["transaction"]["message"]
+            meta = transaction.get("meta") or {}
+            if meta.get("err") is not None:
                 return None
+            keys = [key["pubkey"] if isinstance(key, dict) else key for key in message["accountKeys"]]
             
-            # Check token whitelist if specified
-            if self.token_whitelist:
-                token_address = tx_data.get("tokenAddress")
-                if not token_address or token_address not in self.token_whitelist:
-                    return None
+            # The wallet's SOL balance after the transaction
+            amount = meta["postBalances"][keys.index(wallet)] / 1e9
+            token_address = next(
+                (balance.get("mint") for balance in meta.get("postTokenBalances") or []
+                 if balance.get("owner") == wallet),
+                None
+            )
+            if not self._passes_filters(amount, token_address):
+                return None
             
-            # Determine transaction type
-            tx_type = self._determine_transaction_type(tx_data)
+            # Swaps across all hops of a route become one trade
+            decoded = self.decoders.decode_transaction(transaction)
+            swap = self.decoders.summarize_swap(decoded)
+            tx_type = "swap" if swap else (decoded[0]["type"] if decoded else "unknown")
             
-            return {
+            record = {
                 "type": tx_type,
-                "wallet": tx_data.get("owner"),
-                "amount": float(tx_data.get("lamports", 0)) / 1e9,
-                "token": tx_data.get("tokenAddress"),
-                "signature": tx_data.get("signature"),
-                "timestamp": tx_data.get("blockTime")
+                "wallet": wallet,
+                "amount": amount,
+                "token": token_address,
+                "signature": item["signature"],
+                "slot": item["slot"],
+                "timestamp": item["block_time"]
             }
-            
+            if swap:
+                record.update({
+                    "dex": swap["dex"],
+                    "input_token": swap["input_mint"],
+                    "output_token": swap["output_mint"],
+                    "amount_in": swap["amount_in"],
+                    "amount_out": swap["amount_out"]
+                })
+            return record
+        
         except Exception as e:
             print(f"Error processing transaction: {e}")
+            metrics.increment("errors", "process_transaction")
             return None
     
-    def _determine_transaction_type(self, tx_data: Dict) -> str:
-        """Determine the type of transaction (swap, transfer, etc.)."""
-        # This is a simplified implementation
-        # In practice, you would need to analyze the instruction data
-        program_id = tx_data.get("programId", "")
+    async def handle_notification(self, msg_data: LogsNotification, shard: int = 0):
+        """
+        Fetch the transaction named by one logs notification and publish it
+        if it qualifies. Failed transactions are never copied.
+        """
+        wallet = self.wallet_subscriptions.get((shard, msg_data.params.subscription))
+        value = msg_data.params.result.value
+        if wallet is None or value.err is not None or not value.signature:
+            metrics.increment("filtered", "process_transaction")
+            return
+        
+        # Batched with other notifications; a null result (e.g. not yet visible) is left to backfill
+        transaction = await self.transaction_fetcher.fetch(value.signature)
+        if transaction is None:
+            metrics.increment("drops", "fetch_transaction")
+            return
+        await self.publish_transaction({
+            "wallet": wallet,
+            "signature": value.signature,
+            "slot": transaction.get("slot") or msg_data.params.result.context.slot,
+            "block_time": transaction.get("blockTime"),
+            "transaction": transaction
+        })
+    
+    async def publish_transaction(self, item: Dict):
+        """
+        Publish a fetched transaction of a wallet (wallet, signature, slot,
+        block_time, transaction), live or replayed after a reconnect.
+        """
+        self.last_slots[item["wallet"]] = max(self.last_slots.get(item["wallet"], -1), item["slot"])
+        started = time.perf_counter()
+        tx = self._process_fetched(item)
+        metrics.observe("process_transaction", time.perf_counter() - started)
+        if not tx:
+            metrics.increment("filtered", "process_transaction")
+        # A transaction reaching several wallets, or replayed by overlapping outages, is copied once
+        elif not self.deduplicator.seen(tx["signature"], self.event_topic):
+            # Hand off to subscribers without waiting on them
+            await self.event_bus.publish(self.event_topic, tx)
+    
+    async def _recover_shard(self, notifications: asyncio.Queue, shard: int, reconnected: Reconnected):
+        """
+        Resubscribe a reconnected shard's wallets, then replay what they
+        missed in slot order before its live notifications are processed.
+        """
+        wallets = self.shard_pool.keys_on(shard)
+        self.wallet_subscriptions = {
+            key: wallet for key, wallet in self.wallet_subscriptions.items() if key[0] != shard
+        }
+        # Subscribe first so nothing falls between the replay and live traffic
+        subscriptions = await self.shard_pool.subscribe_many(
+            notifications,
+            "logsSubscribe",
+            [(wallet, self._logs_subscription(wallet)) for wallet in wallets]
+        )
+        self.wallet_subscriptions.update({key: wallet for wallet, key in subscriptions.items()})
         
-        if program_id == "11111111111111111111111111111111":
-            return "transfer"
-        elif program_id in ["9xQeWvG816bUx9EPjHmaT23yvVM2ZWbrrpZb9PusVFin", "DjVE6JNiYqPL2QXyCUUh8rNjHrbz9hXHNYt99MQ59qw1"]:
-            return "swap"
-        else:
-            return "unknown"
+        # A slot can hold several of a wallet's transactions, so its last slot is
+        # replayed again and the ones already published are dropped as duplicates;
+        # wallets never seen start a few seconds before the drop was noticed
+        gaps = {
+            wallet: WalletGap(after_slot=self.last_slots[wallet] - 1) if wallet in self.last_slots
+            else WalletGap(after_time=reconnected.disconnected_at - 5)
+            for wallet in wallets
+        }
+        replay = await self.backfiller.backfill(gaps)
+        for item in replay:
+            await self.publish_transaction(item)
+        print(f"Shard {shard} reconnected: resubscribed {len(subscriptions)} wallets, "
+              f"replayed {len(replay)} missed transactions")
     
-    def add_transaction_handler(self, handler: Callable[[Dict], None]):
-        """Add a callback function to handle processed transactions."""
-        self.transaction_handlers.append(handler)
+    def add_transaction_handler(self, handler: Callable[[Dict], None], **subscription_options):
+        """Add a callback function to handle processed transactions via the event bus."""
+        self.event_bus.subscribe(self.event_topic, handler, **subscription_options)
     
     async def start_monitoring(self):
         """Start monitoring specified wallets and process notifications."""
-        if not await self._connect():
+        if not await self.shard_pool.start():
             return False
         
         try:
-            # Subscribe to all target wallets
-            for wallet in self.target_wallets:
-                await self._subscribe_account(wallet)
+            await self.event_bus.start()
+            
+            # Subscribe to all target wallets, ramping up every shard in parallel
+            notifications = self.shard_pool.register_consumer()
+            subscriptions = await self.shard_pool.subscribe_many(
+                notifications,
+                "logsSubscribe",
+                [(wallet, self._logs_subscription(wallet)) for wallet in self.target_wallets]
+            )
+            self.wallet_subscriptions = {key: wallet for wallet, key in subscriptions.items()}
+            print(f"Monitoring {len(subscriptions)} wallets over {self.shard_pool.shards} connection(s)")
             
-            # Process incoming notifications
-            async for msg in self.ws_client:
-                msg_data = json.loads(msg)
-                if msg_data.get("method") == "accountNotification":
-                    tx = await self._process_transaction(msg_data)
-                    if tx:
-                        # Notify all handlers
-                        for handler in self.transaction_handlers:
-                            handler(tx)
+            # Process the merged notifications of all shards until every connection closes
+            closed_shards = 0
+            while True:
+                shard, msg_data = await notifications.get()
+                if msg_data is None:
+                    closed_shards += 1
+                    if closed_shards == self.shard_pool.shards:
+                        break
+                    continue
+                if isinstance(msg_data, Reconnected):
+                    # Live notifications queue up behind the replay
+                    await self._recover_shard(notifications, shard, msg_data)
+                elif isinstance(msg_data, LogsNotification):
+                    # Fetch concurrently so one slow RPC round-trip never blocks the stream
+                    task = asyncio.create_task(self.handle_notification(msg_data, shard))
+                    self.fetch_tasks.add(task)
+                    task.add_done_callback(self.fetch_tasks.discard)
                             
         except Exception as e:
             print(f"Error in monitoring loop: {e}")
             return False
-        finally:
-            if self.ws_client:
-                await self.ws_client.close()
         
         return True
     
@@ -176,6 +377,88 @@ class WalletMonitorTool(BaseTool):
         return "Wallet monitor initialized successfully"
 
 if __name__ == "__main__":
+    # Test the live path offline: a logs notification names a signature whose
+    # fetched transaction is decoded into a swap and published once
+    import base58
+    import msgspec
+    from tools.copy_trade_agent.InstructionDecoderRegistry import SOL_MINT, SWAP_AMOUNTS
+    
+    class StubFetcher(SolanaTransactionFetcher):
+        """Serves prepared transactions instead of calling getTransaction."""
+        
+        def __init__(self, transactions: Dict[str, Dict]):
+            super().__init__(rpc_url="http://127.0.0.1:1")
+            self.transactions = transactions
+            self.fetched = []
+        
+        async def fetch(self, signature: str) -> Optional[Dict]:
+            self.fetched.append(signature)
+            return self.transactions.get(signature)
+    
+    def logs_notification(signature: str, err=None) -> LogsNotification:
+        return msgspec.convert({
+            "method": "logsNotification",
+            "params": {"subscription": 1, "result": {
+                "context": {"slot": 100},
+                "value": {"signature": signature, "err": err, "logs": []}
+            }}
+        }, LogsNotification)
+    
+    async def test_live_swaps():
+        wallet = "CopiedWallet"
+        # A Raydium SOL -> BONK swap: source, destination and owner are the last three accounts
+        swap = {
+            "slot": 100,
+            "blockTime": 1700000000,
+            "transaction": {"message": {
+                "accountKeys": [wallet, "WalletWsol", "WalletBonk", "RaydiumAmm",
+                                "675kPX9MHTjS2zt1qfr1NYHuzeLXfQM9H24wFSUt1Mp8"],
+                "instructions": [{"programIdIndex": 4, "accounts": [3, 3, 3, 1, 2, 0],
+                                  "data": base58.b58encode(bytes([9]) + SWAP_AMOUNTS.pack(2_000_000_000, 1)).decode()}]
+            }},
+            "meta": {
+                "err": None,
+                "postBalances": [5_000_000_000, 0, 0, 0, 1],
+                "preTokenBalances": [
+                    {"accountIndex": 1, "mint": SOL_MINT, "owner": wallet,
+                     "uiTokenAmount": {"amount": "2000000000", "decimals": 9}},
+                    {"accountIndex": 2, "mint": "BONK", "owner": wallet,
+                     "uiTokenAmount": {"amount": "0", "decimals": 5}}
+                ],
+                "postTokenBalances": [
+                    {"accountIndex": 1, "mint": SOL_MINT, "owner": wallet,
+                     "uiTokenAmount": {"amount": "0", "decimals": 9}},
+                    {"accountIndex": 2, "mint": "BONK", "owner": wallet,
+                     "uiTokenAmount": {"amount": "750000000000", "decimals": 5}}
+                ]
+            }
+        }
+        fetcher = StubFetcher({"swap1": swap})
+        tool = WalletMonitorTool(target_wallets=[wallet], min_transaction_size=0.1, transaction_fetcher=fetcher)
+        tool.wallet_subscriptions[(0, 1)] = wallet
+        published = []
+        tool.add_transaction_handler(published.append)
+        await tool.event_bus.start()
+        
+        await tool.handle_notification(logs_notification("swap1"))
+        # Delivered again, e.g. through a second subscription
+        await tool.handle_notification(logs_notification("swap1"))
+        # Failed transactions are not fetched; unknown ones are left to backfill
+        await tool.handle_notification(logs_notification("failed", err={"InstructionError": [0, "Custom"]}))
+        await tool.handle_notification(logs_notification("missing"))
+        await tool.event_bus.join()
+        
+        assert fetcher.fetched == ["swap1", "swap1", "missing"]
+        assert len(published) == 1
+        trade = published[0]
+        assert trade["type"] == "swap" and trade["wallet"] == wallet and trade["slot"] == 100
+        assert trade["input_token"] == SOL_MINT and trade["output_token"] == "BONK"
+        assert trade["amount_in"] == 2.0 and trade["amount_out"] == 7500000.0
+        print(json.dumps(trade, indent=2))
+        print("Live swap test passed!")
+    
+    asyncio.run(test_live_swaps())
+    
     # Test the tool
     tool = WalletMonitorTool(
         target_wallets=["ExampleWalletAddress"],
@@ -0,0 +1,75 @@
+import math
+import json
+from typing import Dict, Optional
+
+
+class DecayedSentiment:
+    """
+    Exponentially decayed mention count and sentiment sums for one token.
+    Every sample's weight halves each half_life seconds, so the average is
+    dominated by recent posts without keeping them. Adding a sample and
+    reading the aggregate are O(1) with constant memory.
+    """
+    
+    def __init__(self, half_life: float = 300):
+        self.half_life = half_life
+        self.decay_rate = math.log(2) / half_life
+        self.mentions = 0.0
+        self.polarity_sum = 0.0
+        self.subjectivity_sum = 0.0
+        # Time the sums are expressed at
+        self.updated = None
+        # Whether the token is above the alert thresholds; cleared when it falls back
+        self.alerted = False
+    
+    def _decay_to(self, now: float):
+        if self.updated is not None and now > self.updated:
+            factor = math.exp(-self.decay_rate * (now - self.updated))
+            self.mentions *= factor
+            self.polarity_sum *= factor
+            self.subjectivity_sum *= factor
+        if self.updated is None or now > self.updated:
+            self.updated = now
+    
+    def add(self, polarity: float, subjectivity: float, now: float):
+        """Add one scored mention at time now."""
+        self._decay_to(now)
+        # A sample older than the sums is decayed on its way in
+        weight = math.exp(-self.decay_rate * (self.updated - now))
+        self.mentions += weight
+        self.polarity_sum += polarity * weight
+        self.subjectivity_sum += subjectivity * weight
+    
+    def value(self, now: Optional[float] = None) -> Dict:
+        """Decayed mentions and average polarity and subjectivity, as of now."""
+        factor = 1.0
+        if now is not None and self.updated is not None and now > self.updated:
+            factor = math.exp(-self.decay_rate * (now - self.updated))
+        mentions = self.mentions * factor
+        return {
+            "score": self.polarity_sum / self.mentions if self.mentions else 0.0,
+            "subjectivity": self.subjectivity_sum / self.mentions if self.mentions else 0.0,
+            "mentions": mentions
+        }
+
+
+if __name__ == "__main__":
+    # Test decay with a 60s half-life
+    sentiment = DecayedSentiment(half_life=60)
+    for i in range(10):
+        sentiment.add(0.5, 0.4, now=100)
+    assert sentiment.value()["mentions"] == 10
+    
+    # A minute later the old mentions count half
+    sentiment.add(-0.5, 0.4, now=160)
+    value = sentiment.value()
+    assert abs(value["mentions"] - 6.0) < 1e-9
+    assert abs(value["score"] - (2.5 - 0.5) / 6.0) < 1e-9
+    
+    # Late samples are decayed to the current time; reading does not change state
+    sentiment.add(-0.5, 0.4, now=100)
+    assert abs(sentiment.value()["mentions"] - 6.5) < 1e-9
+    assert abs(sentiment.value(now=220)["mentions"] - 3.25) < 1e-9
+    assert abs(sentiment.value()["mentions"] - 6.5) < 1e-9
+    print(json.dumps(sentiment.value(now=220)))
+    print("Decayed sentiment test passed!")
@@ -0,0 +1,203 @@
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+import json
+
+
+class PoolWindowAggregator:
+    """
+    Rolling price and volume aggregates for many pools in fixed-size NumPy
+    ring buffers. Time is split into buckets shared by all pools; each pool
+    has a row of per-bucket traded volume covering two windows (current
+    and previous) and a row of per-bucket closing prices covering one
+    window. Window volumes are running sums, so ingesting a batch and
+    reading the changes of the pools it touched never walks the buffers;
+    rolling to a new bucket is a single column update across all pools.
+    """
+    
+    def __init__(self, window_seconds: float = 300, buckets: int = 60, initial_capacity: int = 1024):
+        self.window_seconds = window_seconds
+        self.buckets = buckets
+        self.bucket_width = window_seconds / buckets
+        self.pool_index: Dict[str, int] = {}
+        self.slot_pools: List[str] = []
+        capacity = max(1, initial_capacity)
+        # Volume per bucket over the current and previous windows
+        self.volumes = np.zeros((capacity, 2 * buckets))
+        # Last price as of the end of each bucket; the oldest column is the price at the window start
+        self.closes = np.full((capacity, buckets + 1), np.nan)
+        self.current_volume = np.zeros(capacity)
+        self.previous_volume = np.zeros(capacity)
+        self.last_price = np.full(capacity, np.nan)
+        self.liquidity = np.full(capacity, np.nan)
+        # Bucket of each pool's first event; volume changes need a full previous window after it
+        self.first_buckets = np.zeros(capacity, dtype=np.int64)
+        # Whether a pool is above the thresholds it last alerted on; cleared when it falls back
+        self.price_alerted = np.zeros(capacity, dtype=bool)
+        self.volume_alerted = np.zeros(capacity, dtype=bool)
+        # Number of rows that have received events
+        self.tracked = 0
+        # Absolute index of the newest bucket
+        self.head = None
+    
+    def __len__(self) -> int:
+        return len(self.slot_pools)
+    
+    def _grow(self):
+        """Double the number of pool rows."""
+        capacity = len(self.last_price) * 2
+        for name in ("volumes", "closes", "current_volume", "previous_volume",
+                     "last_price", "liquidity", "first_buckets", "price_alerted", "volume_alerted"):
+            current = getattr(self, name)
+            fill = np.nan if name in ("closes", "last_price", "liquidity") else 0
+            grown = np.full((capacity,) + current.shape[1:], fill, dtype=current.dtype)
+            grown[:len(current)] = current
+            setattr(self, name, grown)
+    
+    def slots(self, pools: Sequence[str]) -> np.ndarray:
+        """Rows of the given pools, allocating rows for new ones."""
+        slots = np.empty(len(pools), dtype=np.intp)
+        for i, pool in enumerate(pools):
+            slot = self.pool_index.get(pool)
+            if slot is None:
+                slot = len(self.slot_pools)
+                if slot >= len(self.last_price):
+                    self._grow()
+                self.slot_pools.append(pool)
+                self.pool_index[pool] = slot
+            slots[i] = slot
+        return slots
+    
+    def advance(self, now: float):
+        """Roll the buckets forward to the one containing now."""
+        index = int(now // self.bucket_width)
+        if self.head is None:
+            self.head = index
+            return
+        if index <= self.head:
+            return
+        
+        count = len(self.slot_pools)
+        ring = 2 * self.buckets
+        for head in range(self.head + 1, min(index, self.head + ring) + 1):
+            # The bucket two windows back is reused for the new head
+            expired = head % ring
+            self.previous_volume[:count] -= self.volumes[:count, expired]
+            self.volumes[:count, expired] = 0.0
+            # The bucket one window back moves from the current to the previous window
+            aged = (head - self.buckets) % ring
+            self.current_volume[:count] -= self.volumes[:count, aged]
+            self.previous_volume[:count] += self.volumes[:count, aged]
+        if index - self.head >= ring:
+            self.current_volume[:count] = 0.0
+            self.previous_volume[:count] = 0.0
+        
+        # Carry the last price into every bucket that passed without trades
+        steps = min(index - self.head, self.buckets + 1)
+        columns = np.arange(index - steps + 1, index + 1) % (self.buckets + 1)
+        self.closes[:count, columns] = self.last_price[:count, None]
+        self.head = index
+    
+    def add(self, slots: np.ndarray, prices: np.ndarray, volumes: np.ndarray,
+            liquidity: np.ndarray, now: float) -> np.ndarray:
+        """
+        Add a batch of trades at time now. Prices and liquidity may be NaN
+        when an event does not carry them. Returns the distinct rows touched.
+        """
+        self.advance(now)
+        new_pools = slots >= self.tracked
+        if new_pools.any():
+            self.first_buckets[slots[new_pools]] = self.head
+            self.tracked = len(self.slot_pools)
+        np.add.at(self.volumes[:, self.head % (2 * self.buckets)], slots, volumes)
+        np.add.at(self.current_volume, slots, volumes)
+        
+        # The last event of each pool in the batch sets its price and liquidity
+        touched, last = np.unique(slots[::-1], return_index=True)
+        last = len(slots) - 1 - last
+        for values, target in ((prices, self.last_price), (liquidity, self.liquidity)):
+            latest = values[last]
+            known = ~np.isnan(latest)
+            target[touched[known]] = latest[known]
+        
+        # A pool's first price also stands for the window start until it has history
+        new = np.isnan(self.closes[touched, 0]) & ~np.isnan(self.last_price[touched])
+        self.closes[touched[new]] = self.last_price[touched[new], None]
+        self.closes[touched, self.head % (self.buckets + 1)] = self.last_price[touched]
+        return touched
+    
+    def price_change_pct(self, slots: np.ndarray) -> np.ndarray:
+        """Price change over the window, in percent."""
+        start = self.closes[slots, (self.head - self.buckets) % (self.buckets + 1)]
+        return (self.last_price[slots] - start) / start * 100
+    
+    def volume_change_pct(self, slots: np.ndarray) -> np.ndarray:
+        """
+        Volume in the window against the window before it, in percent. NaN
+        until the pool has been tracked for both windows, or without previous volume.
+        """
+        previous = self.previous_volume[slots]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            change = (self.current_volume[slots] - previous) / previous * 100
+        warmed_up = self.head - self.first_buckets[slots] >= 2 * self.buckets - 1
+        return np.where(warmed_up & (previous > 0), change, np.nan)
+    
+    def detect(self, slots: np.ndarray, price_threshold: float, volume_threshold: float,
+               min_liquidity: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Rows among slots that just crossed the price or volume threshold.
+        A row alerts once per crossing and re-arms when it falls back below.
+        Rows under min_liquidity never alert.
+        """
+        liquid = self.liquidity[slots] >= min_liquidity
+        
+        # NaN changes compare False, so pools without history stay quiet
+        price_over = liquid & (np.abs(self.price_change_pct(slots)) >= price_threshold)
+        price_hits = slots[price_over & ~self.price_alerted[slots]]
+        self.price_alerted[slots] = price_over
+        
+        volume_over = liquid & (self.volume_change_pct(slots) >= volume_threshold)
+        volume_hits = slots[volume_over & ~self.volume_alerted[slots]]
+        self.volume_alerted[slots] = volume_over
+        return price_hits, volume_hits
+
+
+if __name__ == "__main__":
+    # Test a 60s window in 10s buckets
+    aggregator = PoolWindowAggregator(window_seconds=60, buckets=6, initial_capacity=2)
+    pools = aggregator.slots(["pool_a", "pool_b", "pool_c"])
+    assert len(aggregator) == 3 and len(aggregator.last_price) == 4
+    
+    def add(now, pools, prices, volumes, liquidity=50000.0):
+        slots = aggregator.slots(pools)
+        count = len(pools)
+        return aggregator.add(slots, np.array(prices, dtype=float), np.array(volumes, dtype=float),
+                              np.full(count, liquidity), now)
+    
+    add(0, ["pool_a", "pool_b"], [1.0, 10.0], [100.0, 1000.0])
+    add(30, ["pool_a", "pool_a"], [1.01, 1.02], [50.0, 50.0])
+    assert np.allclose(aggregator.price_change_pct(pools[:2]), [2.0, 0.0])
+    
+    # A full window later the first trades are in the previous window
+    add(65, ["pool_a", "pool_b"], [1.06, 10.0], [900.0, 100.0])
+    assert np.allclose(aggregator.previous_volume[pools[:2]], [100.0, 1000.0])
+    # Not yet tracked for two full windows
+    assert np.isnan(aggregator.volume_change_pct(pools[:2])).all()
+    # pool_a closed at 1.0 at the window start (5s), and is now up 6%
+    assert np.allclose(aggregator.price_change_pct(pools[:1]), [6.0])
+    
+    price_hits, volume_hits = aggregator.detect(pools, 5.0, 200.0, min_liquidity=10000)
+    assert price_hits.tolist() == [0] and volume_hits.tolist() == []
+    
+    # Both pools now have two full windows of history: 1000 vs 200 and 100 vs 1000
+    add(115, ["pool_a", "pool_b"], [1.07, 10.0], [100.0, 0.0])
+    assert np.allclose(aggregator.volume_change_pct(pools[:2]), [400.0, -90.0])
+    price_hits, volume_hits = aggregator.detect(pools, 5.0, 200.0, min_liquidity=10000)
+    # No second price alert while pool_a stays above the threshold
+    assert price_hits.tolist() == [] and volume_hits.tolist() == [0]
+    
+    # A long gap expires everything
+    add(1000, ["pool_c"], [2.0], [10.0], liquidity=500.0)
+    assert np.allclose(aggregator.current_volume[pools], [0.0, 0.0, 10.0])
+    assert np.allclose(aggregator.price_change_pct(pools[:2]), [0.0, 0.0])
+    print(json.dumps({"pools": len(aggregator), "capacity": len(aggregator.last_price)}))
+    print("Pool window aggregator test passed!")
@@ -1,16 +1,28 @@
 from agency_swarm.tools import BaseTool
 from pydantic import Field, ConfigDict
 import os
-from dotenv import load_dotenv
-from typing import List, Dict, Optional, Callable
+from typing import List, Dict, Optional, Callable, Pattern
 import asyncio
 import json
+import re
+import time
 
-load_dotenv()
+from tools.EnvLoader import load_env
+from tools.EventBus import EventBus
+from tools.MetricsRegistry import metrics
+from tools.market_sentinel_agent.DecayedSentiment import DecayedSentiment
+from tools.market_sentinel_agent.SentimentScorer import SentimentScorer
+
+load_env()
 
 class SentimentAnalyzerTool(BaseTool):
     """
     Tool for analyzing market sentiment from social media and news sources.
+    Posts mentioning a target token are scored with textblob in a process
+    pool (see SentimentScorer), so scoring never blocks the event loop.
+    Each token keeps exponentially decayed mention and sentiment totals that
+    every scored post updates in O(1), and an alert is published as soon as
+    a token meets the mention and sentiment thresholds.
     """
     
     model_config = ConfigDict(arbitrary_types_allowed=True)
@@ -30,26 +42,177 @@ class SentimentAnalyzerTool(BaseTool):
         description="Minimum number of mentions required"
     )
     
-    transaction_handlers: List[Callable[[Dict], None]] = Field(
-        default_factory=list,
-        description="List of callback functions to handle sentiment alerts"
+    event_bus: Optional[EventBus] = Field(
+        default=None,
+        description="Event bus that delivers sentiment alerts to handlers"
+    )
+    
+    event_topic: str = Field(
+        default="sentiment_alerts",
+        description="Event bus topic for published sentiment alerts"
+    )
+    
+    sentiment_half_life: float = Field(
+        default=300,
+        description="Seconds after which a post counts half toward a token's sentiment and mentions"
+    )
+    
+    scoring_workers: Optional[int] = Field(
+        default=None,
+        description="Number of scoring processes (defaults to the number of cores)"
+    )
+    
+    scoring_batch_size: int = Field(
+        default=64,
+        description="Number of texts sent to a scoring process at once"
+    )
+    
+    max_batches_in_flight: int = Field(
+        default=8,
+        description="Post batches being scored before intake waits"
+    )
+    
+    post_queue_size: int = Field(
+        default=100000,
+        description="Maximum number of posts waiting to be analyzed"
+    )
+    
+    scorer: Optional[SentimentScorer] = Field(
+        default=None,
+        description="Process-pool sentiment scorer with a content-hash cache"
+    )
+    
+    posts: Optional[asyncio.Queue] = Field(
+        default=None,
+        description="Posts waiting to be analyzed"
+    )
+    
+    mention_pattern: Optional[Pattern] = Field(
+        default=None,
+        description="Matches target tokens as tickers or case-insensitive cashtags"
+    )
+    
+    token_sentiment: Dict[str, DecayedSentiment] = Field(
+        default_factory=dict,
+        description="Decayed sentiment aggregates per target token"
     )
     
     def __init__(self, **data):
         super().__init__(**data)
-        self.transaction_handlers = []
+        if not self.event_bus:
+            self.event_bus = EventBus()
+        self.scorer = SentimentScorer(workers=self.scoring_workers, batch_size=self.scoring_batch_size)
+        self.posts = asyncio.Queue(maxsize=self.post_queue_size)
+        tokens = "|".join(re.escape(token) for token in self.target_tokens)
+        self.mention_pattern = re.compile(rf"(?<![\w$])(?:\$(?i:({tokens}))|({tokens}))(?!\w)")
+        self.token_sentiment = {
+            token.upper(): DecayedSentiment(self.sentiment_half_life)
+            for token in self.target_tokens
+        }
+        
+    def add_transaction_handler(self, handler: Callable[[Dict], None], **subscription_options):
+        """Add a callback function to handle sentiment alerts via the event bus."""
+        self.event_bus.subscribe(self.event_topic, handler, **subscription_options)
+    
+    def submit_post(self, post: Dict) -> bool:
+        """
+        Queue a post ({"text", "source", "timestamp"}) for analysis without
+        waiting. Returns False if the queue is full.
+        """
+        try:
+            self.posts.put_nowait(post)
+            return True
+        except asyncio.QueueFull:
+            metrics.increment("drops", "sentiment_score")
+            return False
+    
+    def _mentions(self, text: str) -> List[str]:
+        """Target tokens mentioned in a text."""
+        return list({(match.group(1) or match.group(2)).upper() for match in self.mention_pattern.finditer(text)})
+    
+    async def analyze_posts(self, posts: List[Dict]) -> List[Dict]:
+        """
+        Score the posts that mention target tokens, fold them into the
+        tokens' decayed aggregates and publish alerts for tokens that just
+        met the thresholds. Returns the published alerts.
+        """
+        mentioned = [(post, self._mentions(post.get("text", ""))) for post in posts]
+        mentioned = [(post, tokens) for post, tokens in mentioned if tokens]
+        if not mentioned:
+            return []
+        
+        scores = await self.scorer.score_many([post["text"] for post, _ in mentioned])
+        alerts = []
+        for (post, tokens), score in zip(mentioned, scores):
+            if score is None:
+                continue
+            polarity, subjectivity = score
+            now = post.get("timestamp") or time.time()
+            for token in tokens:
+                alert = self._update_token(token, polarity, subjectivity, now)
+                if alert:
+                    alerts.append(alert)
         
-    def add_transaction_handler(self, handler: Callable[[Dict], None]):
-        """Add a callback function to handle sentiment alerts."""
-        self.transaction_handlers.append(handler)
+        for alert in alerts:
+            await self.event_bus.publish(self.event_topic, alert)
+        return alerts
+    
+    def _update_token(self, token: str, polarity: float, subjectivity: float, now: float) -> Optional[Dict]:
+        """Add a mention to a token; returns an alert if the token just crossed the thresholds."""
+        sentiment = self.token_sentiment[token]
+        sentiment.add(polarity, subjectivity, now)
+        value = sentiment.value()
+        
+        above = value["mentions"] >= self.min_mentions and abs(value["score"]) >= self.sentiment_threshold
+        crossed = above and not sentiment.alerted
+        sentiment.alerted = above
+        if not crossed:
+            return None
+        
+        return {
+            "type": "sentiment_alert",
+            "token": token,
+            "sentiment": value,
+            "timestamp": now
+        }
+    
+    def get_sentiment(self, token: str, now: Optional[float] = None) -> Optional[Dict]:
+        """Current decayed sentiment of a target token."""
+        sentiment = self.token_sentiment.get(token.upper())
+        if sentiment is None:
+            return None
+        return sentiment.value(now or time.time())
+    
+    async def _analyze_batch(self, posts: List[Dict], slots: asyncio.Semaphore):
+        try:
+            await self.analyze_posts(posts)
+        except Exception as e:
+            print(f"Error analyzing posts: {e}")
+            metrics.increment("errors", "sentiment_score")
+        finally:
+            slots.release()
     
     async def start_analysis(self):
         """Start sentiment analysis."""
         try:
+            await self.event_bus.start()
+            self.scorer.start()
             print("Sentiment analyzer started...")
-            while True:
-                # Placeholder for actual sentiment analysis logic
-                await asyncio.sleep(300)  # Analyze every 5 minutes
+            # Bounds the batches being scored; once all are taken, posts back up in the queue
+            slots = asyncio.Semaphore(self.max_batches_in_flight)
+            batch_tasks = set()
+            try:
+                while True:
+                    await slots.acquire()
+                    posts = [await self.posts.get()]
+                    while len(posts) < self.scoring_batch_size and not self.posts.empty():
+                        posts.append(self.posts.get_nowait())
+                    
+                    task = asyncio.create_task(self._analyze_batch(posts, slots))
+                    batch_tasks.add(task)
+                    task.add_done_callback(batch_tasks.discard)
+            finally:
+                self.scorer.close()
                 
         except Exception as e:
             print(f"Error in sentiment analyzer: {e}")
@@ -72,10 +235,62 @@ if __name__ == "__main__":
         min_mentions=10
     )
     
+    received = []
+    
     def print_sentiment(sentiment):
+        received.append(sentiment)
         print(json.dumps(sentiment, indent=2))
     
     tool.add_transaction_handler(print_sentiment)
     
-    # Run the analyzer
-    asyncio.run(tool.start_analysis()) 
\ No newline at end of file
+    # Feed a burst of posts and check that the event loop stays responsive,
+    # with the startup heap frozen as the agency does before starting its tasks
+    import gc
+    
+    gc.collect()
+    gc.freeze()
+    
+    async def test_analyzer():
+        analyzer = asyncio.create_task(tool.start_analysis())
+        posts = [f"$sol is looking great, amazing breakout {i % 300}" for i in range(2000)]
+        posts += [f"ETH gas fees are terrible, awful experience {i % 50}" for i in range(500)]
+        posts += ["solid weather today, nothing about crypto"] * 500
+        
+        ticks = []
+        
+        async def heartbeat():
+            while True:
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(0.005)
+        
+        beat = asyncio.create_task(heartbeat())
+        started = time.perf_counter()
+        for text in posts:
+            tool.submit_post({"text": text, "source": "test", "timestamp": time.time()})
+        while len(received) < 2:
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - started
+        beat.cancel()
+        
+        # Let the rest of the burst drain; tokens already above the thresholds do not alert again
+        while not tool.posts.empty() or tool.scorer.in_flight:
+            await asyncio.sleep(0.01)
+        await tool.event_bus.join()
+        analyzer.cancel()
+        
+        longest_stall = max(b - a for a, b in zip(ticks, ticks[1:]))
+        print(json.dumps({
+            "posts": len(posts),
+            "scored": len(tool.scorer.cache),
+            "seconds_to_alerts": round(elapsed, 3),
+            "longest_loop_stall_ms": round(longest_stall * 1000, 1)
+        }))
+        assert len(tool.scorer.cache) == 350
+        assert longest_stall < 0.25
+        assert sorted((alert["token"], alert["sentiment"]["score"] > 0) for alert in received) == [
+            ("ETH", False),
+            ("SOL", True)
+        ]
+        print("Sentiment analyzer test passed!")
+    
+    asyncio.run(test_analyzer())
@@ -0,0 +1,188 @@
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from tools.MetricsRegistry import metrics
+
+# (polarity, subjectivity)
+Score = Tuple[float, float]
+
+
+def _load_textblob():
+    """Worker initializer: import textblob once per process instead of on the first batch."""
+    import textblob  # noqa: F401
+
+
+def score_texts(texts: List[str]) -> List[Score]:
+    """Score a batch of texts with textblob. Runs in a worker process."""
+    from textblob import TextBlob
+    
+    scores = []
+    for text in texts:
+        sentiment = TextBlob(text).sentiment
+        scores.append((sentiment.polarity, sentiment.subjectivity))
+    return scores
+
+
+def content_hash(text: str) -> bytes:
+    """Cache key for a text; reposts with the same content share it."""
+    return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+
+class SentimentScorer:
+    """
+    Scores texts in a process pool so textblob never runs on the event
+    loop. Texts are coalesced into batches that are flushed when full or
+    after a short deadline, several batches may be scored at once, and an
+    LRU keyed by content hash means reposted text is never scored twice.
+    """
+    
+    def __init__(self,
+                 workers: Optional[int] = None,
+                 batch_size: int = 64,
+                 flush_interval: float = 0.02,
+                 cache_size: int = 100000):
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.cache_size = cache_size
+        # Keep every worker busy with one batch queued behind it
+        self.batch_semaphore = asyncio.Semaphore(2 * self.workers)
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.cache: "OrderedDict[bytes, Score]" = OrderedDict()
+        # content hash -> future shared by every caller waiting on it
+        self.in_flight: Dict[bytes, asyncio.Future] = {}
+        self.pending: List[Tuple[bytes, str]] = []
+        self.flush_handle: Optional[asyncio.TimerHandle] = None
+        self.batch_tasks = set()
+    
+    def start(self):
+        """Start the worker processes. Spawned, so they do not inherit the parent's threads or sockets."""
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_load_textblob
+            )
+    
+    async def score(self, text: str) -> Optional[Score]:
+        """Return (polarity, subjectivity) for a text, or None if scoring failed."""
+        key = content_hash(text)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.cache.move_to_end(key)
+            metrics.increment("cache_hits", "sentiment_score")
+            return cached
+        
+        future = self.in_flight.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self.in_flight[key] = future
+            self.pending.append((key, text))
+            if len(self.pending) >= self.batch_size:
+                self._flush()
+            elif self.flush_handle is None:
+                self.flush_handle = asyncio.get_running_loop().call_later(self.flush_interval, self._flush)
+        
+        return await asyncio.shield(future)
+    
+    async def score_many(self, texts: List[str]) -> List[Optional[Score]]:
+        """Score several texts; they share batches with any other pending texts."""
+        return await asyncio.gather(*(self.score(text) for text in texts))
+    
+    def _flush(self):
+        """Send all pending texts to the pool as batches."""
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        
+        while self.pending:
+            batch = self.pending[:self.batch_size]
+            del self.pending[:self.batch_size]
+            task = asyncio.create_task(self._score_batch(batch))
+            self.batch_tasks.add(task)
+            task.add_done_callback(self.batch_tasks.discard)
+    
+    async def _score_batch(self, batch: List[Tuple[bytes, str]]):
+        """Score one batch in a worker process and resolve its futures."""
+        scores: List[Optional[Score]] = [None] * len(batch)
+        try:
+            async with self.batch_semaphore:
+                self.start()
+                started = time.perf_counter()
+                scores = await asyncio.get_running_loop().run_in_executor(
+                    self.executor,
+                    score_texts,
+                    [text for _, text in batch]
+                )
+                metrics.observe("sentiment_score", time.perf_counter() - started)
+        except Exception as e:
+            print(f"Error scoring sentiment batch: {e}")
+            metrics.increment("errors", "sentiment_score")
+        
+        for (key, _), score in zip(batch, scores):
+            if score is not None:
+                self._remember(key, score)
+            future = self.in_flight.pop(key, None)
+            if future is not None and not future.done():
+                future.set_result(score)
+    
+    def _remember(self, key: bytes, score: Score):
+        """Store a score in the LRU cache."""
+        self.cache[key] = score
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+    
+    def close(self):
+        """Stop the worker processes."""
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+
+if __name__ == "__main__":
+    # Test scoring in worker processes while the event loop keeps ticking
+    async def test_scorer():
+        scorer = SentimentScorer(batch_size=32)
+        texts = [f"SOL looks incredibly bullish today, great breakout #{i % 200}" for i in range(1000)]
+        texts += ["This rug pull is terrible, awful project"] * 50
+        
+        # Measure the longest stall of the event loop while scoring runs
+        ticks = []
+        
+        async def heartbeat():
+            while True:
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(0.005)
+        
+        beat = asyncio.create_task(heartbeat())
+        started = time.perf_counter()
+        scores = await scorer.score_many(texts)
+        elapsed = time.perf_counter() - started
+        beat.cancel()
+        
+        longest_stall = max(b - a for a, b in zip(ticks, ticks[1:]))
+        print(json.dumps({
+            "texts": len(texts),
+            "scored": len(scorer.cache),
+            "workers": scorer.workers,
+            "seconds": round(elapsed, 3),
+            "longest_loop_stall_ms": round(longest_stall * 1000, 1)
+        }))
+        assert len(scorer.cache) == 201
+        assert scores[0][0] > 0 and scores[-1][0] < 0
+        assert longest_stall < 0.25
+        
+        # Reposted text comes from the cache
+        assert await scorer.score(texts[0]) == scores[0]
+        scorer.close()
+        print("Sentiment scorer test passed!")
+    
+    asyncio.run(test_scorer())
@@ -1,17 +1,25 @@
 from agency_swarm.tools import BaseTool
 from pydantic import Field, ConfigDict
 import os
-from dotenv import load_dotenv
 from typing import List, Dict, Optional, Callable
 import asyncio
 import json
+import time
+import numpy as np
 
-load_dotenv()
+from tools.EnvLoader import load_env
+from tools.EventBus import EventBus
+from tools.MetricsRegistry import metrics
+from tools.market_sentinel_agent.PoolWindowAggregator import PoolWindowAggregator
+
+load_env()
 
 class TokenScannerTool(BaseTool):
     """
     Tool for scanning token activity across DEXs.
-    Monitors price and volume movements.
+    Monitors price and volume movements: pool trade and price events are
+    folded into rolling per-pool windows as they arrive, and an alert is
+    published as soon as a pool crosses a price or volume threshold.
     """
     
     model_config = ConfigDict(arbitrary_types_allowed=True)
@@ -36,26 +44,146 @@ class TokenScannerTool(BaseTool):
         description="Price change percentage to trigger alert"
     )
     
-    alert_handlers: List[Callable[[Dict], None]] = Field(
-        default_factory=list,
-        description="List of callback functions to handle alerts"
+    event_bus: Optional[EventBus] = Field(
+        default=None,
+        description="Event bus that delivers alerts to handlers"
+    )
+    
+    event_topic: str = Field(
+        default="market_alerts",
+        description="Event bus topic for published alerts"
+    )
+    
+    window_seconds: float = Field(
+        default=300,
+        description="Length of the rolling window for price and volume changes"
+    )
+    
+    window_buckets: int = Field(
+        default=60,
+        description="Number of time buckets per window"
+    )
+    
+    max_batch_size: int = Field(
+        default=1000,
+        description="Maximum number of queued pool events ingested together"
+    )
+    
+    pool_event_queue_size: int = Field(
+        default=100000,
+        description="Maximum number of pool events waiting to be ingested"
+    )
+    
+    aggregator: Optional[PoolWindowAggregator] = Field(
+        default=None,
+        description="Rolling price and volume windows per pool"
+    )
+    
+    pool_metadata: Dict[str, Dict] = Field(
+        default_factory=dict,
+        description="DEX and token of each tracked pool"
+    )
+    
+    pool_events: Optional[asyncio.Queue] = Field(
+        default=None,
+        description="Pool trade and price events waiting to be ingested"
     )
     
     def __init__(self, **data):
         super().__init__(**data)
-        self.alert_handlers = []
+        if not self.event_bus:
+            self.event_bus = EventBus()
+        self.aggregator = PoolWindowAggregator(self.window_seconds, self.window_buckets)
+        self.pool_metadata = {}
+        self.pool_events = asyncio.Queue(maxsize=self.pool_event_queue_size)
         
-    def add_alert_handler(self, handler: Callable[[Dict], None]):
-        """Add a callback function to handle alerts."""
-        self.alert_handlers.append(handler)
+    def add_alert_handler(self, handler: Callable[[Dict], None], **subscription_options):
+        """Add a callback function to handle alerts via the event bus."""
+        self.event_bus.subscribe(self.event_topic, handler, **subscription_options)
+    
+    def submit_event(self, event: Dict) -> bool:
+        """
+        Queue a pool event for ingestion without waiting. Events carry
+        pool, dex and token, and any of price, volume (USD traded),
+        liquidity (USD) and timestamp. Returns False if the queue is full.
+        """
+        try:
+            self.pool_events.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            metrics.increment("drops", "token_scan")
+            return False
+    
+    async def ingest(self, events: List[Dict]) -> List[Dict]:
+        """Fold a batch of pool events into the rolling windows and publish any alerts."""
+        events = [event for event in events if event.get("dex") in self.target_dexs]
+        if not events:
+            return []
+        
+        started = time.perf_counter()
+        for event in events:
+            pool = event["pool"]
+            if pool not in self.pool_metadata:
+                self.pool_metadata[pool] = {"dex": event.get("dex"), "token": event.get("token")}
+        
+        count = len(events)
+        slots = self.aggregator.slots([event["pool"] for event in events])
+        prices = np.fromiter((event.get("price", np.nan) for event in events), dtype=np.float64, count=count)
+        volumes = np.fromiter((event.get("volume", 0.0) for event in events), dtype=np.float64, count=count)
+        liquidity = np.fromiter((event.get("liquidity", np.nan) for event in events), dtype=np.float64, count=count)
+        now = max(event.get("timestamp", 0) for event in events) or time.time()
+        
+        touched = self.aggregator.add(slots, prices, volumes, liquidity, now)
+        price_hits, volume_hits = self.aggregator.detect(
+            touched,
+            self.price_change_threshold,
+            self.volume_change_threshold,
+            self.min_liquidity
+        )
+        
+        alerts = [self._alert("volatility_alert", slot, now) for slot in price_hits.tolist()]
+        alerts += [self._alert("volume_alert", slot, now) for slot in volume_hits.tolist()]
+        metrics.observe("token_scan", time.perf_counter() - started)
+        
+        for alert in alerts:
+            await self.event_bus.publish(self.event_topic, alert)
+        return alerts
+    
+    def _alert(self, alert_type: str, slot: int, now: float) -> Dict:
+        """Build an alert for the pool in a row."""
+        aggregator = self.aggregator
+        rows = np.array([slot])
+        pool = aggregator.slot_pools[slot]
+        return {
+            "type": alert_type,
+            "pool": pool,
+            **self.pool_metadata[pool],
+            "price": float(aggregator.last_price[slot]),
+            "price_change_pct": float(aggregator.price_change_pct(rows)[0]),
+            "volume": float(aggregator.current_volume[slot]),
+            "previous_volume": float(aggregator.previous_volume[slot]),
+            "volume_change_pct": float(aggregator.volume_change_pct(rows)[0]),
+            "liquidity": float(aggregator.liquidity[slot]),
+            "window_seconds": self.window_seconds,
+            "timestamp": now
+        }
     
     async def start_scanning(self):
         """Start scanning for token activity."""
         try:
+            await self.event_bus.start()
             print("Token scanner started...")
             while True:
-                # Placeholder for actual scanning logic
-                await asyncio.sleep(60)  # Scan every minute
+                # Wake on the first event, then take whatever else has queued up behind it
+                events = [await self.pool_events.get()]
+                while len(events) < self.max_batch_size and not self.pool_events.empty():
+                    events.append(self.pool_events.get_nowait())
+                
+                try:
+                    await self.ingest(events)
+                except Exception as e:
+                    print(f"Error ingesting pool events: {e}")
+                    metrics.increment("errors", "token_scan")
                 
         except Exception as e:
             print(f"Error in token scanner: {e}")
@@ -79,10 +207,49 @@ if __name__ == "__main__":
         price_change_threshold=5
     )
     
+    received = []
+    
     def print_alert(alert):
+        received.append(alert)
         print(json.dumps(alert, indent=2))
     
     tool.add_alert_handler(print_alert)
     
-    # Run the scanner
-    asyncio.run(tool.start_scanning()) 
\ No newline at end of file
+    # Replay 15 minutes of synthetic trades for many pools; one pumps 8% on heavy volume at the end
+    async def test_scanner():
+        scanner = asyncio.create_task(tool.start_scanning())
+        pools = 2000
+        steps = 30
+        for step in range(steps):
+            for pool in range(pools):
+                pumping = pool == 42 and step >= steps - 4
+                tool.submit_event({
+                    "pool": f"pool{pool}",
+                    "dex": "raydium",
+                    "token": f"TOKEN{pool}",
+                    "price": 1.0 + (0.02 * (step - steps + 5) if pumping else 0.0),
+                    "volume": 5000.0 if pumping else 100.0,
+                    "liquidity": 50000.0,
+                    "timestamp": 1_700_000_000 + step * 30
+                })
+            await asyncio.sleep(0)
+        
+        while not tool.pool_events.empty():
+            await asyncio.sleep(0.001)
+        await tool.event_bus.join()
+        scanner.cancel()
+        
+        batches = metrics.histograms["token_scan"]
+        print(json.dumps({
+            "events": pools * steps,
+            "batches": batches.count,
+            "ingest_seconds": round(batches.sum, 3),
+            "events_per_second": round(pools * steps / batches.sum)
+        }))
+        assert sorted((alert["type"], alert["pool"]) for alert in received) == [
+            ("volatility_alert", "pool42"),
+            ("volume_alert", "pool42")
+        ]
+        print("Token scanner test passed!")
+    
+    asyncio.run(test_scanner())
@@ -1,11 +1,16 @@
 from agency_swarm.tools import BaseTool
 from pydantic import Field, ConfigDict
 import os
-from dotenv import load_dotenv
-from typing import Dict, Optional
+from typing import Callable, Dict, Optional
 import json
+import time
+import msgspec
 
-load_dotenv()
+from tools.EnvLoader import load_env
+from tools.PositionJournal import PositionJournal
+from tools.risk_management_agent.RollingWindow import RollingWindow
+
+load_env()
 
 class RiskCalculatorTool(BaseTool):
     """
@@ -34,14 +39,39 @@ class RiskCalculatorTool(BaseTool):
         description="Risk percentage per trade"
     )
     
-    daily_trades: int = Field(
-        default=0,
-        description="Current number of trades today"
+    risk_windows: Dict[str, float] = Field(
+        default_factory=lambda: {"1m": 60, "1h": 3600, "24h": 86400},
+        description="Rolling windows tracked for trade count, PnL and drawdown, name -> seconds"
+    )
+    
+    window_buckets: int = Field(
+        default=60,
+        description="Number of time buckets per rolling window"
+    )
+    
+    limit_window: str = Field(
+        default="24h",
+        description="Rolling window the daily trade and drawdown limits are enforced over"
+    )
+    
+    clock: Callable[[], float] = Field(
+        default=time.time,
+        description="Time source of the rolling windows when no time is passed; a replay passes its virtual clock"
+    )
+    
+    windows: Dict[str, RollingWindow] = Field(
+        default_factory=dict,
+        description="Rolling risk counters by window name"
+    )
+    
+    realized_pnl: float = Field(
+        default=0.0,
+        description="Cumulative realized PnL"
     )
     
-    daily_pnl: float = Field(
+    unrealized_pnl: float = Field(
         default=0.0,
-        description="Current daily PnL"
+        description="Current unrealized PnL across open positions"
     )
     
     open_positions: Dict[str, Dict] = Field(
@@ -49,17 +79,103 @@ class RiskCalculatorTool(BaseTool):
         description="Dictionary of open positions"
     )
     
+    journal_dir: Optional[str] = Field(
+        default=None,
+        description="Directory for the risk journal and snapshots (disabled if not set)"
+    )
+    
+    journal_fsync_interval: float = Field(
+        default=0.05,
+        description="Seconds between journal fsyncs"
+    )
+    
+    journal_snapshot_every: int = Field(
+        default=10000,
+        description="Number of journal records between snapshots"
+    )
+    
+    journal: Optional[PositionJournal] = Field(
+        default=None,
+        description="Write-ahead log of trades and position PnL updates"
+    )
+    
     def __init__(self, **data):
         super().__init__(**data)
-        self.daily_trades = 0
-        self.daily_pnl = 0.0
+        if self.limit_window not in self.risk_windows:
+            raise ValueError(f"Limit window {self.limit_window} is not one of {list(self.risk_windows)}")
+        self.windows = {
+            name: RollingWindow(seconds, buckets=self.window_buckets)
+            for name, seconds in self.risk_windows.items()
+        }
+        self.realized_pnl = 0.0
+        self.unrealized_pnl = 0.0
         self.open_positions = {}
+        self.journal = None
+        if self.journal_dir:
+            self._recover()
+    
+    def _recover(self):
+        """Restore positions and rolling windows from the latest snapshot and journal tail."""
+        journal = PositionJournal(
+            self.journal_dir,
+            "risk",
+            fsync_interval=self.journal_fsync_interval,
+            snapshot_every=self.journal_snapshot_every
+        )
+        journal.load_snapshot(self._load_snapshot)
+        for record in journal.replay():
+            if record[0] == "trade":
+                self.record_trade(*record[1:])
+            elif record[0] == "position":
+                self.update_position(*record[1:])
+        journal.start(self._capture_state, msgspec.msgpack.encode)
+        self.journal = journal
     
-    def validate_trade(self, symbol: str, entry_price: float, stop_loss: Optional[float] = None) -> Dict:
+    def _capture_state(self) -> Dict:
+        """Copy of positions, PnL totals and rolling windows; the journal encodes it as msgpack."""
+        return {
+            "open_positions": {key: dict(position) for key, position in self.open_positions.items()},
+            "realized_pnl": self.realized_pnl,
+            "unrealized_pnl": self.unrealized_pnl,
+            "windows": {name: window.to_state() for name, window in self.windows.items()}
+        }
+    
+    def _load_snapshot(self, payload: memoryview):
+        """Restore the state saved by _capture_state."""
+        state = msgspec.msgpack.decode(payload)
+        self.open_positions = state["open_positions"]
+        self.realized_pnl = state["realized_pnl"]
+        self.unrealized_pnl = state["unrealized_pnl"]
+        # Windows whose configuration changed since the snapshot start empty
+        for name, window_state in state["windows"].items():
+            window = self.windows.get(name)
+            if window and (window.span_seconds, window.buckets) == (window_state["span_seconds"], window_state["buckets"]):
+                self.windows[name] = RollingWindow.from_state(window_state)
+    
+    @property
+    def daily_trades(self) -> int:
+        """Trades within the limit window."""
+        window = self.windows[self.limit_window]
+        window.advance(self.clock())
+        return window.trades
+    
+    @property
+    def daily_pnl(self) -> float:
+        """Realized PnL within the limit window."""
+        window = self.windows[self.limit_window]
+        window.advance(self.clock())
+        return window.realized_pnl
+    
+    def validate_trade(self, symbol: str, entry_price: float, stop_loss: Optional[float] = None,
+                       now: Optional[float] = None) -> Dict:
         """Validate a trade against risk parameters."""
         try:
+            # Limits read the running aggregates of the limit window
+            window = self.windows[self.limit_window]
+            window.advance(self.clock() if now is None else now)
+            
             # Check daily trade limit
-            if self.daily_trades >= self.max_daily_trades:
+            if window.trades >= self.max_daily_trades:
                 return {
                     "valid": False,
                     "reason": "Daily trade limit reached",
@@ -67,7 +183,7 @@ class RiskCalculatorTool(BaseTool):
                 }
             
             # Check daily drawdown
-            if abs(self.daily_pnl) > self.max_daily_drawdown_pct:
+            if window.drawdown > self.max_daily_drawdown_pct:
                 return {
                     "valid": False,
                     "reason": "Daily drawdown limit reached",
@@ -102,13 +218,55 @@ class RiskCalculatorTool(BaseTool):
         # For now, return a fixed percentage of max position size
         return entry_price * (self.max_position_size_pct / 100)
     
-    def update_position(self, symbol: str, pnl: float):
-        """Update position PnL and risk metrics."""
-        self.daily_pnl += pnl
-        self.daily_trades += 1
+    def _record(self, now: Optional[float], trades: int = 0, pnl: float = 0.0):
+        """Add to every rolling window along with the resulting equity level."""
+        now = self.clock() if now is None else now
+        equity = self.realized_pnl + self.unrealized_pnl
+        for window in self.windows.values():
+            window.add(now, trades=trades, pnl=pnl, equity=equity)
+    
+    def record_trade(self, symbol: str, now: Optional[float] = None, position_id: Optional[str] = None):
+        """
+        Count an opened trade against the trade limits. Positions are keyed
+        by position id, the symbol by default, as in the stop-loss manager.
+        """
+        now = self.clock() if now is None else now
+        self.open_positions.setdefault(position_id or symbol, {"pnl": 0.0})
+        self._record(now, trades=1)
+        if self.journal:
+            self.journal.append(("trade", symbol, now, position_id))
+    
+    def update_position(self, symbol: str, pnl: float, realized: bool = True, now: Optional[float] = None,
+                        position_id: Optional[str] = None):
+        """
+        Update position PnL and risk metrics. Realized PnL closes the position
+        (by id, the symbol by default); unrealized PnL marks it to market.
+        """
+        now = self.clock() if now is None else now
+        key = position_id or symbol
+        previous = self.open_positions.get(key, {}).get("pnl", 0.0)
+        self.unrealized_pnl -= previous
         
-        if symbol in self.open_positions:
-            self.open_positions[symbol]["pnl"] = pnl
+        if realized:
+            self.realized_pnl += pnl
+            self.open_positions.pop(key, None)
+            self._record(now, pnl=pnl)
+        else:
+            self.unrealized_pnl += pnl
+            self.open_positions.setdefault(key, {})["pnl"] = pnl
+            self._record(now)
+        
+        if self.journal:
+            self.journal.append(("position", symbol, pnl, realized, now, position_id))
+    
+    def get_window_stats(self, now: Optional[float] = None) -> Dict[str, Dict]:
+        """Trade count, realized and unrealized PnL and drawdown per rolling window."""
+        now = self.clock() if now is None else now
+        stats = {}
+        for name, window in self.windows.items():
+            window.advance(now)
+            stats[name] = {**window.stats(), "unrealized_pnl": self.unrealized_pnl}
+        return stats
     
     def run(self):
         """
@@ -133,4 +291,53 @@ if __name__ == "__main__":
         stop_loss=95.0
     )
     
-    print(json.dumps(result, indent=2)) 
\ No newline at end of file
+    print(json.dumps(result, indent=2))
+    
+    # Test the rolling limits
+    tool = RiskCalculatorTool(max_daily_trades=2, max_daily_drawdown_pct=3.0)
+    tool.record_trade("SOL/USD", now=0)
+    tool.update_position("SOL/USD", 1.0, realized=False, now=10)
+    tool.update_position("SOL/USD", 2.0, realized=True, now=20)
+    tool.record_trade("BONK/USD", now=30)
+    assert not tool.validate_trade("JUP/USD", 1.0, now=40)["valid"]
+    
+    # Trades older than the limit window stop counting
+    assert tool.validate_trade("JUP/USD", 1.0, now=86400 + 120)["valid"]
+    
+    tool.update_position("BONK/USD", -4.0, realized=True, now=86400 + 200)
+    result = tool.validate_trade("JUP/USD", 1.0, now=86400 + 210)
+    assert result["reason"] == "Daily drawdown limit reached"
+    print(json.dumps(tool.get_window_stats(now=86400 + 210), indent=2))
+    
+    # Reading the limit counters follows the injected clock, not wall time
+    tool = RiskCalculatorTool(clock=lambda: 100.0)
+    tool.record_trade("SOL/USD")
+    tool.update_position("SOL/USD", 2.0)
+    assert tool.daily_trades == 1 and tool.daily_pnl == 2.0
+    assert tool.get_window_stats()["1m"]["trades"] == 1
+    print("Rolling risk limit test passed!")
+    
+    # Closing one lot leaves the other lots of the symbol open
+    tool = RiskCalculatorTool()
+    tool.record_trade("SOL/USD", now=0, position_id="lot1")
+    tool.record_trade("SOL/USD", now=0, position_id="lot2")
+    tool.update_position("SOL/USD", 1.5, realized=False, now=5, position_id="lot2")
+    tool.update_position("SOL/USD", 1.0, realized=True, now=10, position_id="lot1")
+    assert list(tool.open_positions) == ["lot2"]
+    assert tool.realized_pnl == 1.0 and tool.unrealized_pnl == 1.5
+    
+    # Test recovery from snapshot plus journal tail
+    import tempfile
+    
+    with tempfile.TemporaryDirectory() as journal_dir:
+        tool = RiskCalculatorTool(journal_dir=journal_dir, journal_snapshot_every=5)
+        for i in range(8):
+            tool.record_trade(f"TOKEN{i % 3}/USD", now=100 + i, position_id=f"lot{i}")
+            tool.update_position(f"TOKEN{i % 3}/USD", 0.5 - i % 2, realized=i % 3 == 0, now=100 + i, position_id=f"lot{i}")
+        tool.journal.close()
+        
+        recovered = RiskCalculatorTool(journal_dir=journal_dir, journal_snapshot_every=5)
+        recovered.journal.close()
+        assert recovered.open_positions == tool.open_positions
+        assert recovered.get_window_stats(now=110) == tool.get_window_stats(now=110)
+        print("Recovery test passed!")
\ No newline at end of file
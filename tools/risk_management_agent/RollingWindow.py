@@ -0,0 +1,137 @@
+from collections import deque
+from typing import Dict
+import json
+
+
+class RollingWindow:
+    """
+    Time-bucketed ring buffer of trade counts and realized PnL over a fixed
+    span, plus the peak equity seen in that span. Adding to the current
+    bucket is O(1); buckets are expired as time moves past them, which is
+    amortized O(1) per bucket. Totals are kept as running sums so reading
+    them never walks the buffer.
+    """
+    
+    def __init__(self, span_seconds: float, buckets: int = 60):
+        self.span_seconds = span_seconds
+        self.buckets = buckets
+        self.bucket_width = span_seconds / buckets
+        self.trade_counts = [0] * buckets
+        self.pnl_sums = [0.0] * buckets
+        self.trades = 0
+        self.realized_pnl = 0.0
+        # Absolute index of the newest bucket
+        self.head = None
+        self.equity = 0.0
+        # (bucket index, equity) with decreasing equity; the front is the window's peak
+        self.peaks = deque()
+    
+    def advance(self, now: float):
+        """Expire buckets that have fallen out of the window."""
+        index = int(now // self.bucket_width)
+        if self.head is None:
+            self.head = index
+            self._observe_equity()
+            return
+        if index <= self.head:
+            return
+        
+        for step in range(1, min(index - self.head, self.buckets) + 1):
+            slot = (self.head + step) % self.buckets
+            self.trades -= self.trade_counts[slot]
+            self.realized_pnl -= self.pnl_sums[slot]
+            self.trade_counts[slot] = 0
+            self.pnl_sums[slot] = 0.0
+        self.head = index
+        
+        oldest = index - self.buckets + 1
+        while self.peaks and self.peaks[0][0] < oldest:
+            self.peaks.popleft()
+        # The current level is always part of the window
+        self._observe_equity()
+    
+    def _observe_equity(self):
+        while self.peaks and self.peaks[-1][1] <= self.equity:
+            self.peaks.pop()
+        self.peaks.append((self.head, self.equity))
+    
+    def add(self, now: float, trades: int = 0, pnl: float = 0.0, equity: float = None):
+        """Record trades and realized PnL at time now, and the equity level after them."""
+        self.advance(now)
+        slot = self.head % self.buckets
+        self.trade_counts[slot] += trades
+        self.pnl_sums[slot] += pnl
+        self.trades += trades
+        self.realized_pnl += pnl
+        if equity is not None:
+            self.equity = equity
+            self._observe_equity()
+    
+    @property
+    def drawdown(self) -> float:
+        """Decline of equity from its peak within the window."""
+        peak = self.peaks[0][1] if self.peaks else self.equity
+        return max(0.0, peak - self.equity)
+    
+    def to_state(self) -> Dict:
+        """Serializable copy of the window, for snapshots."""
+        return {
+            "span_seconds": self.span_seconds,
+            "buckets": self.buckets,
+            "trade_counts": list(self.trade_counts),
+            "pnl_sums": list(self.pnl_sums),
+            "trades": self.trades,
+            "realized_pnl": self.realized_pnl,
+            "head": self.head,
+            "equity": self.equity,
+            "peaks": [list(peak) for peak in self.peaks]
+        }
+    
+    @classmethod
+    def from_state(cls, state: Dict) -> "RollingWindow":
+        """Rebuild a window saved with to_state."""
+        window = cls(state["span_seconds"], buckets=state["buckets"])
+        window.trade_counts = list(state["trade_counts"])
+        window.pnl_sums = list(state["pnl_sums"])
+        window.trades = state["trades"]
+        window.realized_pnl = state["realized_pnl"]
+        window.head = state["head"]
+        window.equity = state["equity"]
+        window.peaks = deque(tuple(peak) for peak in state["peaks"])
+        return window
+    
+    def stats(self) -> Dict:
+        """Current aggregates of the window."""
+        return {
+            "trades": self.trades,
+            "realized_pnl": self.realized_pnl,
+            "drawdown": self.drawdown
+        }
+
+
+if __name__ == "__main__":
+    # Test expiry and drawdown on a 60s window with 10s buckets
+    window = RollingWindow(60, buckets=6)
+    window.add(0, trades=1, pnl=2.0, equity=2.0)
+    window.add(15, trades=1, pnl=-1.5, equity=0.5)
+    assert window.stats() == {"trades": 2, "realized_pnl": 0.5, "drawdown": 1.5}
+    
+    # The first bucket expires once a minute has passed; equity was still 2.0 early in the second
+    window.advance(61)
+    assert window.trades == 1 and window.realized_pnl == -1.5
+    assert window.drawdown == 1.5
+    window.advance(71)
+    assert window.drawdown == 0.0
+    
+    window.add(75, trades=1, pnl=1.0, equity=1.5)
+    window.add(80, pnl=-1.0, equity=0.5)
+    assert window.drawdown == 1.0
+    
+    restored = RollingWindow.from_state(json.loads(json.dumps(window.to_state())))
+    assert restored.stats() == window.stats()
+    
+    # A long gap clears everything but the current level
+    window.advance(1000)
+    print(json.dumps(window.stats()))
+    assert window.stats() == {"trades": 0, "realized_pnl": 0.0, "drawdown": 0.0}
+    print("Rolling window test passed!")
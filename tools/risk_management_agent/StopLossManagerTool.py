@@ -1,15 +1,29 @@
 from agency_swarm.tools import BaseTool
 from pydantic import Field, ConfigDict
 import os
-from dotenv import load_dotenv
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
 import json
+import struct
+import msgspec
 
-load_dotenv()
+from tools.EnvLoader import load_env
+from tools.PositionJournal import PositionJournal
+from tools.risk_management_agent.TriggerIndex import TriggerIndex
+
+load_env()
+
+# Per-slot position arrays, in snapshot order
+POSITION_ARRAYS = ("entry_prices", "position_sizes", "stop_losses",
+                   "take_profits", "trailing_stops", "highest_prices")
 
 class StopLossManagerTool(BaseTool):
     """
     Tool for managing stop-loss and take-profit orders.
+    Positions are stored in struct-of-arrays form, and each symbol keeps a
+    TriggerIndex of its positions' price levels, so a price tick only
+    evaluates the positions whose stop, take-profit or highest price it
+    crossed. A symbol can hold several positions, told apart by position id.
     """
     
     model_config = ConfigDict(arbitrary_types_allowed=True)
@@ -34,99 +48,473 @@ class StopLossManagerTool(BaseTool):
         description="Trailing stop distance percentage"
     )
     
-    positions: Dict[str, Dict] = Field(
+    initial_capacity: int = Field(
+        default=64,
+        description="Number of position slots to preallocate (grows by doubling)"
+    )
+    
+    position_index: Dict[str, int] = Field(
+        default_factory=dict,
+        description="Mapping of position id to its slot in the position arrays"
+    )
+    
+    slot_symbols: List[Optional[str]] = Field(
+        default_factory=list,
+        description="Symbol held in each slot (None for free slots)"
+    )
+    
+    slot_position_ids: List[Optional[str]] = Field(
+        default_factory=list,
+        description="Position id held in each slot (None for free slots)"
+    )
+    
+    trigger_indexes: Dict[str, TriggerIndex] = Field(
         default_factory=dict,
-        description="Dictionary of positions with their stop-loss and take-profit levels"
+        description="Price-level index of the open positions of each symbol"
+    )
+    
+    free_slots: List[int] = Field(
+        default_factory=list,
+        description="Slots released by closed positions, reused before growing"
+    )
+    
+    entry_prices: np.ndarray = Field(
+        default_factory=lambda: np.empty(0),
+        description="Entry price per slot"
+    )
+    
+    position_sizes: np.ndarray = Field(
+        default_factory=lambda: np.empty(0),
+        description="Position size per slot"
+    )
+    
+    stop_losses: np.ndarray = Field(
+        default_factory=lambda: np.empty(0),
+        description="Stop-loss level per slot"
+    )
+    
+    take_profits: np.ndarray = Field(
+        default_factory=lambda: np.empty(0),
+        description="Take-profit level per slot"
+    )
+    
+    trailing_stops: np.ndarray = Field(
+        default_factory=lambda: np.empty(0),
+        description="Trailing stop level per slot (NaN while inactive)"
+    )
+    
+    highest_prices: np.ndarray = Field(
+        default_factory=lambda: np.empty(0),
+        description="Highest price seen per slot"
+    )
+    
+    journal_dir: Optional[str] = Field(
+        default=None,
+        description="Directory for the position journal and snapshots (disabled if not set)"
+    )
+    
+    journal_fsync_interval: float = Field(
+        default=0.05,
+        description="Seconds between journal fsyncs"
+    )
+    
+    journal_snapshot_every: int = Field(
+        default=10000,
+        description="Number of journal records between snapshots"
+    )
+    
+    journal: Optional[PositionJournal] = Field(
+        default=None,
+        description="Write-ahead log of position mutations"
     )
     
     def __init__(self, **data):
         super().__init__(**data)
-        self.positions = {}
+        self.position_index = {}
+        self.slot_symbols = []
+        self.slot_position_ids = []
+        self.trigger_indexes = {}
+        self.free_slots = []
+        self.entry_prices = np.full(self.initial_capacity, np.nan)
+        self.position_sizes = np.full(self.initial_capacity, np.nan)
+        self.stop_losses = np.full(self.initial_capacity, np.nan)
+        self.take_profits = np.full(self.initial_capacity, np.nan)
+        self.trailing_stops = np.full(self.initial_capacity, np.nan)
+        self.highest_prices = np.full(self.initial_capacity, np.nan)
+        self.journal = None
+        if self.journal_dir:
+            self._recover()
+    
+    def _recover(self):
+        """Restore positions from the latest snapshot and journal tail, then start journaling."""
+        journal = PositionJournal(
+            self.journal_dir,
+            "stop_loss",
+            fsync_interval=self.journal_fsync_interval,
+            snapshot_every=self.journal_snapshot_every
+        )
+        journal.load_snapshot(self._load_snapshot)
+        for record in journal.replay():
+            self._apply_record(record)
+        self._rebuild_trigger_indexes()
+        journal.start(self._capture_state, self._encode_state)
+        self.journal = journal
+    
+    def _capture_state(self) -> Tuple[Dict, List[np.ndarray]]:
+        """Copy of the slot layout and the used part of every position array."""
+        count = len(self.slot_symbols)
+        layout = {
+            "symbols": list(self.slot_symbols),
+            "position_ids": list(self.slot_position_ids),
+            "free_slots": list(self.free_slots)
+        }
+        return layout, [getattr(self, name)[:count].copy() for name in POSITION_ARRAYS]
+    
+    @staticmethod
+    def _encode_state(state: Tuple[Dict, List[np.ndarray]]) -> bytes:
+        """Slot layout as a msgpack header followed by the raw position arrays; runs on the journal thread."""
+        layout, arrays = state
+        header = msgspec.msgpack.encode(layout)
+        return struct.pack("<I", len(header)) + header + b"".join(array.tobytes() for array in arrays)
+    
+    def _load_snapshot(self, payload: memoryview):
+        """Copy the slot layout and position arrays out of a mapped snapshot."""
+        (header_length,) = struct.unpack_from("<I", payload)
+        header = msgspec.msgpack.decode(payload[4:4 + header_length])
+        symbols = header["symbols"]
+        count = len(symbols)
+        capacity = max(self.initial_capacity, count)
+        
+        offset = 4 + header_length
+        for name in POSITION_ARRAYS:
+            values = np.full(capacity, np.nan)
+            values[:count] = np.frombuffer(payload, dtype=np.float64, count=count, offset=offset)
+            setattr(self, name, values)
+            offset += count * 8
+        
+        self.slot_symbols = symbols
+        # Snapshots written before positions had ids are keyed by symbol
+        self.slot_position_ids = header.get("position_ids", symbols)
+        self.free_slots = header["free_slots"]
+        self.position_index = {
+            position_id: slot
+            for slot, position_id in enumerate(self.slot_position_ids)
+            if position_id is not None
+        }
+    
+    def _apply_record(self, record: List):
+        """Replay one journaled mutation."""
+        operation = record[0]
+        if operation == "open":
+            self._open_slot(*record[1:])
+        elif operation == "close":
+            self.close_position(record[1])
+        elif operation == "ratchet":
+            slots = np.frombuffer(record[1], dtype=np.int64)
+            self.highest_prices[slots] = np.frombuffer(record[2], dtype=np.float64)
+            self.trailing_stops[slots] = np.frombuffer(record[3], dtype=np.float64)
+    
+    def _rebuild_trigger_indexes(self):
+        """Index every open position from the position arrays."""
+        self.trigger_indexes = {}
+        slots = np.fromiter(self.position_index.values(), dtype=np.intp, count=len(self.position_index))
+        for slot, lower, upper, high in zip(slots.tolist(), *self._levels(slots)):
+            self._trigger_index(self.slot_symbols[slot]).add(slot, lower, upper, high)
+    
+    def _trigger_index(self, symbol: str) -> TriggerIndex:
+        index = self.trigger_indexes.get(symbol)
+        if index is None:
+            index = self.trigger_indexes[symbol] = TriggerIndex()
+        return index
+    
+    def _levels(self, slots: np.ndarray):
+        """Lower trigger, take-profit and highest price of slots, as lists."""
+        # fmax skips the NaN of inactive trailing stops
+        lower = np.fmax(self.stop_losses[slots], self.trailing_stops[slots])
+        return lower.tolist(), self.take_profits[slots].tolist(), self.highest_prices[slots].tolist()
     
-    def initialize_position(self, symbol: str, entry_price: float, position_size: float) -> Dict:
-        """Initialize stop-loss and take-profit levels for a new position."""
+    def _reindex(self, slots: np.ndarray):
+        """Push the current levels of evaluated slots back into their symbols' indexes."""
+        for slot, lower, upper, high in zip(slots.tolist(), *self._levels(slots)):
+            self.trigger_indexes[self.slot_symbols[slot]].update(slot, lower, upper, high)
+    
+    @property
+    def positions(self) -> Dict[str, Dict]:
+        """Dictionary view of all open positions, keyed by position id."""
+        return {position_id: self._position_dict(slot) for position_id, slot in self.position_index.items()}
+    
+    def _position_dict(self, slot: int) -> Dict:
+        """Build the dictionary representation of the position in a slot."""
+        trailing_stop = self.trailing_stops[slot]
+        return {
+            "symbol": self.slot_symbols[slot],
+            "position_id": self.slot_position_ids[slot],
+            "entry_price": float(self.entry_prices[slot]),
+            "position_size": float(self.position_sizes[slot]),
+            "stop_loss": float(self.stop_losses[slot]),
+            "take_profit": float(self.take_profits[slot]),
+            "trailing_stop": None if np.isnan(trailing_stop) else float(trailing_stop),
+            "highest_price": float(self.highest_prices[slot])
+        }
+    
+    def _grow(self):
+        """Double the capacity of the position arrays."""
+        capacity = max(len(self.entry_prices) * 2, 1)
+        for name in POSITION_ARRAYS:
+            current = getattr(self, name)
+            grown = np.full(capacity, np.nan)
+            grown[:len(current)] = current
+            setattr(self, name, grown)
+    
+    def _allocate_slot(self, position_id: str, symbol: str) -> int:
+        """Return the slot for a position id, allocating one if needed."""
+        slot = self.position_index.get(position_id)
+        if slot is not None:
+            self._remove_from_index(slot)
+            self.slot_symbols[slot] = symbol
+            return slot
+        
+        if self.free_slots:
+            slot = self.free_slots.pop()
+            self.slot_symbols[slot] = symbol
+            self.slot_position_ids[slot] = position_id
+        else:
+            slot = len(self.slot_symbols)
+            if slot >= len(self.entry_prices):
+                self._grow()
+            self.slot_symbols.append(symbol)
+            self.slot_position_ids.append(position_id)
+        
+        self.position_index[position_id] = slot
+        return slot
+    
+    def _remove_from_index(self, slot: int):
+        """Take a slot out of its symbol's trigger index."""
+        symbol = self.slot_symbols[slot]
+        index = self.trigger_indexes.get(symbol)
+        if index is not None:
+            index.remove(slot)
+            if not len(index):
+                del self.trigger_indexes[symbol]
+    
+    def _open_slot(self, symbol: str, entry_price: float, position_size: float,
+                   stop_loss: float, take_profit: float, position_id: Optional[str] = None) -> int:
+        """Write a new position into its slot and index its levels."""
+        slot = self._allocate_slot(position_id or symbol, symbol)
+        self.entry_prices[slot] = entry_price
+        self.position_sizes[slot] = position_size
+        self.stop_losses[slot] = stop_loss
+        self.take_profits[slot] = take_profit
+        self.trailing_stops[slot] = np.nan
+        self.highest_prices[slot] = entry_price
+        self._trigger_index(symbol).add(slot, stop_loss, take_profit, entry_price)
+        return slot
+    
+    def initialize_position(self, symbol: str, entry_price: float, position_size: float,
+                            position_id: Optional[str] = None) -> Dict:
+        """
+        Initialize stop-loss and take-profit levels for a new position.
+        The position id defaults to the symbol; pass distinct ids to hold
+        several positions in one symbol.
+        """
         try:
             stop_loss = entry_price * (1 - self.default_stop_loss_pct / 100)
             take_profit = entry_price * (1 + self.default_take_profit_pct / 100)
             
-            position = {
-                "symbol": symbol,
-                "entry_price": entry_price,
-                "position_size": position_size,
-                "stop_loss": stop_loss,
-                "take_profit": take_profit,
-                "trailing_stop": None,
-                "highest_price": entry_price
-            }
-            
-            self.positions[symbol] = position
-            return position
+            slot = self._open_slot(symbol, entry_price, position_size, stop_loss, take_profit, position_id)
+            if self.journal:
+                self.journal.append(("open", symbol, entry_price, position_size, stop_loss, take_profit, position_id))
             
+            return self._position_dict(slot)
+        
         except Exception as e:
             print(f"Error initializing position: {e}")
             return None
     
-    def update_position(self, symbol: str, current_price: float) -> Optional[Dict]:
-        """Update position and check for stop-loss/take-profit triggers."""
+    def _evaluate_slots(self, slots: np.ndarray, prices: np.ndarray) -> np.ndarray:
+        """
+        Apply one price tick to each of the given (distinct) slots.
+        Ratchets highest price and trailing stop in place and returns an array
+        of trigger codes: 0 = hold, 1 = stop_loss, 2 = take_profit, 3 = trailing_stop.
+        """
+        highest = self.highest_prices[slots]
+        new_high = prices > highest
+        self.highest_prices[slots] = np.where(new_high, prices, highest)
+        
+        # Activate or ratchet the trailing stop on new highs past the activation gain
+        entry = self.entry_prices[slots]
+        price_gain_pct = (prices - entry) / entry * 100
+        activate = new_high & (price_gain_pct >= self.trailing_stop_activation_pct)
+        trailing = np.where(
+            activate,
+            prices * (1 - self.trailing_stop_distance_pct / 100),
+            self.trailing_stops[slots]
+        )
+        self.trailing_stops[slots] = trailing
+        
+        if self.journal and new_high.any():
+            changed = slots[new_high]
+            self.journal.append((
+                "ratchet",
+                changed.astype(np.int64).tobytes(),
+                self.highest_prices[changed].tobytes(),
+                self.trailing_stops[changed].tobytes()
+            ))
+        
+        # Same precedence as the scalar checks: stop-loss, take-profit, trailing stop.
+        # NaN trailing stops compare False, so inactive trailing stops never trigger.
+        codes = np.zeros(len(slots), dtype=np.int8)
+        codes[prices <= trailing] = 3
+        codes[prices >= self.take_profits[slots]] = 2
+        codes[prices <= self.stop_losses[slots]] = 1
+        return codes
+    
+    def update_prices(self, symbols: Sequence[str], prices: Sequence[float]) -> List[Dict]:
+        """
+        Apply a batch of (symbol, price) ticks to all open positions.
+        Ticks are evaluated in order, each against only the positions whose
+        levels it crossed. Only triggered closes are returned, at most one
+        per position. Unknown symbols are ignored.
+        """
         try:
-            if symbol not in self.positions:
-                return None
+            # Round r holds the r-th tick of every symbol, so a round touches each position at most once
+            rounds = []
+            tick_counts = {}
+            for symbol, price in zip(symbols, prices):
+                index = self.trigger_indexes.get(symbol)
+                if index is None:
+                    continue
+                rank = tick_counts.get(symbol, 0)
+                tick_counts[symbol] = rank + 1
+                if rank == len(rounds):
+                    rounds.append([])
+                rounds[rank].append((index, float(price)))
             
-            position = self.positions[symbol]
-            
-            # Update highest price
-            if current_price > position["highest_price"]:
-                position["highest_price"] = current_price
+            reasons = ("stop_loss", "take_profit", "trailing_stop")
+            triggered = set()
+            closes = []
+            for ticks in rounds:
+                round_slots = []
+                round_prices = []
+                for index, price in ticks:
+                    crossed = index.take_crossed(price)
+                    if not crossed:
+                        continue
+                    for slot in sorted(crossed):
+                        # Already closing; its levels are pushed back after the batch
+                        if slot in triggered:
+                            continue
+                        round_slots.append(slot)
+                        round_prices.append(price)
+                if not round_slots:
+                    continue
                 
-                # Check if trailing stop should be activated
-                price_gain_pct = (current_price - position["entry_price"]) / position["entry_price"] * 100
-                if price_gain_pct >= self.trailing_stop_activation_pct:
-                    position["trailing_stop"] = current_price * (1 - self.trailing_stop_distance_pct / 100)
+                round_slots = np.array(round_slots, dtype=np.intp)
+                codes = self._evaluate_slots(round_slots, np.array(round_prices, dtype=np.float64))
+                hits = np.flatnonzero(codes)
+                for i in hits:
+                    slot = int(round_slots[i])
+                    triggered.add(slot)
+                    closes.append({
+                        "action": "close",
+                        "reason": reasons[codes[i] - 1],
+                        "symbol": self.slot_symbols[slot],
+                        "position_id": self.slot_position_ids[slot],
+                        "price": round_prices[i],
+                        "entry_price": float(self.entry_prices[slot]),
+                        "position_size": float(self.position_sizes[slot])
+                    })
+                self._reindex(round_slots[codes == 0])
+            
+            # Positions stay open until the caller closes them
+            if triggered:
+                self._reindex(np.fromiter(triggered, dtype=np.intp, count=len(triggered)))
             
-            # Check for stop-loss trigger
-            if current_price <= position["stop_loss"]:
+            return closes
+        
+        except Exception as e:
+            print(f"Error updating prices: {e}")
+            return []
+    
+    def update_position(self, symbol: str, current_price: float, position_id: Optional[str] = None) -> Optional[Dict]:
+        """
+        Update one position and check for stop-loss/take-profit triggers.
+        The position id defaults to the symbol, as in initialize_position.
+        """
+        try:
+            position_id = position_id or symbol
+            if position_id not in self.position_index:
+                return None
+            
+            slot = self.position_index[position_id]
+            symbol = self.slot_symbols[slot]
+            slots = np.array([slot], dtype=np.intp)
+            code = self._evaluate_slots(slots, np.array([current_price], dtype=np.float64))[0]
+            self._reindex(slots)
+            
+            if code == 1:
                 return {
                     "action": "close",
                     "reason": "stop_loss",
                     "symbol": symbol,
-                    "price": current_price
+                    "position_id": position_id,
+                    "price": current_price,
+                    "entry_price": float(self.entry_prices[slot]),
+                    "position_size": float(self.position_sizes[slot])
                 }
             
-            # Check for take-profit trigger
-            if current_price >= position["take_profit"]:
+            if code == 2:
                 return {
                     "action": "close",
                     "reason": "take_profit",
                     "symbol": symbol,
-                    "price": current_price
+                    "position_id": position_id,
+                    "price": current_price,
+                    "entry_price": float(self.entry_prices[slot]),
+                    "position_size": float(self.position_sizes[slot])
                 }
             
-            # Check trailing stop
-            if position["trailing_stop"] and current_price <= position["trailing_stop"]:
+            if code == 3:
                 return {
                     "action": "close",
                     "reason": "trailing_stop",
                     "symbol": symbol,
-                    "price": current_price
+                    "position_id": position_id,
+                    "price": current_price,
+                    "entry_price": float(self.entry_prices[slot]),
+                    "position_size": float(self.position_sizes[slot])
                 }
             
+            position = self._position_dict(slot)
             return {
                 "action": "hold",
                 "symbol": symbol,
+                "position_id": position_id,
                 "current_price": current_price,
                 "stop_loss": position["stop_loss"],
                 "take_profit": position["take_profit"],
                 "trailing_stop": position["trailing_stop"]
             }
-            
+        
         except Exception as e:
             print(f"Error updating position: {e}")
             return None
     
-    def close_position(self, symbol: str):
-        """Close a position and remove it from tracking."""
-        if symbol in self.positions:
-            del self.positions[symbol]
+    def close_position(self, position_id: str):
+        """Close a position (by id, the symbol by default) and remove it from tracking."""
+        slot = self.position_index.pop(position_id, None)
+        if slot is None:
+            return
+        
+        self._remove_from_index(slot)
+        self.slot_symbols[slot] = None
+        self.slot_position_ids[slot] = None
+        for name in POSITION_ARRAYS:
+            getattr(self, name)[slot] = np.nan
+        self.free_slots.append(slot)
+        
+        if self.journal:
+            self.journal.append(("close", position_id))
     
     def run(self):
         """
@@ -136,6 +524,8 @@ class StopLossManagerTool(BaseTool):
         return "Stop loss manager initialized successfully"
 
 if __name__ == "__main__":
+    import time
+    
     # Test the tool
     tool = StopLossManagerTool(
         default_stop_loss_pct=2.0,
@@ -159,4 +549,83 @@ if __name__ == "__main__":
         current_price=103.0
     )
     
-    print("\nPosition update:", json.dumps(update, indent=2)) 
\ No newline at end of file
+    print("\nPosition update:", json.dumps(update, indent=2))
+    assert update["action"] == "hold"
+    assert abs(update["trailing_stop"] - 101.455) < 1e-9
+    
+    # Test batch price updates: only triggered closes are returned
+    for i in range(500):
+        tool.initialize_position(symbol=f"TOKEN{i}/USD", entry_price=10.0, position_size=1.0)
+    
+    closes = tool.update_prices(
+        ["TOKEN0/USD", "TOKEN1/USD", "TOKEN2/USD", "TOKEN2/USD", "TOKEN3/USD", "UNKNOWN"],
+        [9.7, 10.5, 10.3, 10.1, 10.1, 1.0]
+    )
+    print("\nBatch closes:", json.dumps(closes, indent=2))
+    assert [(c["symbol"], c["reason"]) for c in closes] == [
+        ("TOKEN0/USD", "stop_loss"),
+        ("TOKEN1/USD", "take_profit"),
+        ("TOKEN2/USD", "trailing_stop"),
+    ]
+    
+    tool.close_position("TOKEN0/USD")
+    assert "TOKEN0/USD" not in tool.positions
+    assert tool.initialize_position("NEW/USD", 5.0, 1.0)["stop_loss"] == 4.9
+    print("\nBatch test passed!")
+    
+    # Test many positions per symbol: the index must match checking every position on every tick
+    rng = np.random.default_rng(7)
+    indexed = StopLossManagerTool()
+    scanned = StopLossManagerTool()
+    for i in range(2000):
+        symbol = f"MEME{i % 4}/USD"
+        entry_price = float(rng.uniform(9.8, 10.2))
+        for tool in (indexed, scanned):
+            tool.initialize_position(symbol, entry_price, 1.0, position_id=f"lot{i}")
+    
+    tick_symbols = [f"MEME{i % 4}/USD" for i in range(400)]
+    tick_prices = (10.0 + np.cumsum(rng.normal(0, 0.02, 400))).tolist()
+    started = time.perf_counter()
+    closes = indexed.update_prices(tick_symbols, tick_prices)
+    indexed_ms = (time.perf_counter() - started) * 1000
+    
+    expected = []
+    triggered = set()
+    for symbol, price in zip(tick_symbols, tick_prices):
+        for position_id, position in list(scanned.positions.items()):
+            if position["symbol"] != symbol or position_id in triggered:
+                continue
+            update = scanned.update_position(symbol, price, position_id=position_id)
+            if update["action"] == "close":
+                triggered.add(position_id)
+                expected.append((position_id, update["reason"], price))
+    
+    assert sorted((c["position_id"], c["reason"], c["price"]) for c in closes) == sorted(expected)
+    assert indexed.positions == scanned.positions
+    print(f"{len(closes)} closes from 400 ticks over 2000 positions in {indexed_ms:.1f}ms")
+    print("Trigger index test passed!")
+    
+    # Test recovery from snapshot plus journal tail
+    import tempfile
+    
+    with tempfile.TemporaryDirectory() as journal_dir:
+        tool = StopLossManagerTool(journal_dir=journal_dir, journal_snapshot_every=300)
+        for i in range(400):
+            tool.initialize_position(f"TOKEN{i}/USD", 10.0, 1.0)
+        tool.update_prices([f"TOKEN{i}/USD" for i in range(0, 400, 2)], [10.3] * 200)
+        for i in range(1, 400, 4):
+            tool.close_position(f"TOKEN{i}/USD")
+        tool.journal.close()
+        
+        started = time.perf_counter()
+        recovered = StopLossManagerTool(journal_dir=journal_dir, journal_snapshot_every=300)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        recovered.journal.close()
+        
+        assert recovered.positions == tool.positions
+        assert recovered.free_slots == tool.free_slots
+        ticks = [f"TOKEN{i}/USD" for i in range(400)]
+        assert recovered.update_prices(ticks, [9.5] * 400) == tool.update_prices(ticks, [9.5] * 400)
+        assert len(tool.update_prices(ticks, [9.5] * 400)) == len(tool.positions)
+        print(f"Recovered {len(recovered.positions)} positions in {elapsed_ms:.1f}ms")
+        print("Recovery test passed!")
@@ -0,0 +1,128 @@
+import heapq
+import itertools
+from typing import Dict, List
+import json
+
+# Position in the per-slot level list
+LOWER, UPPER, HIGH, VERSION = range(4)
+
+
+class TriggerIndex:
+    """
+    Price-level index over the open positions of one symbol. Each position
+    sits in three heaps: its lower trigger (the higher of stop-loss and
+    trailing stop) in a max-heap, its take-profit in a min-heap and its
+    highest seen price in a min-heap. A tick only pops the entries its
+    price crossed, so finding the k affected positions costs O(log n) per
+    position touched instead of a scan over all n. Changed levels are
+    pushed again and outdated entries are skipped lazily.
+    """
+    
+    def __init__(self):
+        self.lower_heap = []
+        self.upper_heap = []
+        self.high_heap = []
+        # slot -> [lower, upper, high, version]; a level is None while its entry is popped
+        self.levels: Dict[int, List] = {}
+        self.versions = itertools.count()
+    
+    def __len__(self) -> int:
+        return len(self.levels)
+    
+    def add(self, slot: int, lower: float, upper: float, high: float):
+        """Index a newly opened position."""
+        self.levels[slot] = [None, None, None, next(self.versions)]
+        self.update(slot, lower, upper, high)
+    
+    def update(self, slot: int, lower: float, upper: float, high: float):
+        """Push the levels of a position that changed or were popped."""
+        levels = self.levels[slot]
+        version = levels[VERSION]
+        if levels[LOWER] != lower:
+            heapq.heappush(self.lower_heap, (-lower, version, slot))
+            levels[LOWER] = lower
+        if levels[UPPER] != upper:
+            heapq.heappush(self.upper_heap, (upper, version, slot))
+            levels[UPPER] = upper
+        if levels[HIGH] != high:
+            heapq.heappush(self.high_heap, (high, version, slot))
+            levels[HIGH] = high
+        if len(self.lower_heap) + len(self.upper_heap) + len(self.high_heap) > 12 * len(self.levels) + 192:
+            self._compact()
+    
+    def remove(self, slot: int):
+        """Drop a closed position; its heap entries become stale."""
+        self.levels.pop(slot, None)
+    
+    def _pop_valid(self, heap: List, which: int, bound: float, inclusive: bool, slots: set):
+        """Pop entries up to bound, collecting the slots whose entry is current."""
+        while heap and (heap[0][0] <= bound if inclusive else heap[0][0] < bound):
+            value, version, slot = heapq.heappop(heap)
+            levels = self.levels.get(slot)
+            if levels is None or levels[VERSION] != version:
+                continue
+            level = -value if which == LOWER else value
+            if levels[which] == level:
+                levels[which] = None
+                slots.add(slot)
+    
+    def take_crossed(self, price: float) -> set:
+        """
+        Pop the positions whose levels the price reached: at or below the
+        lower trigger, at or above take-profit, or above the highest price.
+        Callers must update() every returned slot after evaluating it.
+        """
+        lower_heap, upper_heap, high_heap = self.lower_heap, self.upper_heap, self.high_heap
+        # Most ticks cross nothing; answer those from the three heap tops
+        if not ((lower_heap and -lower_heap[0][0] >= price)
+                or (upper_heap and upper_heap[0][0] <= price)
+                or (high_heap and high_heap[0][0] < price)):
+            return set()
+        
+        slots = set()
+        # The max-heap holds negated levels: lower >= price is -lower <= -price
+        self._pop_valid(self.lower_heap, LOWER, -price, True, slots)
+        self._pop_valid(self.upper_heap, UPPER, price, True, slots)
+        self._pop_valid(self.high_heap, HIGH, price, False, slots)
+        return slots
+    
+    def _compact(self):
+        """Rebuild the heaps without outdated entries."""
+        self.lower_heap = [(-levels[LOWER], levels[VERSION], slot)
+                           for slot, levels in self.levels.items() if levels[LOWER] is not None]
+        self.upper_heap = [(levels[UPPER], levels[VERSION], slot)
+                           for slot, levels in self.levels.items() if levels[UPPER] is not None]
+        self.high_heap = [(levels[HIGH], levels[VERSION], slot)
+                          for slot, levels in self.levels.items() if levels[HIGH] is not None]
+        heapq.heapify(self.lower_heap)
+        heapq.heapify(self.upper_heap)
+        heapq.heapify(self.high_heap)
+
+
+if __name__ == "__main__":
+    # Test that ticks return only the positions whose levels were crossed
+    index = TriggerIndex()
+    for slot in range(100):
+        # stop at 90 - slot/10, take-profit at 110 + slot/10, highest 100
+        index.add(slot, 90 - slot / 10, 110 + slot / 10, 100.0)
+    
+    assert index.take_crossed(100.0) == set()
+    assert index.take_crossed(89.75) == {0, 1, 2}
+    for slot in (0, 1, 2):
+        index.update(slot, 90 - slot / 10, 110 + slot / 10, 100.0)
+    
+    crossed = index.take_crossed(110.35)
+    assert crossed == set(range(100))
+    for slot in crossed:
+        # Ratchet: every position saw a new high and raised its lower trigger
+        index.update(slot, 108.0, 110 + slot / 10, 110.35)
+    # Positions left open past their take-profit are returned again on the next tick
+    assert index.take_crossed(110.35) == {0, 1, 2, 3}
+    for slot in range(4):
+        index.update(slot, 108.0, 110 + slot / 10, 110.35)
+    # Only the new high is crossed for most; take-profit too for slots 0-10
+    assert index.take_crossed(111.05) == set(range(100))
+    
+    index.remove(5)
+    print(json.dumps({"positions": len(index), "heap_entries": len(index.lower_heap) + len(index.upper_heap) + len(index.high_heap)}))
+    print("Trigger index test passed!")